@@ -1,148 +1,181 @@
 import json
+import os
 import sys
-from app_utils import init_azure_client, init_chromadb_collection
-from db_utils import movie_finder, get_movie_details, find_similar_movies
-from history_manager import load_conversation_history, save_conversation_history
-
-azure_client, AZURE_DEPLOYMENT_NAME = init_azure_client()
-client, collection = init_chromadb_collection()
-
-tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": "get_movie_recommendations",
-            "description": "Find similar movies based on user's movie preferences. Takes movie titles as input and returns recommendations with explanations.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Movie title(s) that the user likes or is interested in"
-                    }
-                },
-                "required": ["query"]
-            }
-        }
-    }
-]
-
-def run_llm_with_function_call(user_input):
+import time
+from app_utils import init_azure_client, get_collection
+from db_utils import current_index_version
+from result_cache import get_result_cache
+from response_cache import get_response_cache
+from intent_router import get_intent_router
+from prompts import PROMPT_VERSION, tools, build_system_prompt
+from recommendation_tools import (RECOMMENDATION_TOOL, recommendation_calls, run_recommendation_calls,
+                                  failure_message, tool_messages, answer_cache_ids, uses_taste_profile)
+from taste_profile import update_taste_profile
+from context_builder import context_stats
+from query_embeddings import get_query_embedding_cache
+from history_manager import load_conversation_history, save_conversation_history, clear_conversation_history
+from tracing import span, record_usage, stream_options, metrics_snapshot
+
+
+STREAM_ANSWERS = os.getenv("STREAM_ANSWERS", "1") != "0"
+
+
+def run_llm_with_function_call(user_input, use_cache=True, use_router=True, stream=STREAM_ANSWERS, on_chunk=None,
+                               user_id=None):
     """
     Main function to handle movie recommendations with tool calling and history management.
-    """
-    # Load conversation history
-    conversation_history = load_conversation_history()
     
-    # Build context from history
-    history_context = ""
-    if conversation_history:
-        history_context = f"\n\nUser's previously liked movies: {', '.join(conversation_history)}"
+    With `use_cache`, a previously written answer for the same (normalized)
+    input is printed without calling the LLM, and an answer for the same
+    seed and recommendation IDs skips the second completion. With
+    `use_router`, inputs that confidently name movies go straight to the
+    recommendation tool, so only the final LLM call is made.
     
-    # Enhanced system prompt with structured output requirements
-    system_prompt = f"""You are an expert movie recommendation AI assistant. Your job is to:
-
-1. Help users discover movies they'll love based on their preferences
-2. Provide detailed explanations for WHY each movie is recommended
-3. **ALWAYS prioritize the user's CURRENT input over past history**{history_context}
-
-IMPORTANT RULES:
-- When the user mentions a specific movie, genre, theme, or topic (like "car", "space", "romance"), ONLY recommend movies related to that current input
-- Past conversation history should ONLY be considered when:
-  a) The current query is vague or asks for "more recommendations"
-  b) The user explicitly asks to blend their past preferences with new ones
-- If the user says "I love [topic/movie]", find and recommend movies about that specific topic or similar to that movie
-
-When making recommendations:
-- Explain the connection between the user's CURRENT preferences and each recommendation
-- Highlight similar themes, genres, directors, actors, or storytelling styles
-- Be enthusiastic and engaging
-- Present recommendations in a clear, numbered format
-
-Use the get_movie_recommendations function when the user mentions specific movies, genres, themes, or topics they're interested in."""
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_input},
-    ]
-
-    # First LLM call - determine if tool calling is needed
-    response = azure_client.chat.completions.create(
-        model=AZURE_DEPLOYMENT_NAME,
-        messages=messages,
-        tools=tools,
-        tool_choice="auto"
-    )
-
-    msg = response.choices[0].message
-
-    # Check if the LLM wants to call a function
-    if msg.tool_calls:
-        tool = msg.tool_calls[0]
-        func_name = tool.function.name
-        func_args = json.loads(tool.function.arguments)
-
-        if func_name == "get_movie_recommendations":
-            query = func_args["query"]
-            
-            # Step 1: Find the movie IDs
-            titles = [query]
-            movie_ids = movie_finder(titles, collection)
-            
-            if not movie_ids:
-                print(f"Sorry, I couldn't find any movies matching '{query}'. Please try a different title.")
-                sys.stdout.flush()
-                return
-            
-            # Step 2: Get full details of the seed movies
-            seed_movie_details = get_movie_details(movie_ids, collection)
-            
-            # Step 3: Find similar movies using RAG vector search
-            similar_movies = find_similar_movies(movie_ids, collection, n_results=5)
-            
-            if not similar_movies:
-                print(f"I found '{seed_movie_details[0]['title']}' but couldn't find similar movies. Please try another movie.")
-                sys.stdout.flush()
+    With `stream`, the final answer is requested with `stream=True` and
+    written as its tokens arrive. Each piece of text is passed to
+    `on_chunk` when given, otherwise printed.
+
+    `user_id` selects whose history is read and extended (default
+    HISTORY_USER).
+    """
+    for chunk in iter_llm_answer(user_input, use_cache=use_cache, use_router=use_router, stream=stream,
+                                 user_id=user_id):
+        if on_chunk is not None:
+            on_chunk(chunk)
+        else:
+            print(chunk, end="")
+            sys.stdout.flush()
+    if on_chunk is not None:
+        on_chunk("\n")
+    else:
+        print()
+
+
+def iter_llm_answer(user_input, use_cache=True, use_router=True, stream=STREAM_ANSWERS, user_id=None):
+    """
+    Generator behind run_llm_with_function_call: yields the answer text in
+    pieces (token deltas when streaming, otherwise one piece per message).
+    """
+    with span("chat_request") as request_span:
+        response_cache = get_response_cache(PROMPT_VERSION) if use_cache else None
+        if response_cache is not None:
+            with span("response_cache.lookup") as lookup_span:
+                response_cache.bind_version(current_index_version())
+                cached = response_cache.get_for_input(user_input, user_id)
+                lookup_span.set(hit=cached is not None)
+            if cached is not None:
+                request_span.set(path="cache")
+                save_conversation_history(cached["seed_titles"], user_id)
+                yield cached["answer"]
+                update_taste_profile(cached.get("seed_ids"), get_collection(), user_id)
                 return
-            
-            # Save the user's preference to history
-            for movie in seed_movie_details:
-                save_conversation_history(movie['title'])
-            
-            # Prepare the tool response with structured data
-            tool_response = {
-                "seed_movies": seed_movie_details,
-                "recommendations": similar_movies
+
+        # Clients are created on the first request that needs them, not at import
+        azure_client, deployment = init_azure_client()
+        collection = get_collection()
+    
+        # Load conversation history
+        conversation_history = load_conversation_history(user_id)
+    
+        system_prompt = build_system_prompt(conversation_history)
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_input},
+        ]
+
+        # Fast path: an input that plainly names movies skips the tool-choice call
+        router = get_intent_router() if use_router else None
+        with span("router") as router_span:
+            route = router.route(user_input, collection, version=current_index_version()) if router else None
+            router_span.set(routed=route is not None)
+        request_span.set(path="router" if route is not None else "llm")
+        if route is not None:
+            func_args = {"query": route["query"]}
+            tool = {
+                "id": "call_local_router",
+                "type": "function",
+                "function": {"name": RECOMMENDATION_TOOL, "arguments": json.dumps(func_args)}
             }
-            
-            # Add the assistant message with tool_calls
-            messages.append({
-                "role": "assistant",
-                "content": None,
-                "tool_calls": [tool]
-            })
-            
-            # Add the tool response
-            messages.append({
-                "role": "tool",
-                "tool_call_id": tool.id,
-                "name": func_name,
-                "content": json.dumps(tool_response, indent=2)
-            })
-            
-            # Second LLM call - generate the final recommendation with explanations
-            final = azure_client.chat.completions.create(
-                model=AZURE_DEPLOYMENT_NAME,
-                messages=messages
-            )
-
-            print(final.choices[0].message.content)
-            sys.stdout.flush()
-            return
+            calls = [(tool, func_args, route["movie_ids"])]
+        else:
+            # First LLM call - determine if tool calling is needed
+            with span("llm.tool_choice"):
+                response = azure_client.chat.completions.create(
+                    model=deployment,
+                    messages=messages,
+                    tools=tools,
+                    tool_choice="auto"
+                )
+                record_usage(getattr(response, "usage", None), "tool_choice")
+
+            msg = response.choices[0].message
+            calls = recommendation_calls(msg.tool_calls)
+
+            # If no tool call, just print the response
+            if not calls:
+                yield msg.content or ""
+                return
 
-    # If no tool call, just print the response
-    print(msg.content)
-    sys.stdout.flush()
+        # Run every tool call of the turn: titles resolved and seeds searched concurrently, overlaps once
+        with span("tools", calls=len(calls)):
+            results = run_recommendation_calls(calls, collection, n_results=5, user_id=user_id)
+        failure = failure_message(results)
+        if failure:
+            yield failure
+            return
+    
+        seed_ids, recommendation_ids, seed_titles = answer_cache_ids(results)
+    
+        # Save the user's preference to history and fold it into their taste profile
+        save_conversation_history(seed_titles, user_id)
+        update_taste_profile(seed_ids, collection, user_id)
+        if uses_taste_profile(results):
+            response_cache = None  # the profile moves with every new like, so don't reuse these answers
+    
+        if response_cache is not None:
+            cached = response_cache.get_answer(seed_ids, recommendation_ids)
+            if cached is not None:
+                response_cache.put(user_input, seed_ids, recommendation_ids, cached["answer"], seed_titles,
+                                   user_id)
+                yield cached["answer"]
+                return
+    
+        # Add the assistant message with every tool call, then one tool response per call
+        messages.extend(tool_messages(results))
+    
+        # Second LLM call - generate the final recommendation with explanations
+        # the span includes the time the caller spends consuming each piece
+        with span("llm.answer", stream=stream) as answer_span:
+            if stream:
+                parts = []
+                started = time.perf_counter()
+                for chunk in azure_client.chat.completions.create(
+                    model=deployment,
+                    messages=messages,
+                    stream=True,
+                    **stream_options()
+                ):
+                    # Azure sends an initial chunk with no choices (content filter results)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if not parts:
+                            answer_span.set(first_token_ms=round((time.perf_counter() - started) * 1000, 3))
+                        parts.append(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+                    # with stream_options the last chunk carries the usage and no choices
+                    record_usage(getattr(chunk, "usage", None), "answer")
+                answer = "".join(parts)
+            else:
+                final = azure_client.chat.completions.create(
+                    model=deployment,
+                    messages=messages
+                )
+                record_usage(getattr(final, "usage", None), "answer")
+                answer = final.choices[0].message.content
+                yield answer or ""
+
+        if response_cache is not None and answer:
+            response_cache.put(user_input, seed_ids, recommendation_ids, answer, seed_titles, user_id)
 
 
 if __name__ == "__main__":
@@ -152,7 +185,21 @@ if __name__ == "__main__":
             break
         elif user_input.lower() == "clear":
             clear_conversation_history()
-            print("Conversation history cleared.")
+            continue
+        elif user_input.lower() in ("cache", "stats"):
+            cache = get_result_cache()
+            print(json.dumps(cache.stats(), indent=2) if cache else "Result cache is disabled.")
+            response_cache = get_response_cache(PROMPT_VERSION)
+            print(json.dumps(response_cache.stats(), indent=2) if response_cache else "Response cache is disabled.")
+            router = get_intent_router()
+            print(json.dumps(router.stats(), indent=2) if router else "Intent router is disabled.")
+            print(json.dumps(context_stats(), indent=2))
+            query_cache = get_query_embedding_cache()
+            print(json.dumps(query_cache.stats(), indent=2) if query_cache else "Query embedding cache is disabled.")
+            print(json.dumps(metrics_snapshot(), indent=2))
+            continue
+        elif user_input.lower().startswith("nocache "):
+            run_llm_with_function_call(user_input[len("nocache "):], use_cache=False)
             continue
 
         run_llm_with_function_call(user_input)
@@ -1,35 +1,47 @@
-import os
-import chromadb
-import numpy as np
-from openai import AzureOpenAI
 from dotenv import load_dotenv
-from db_utils import movie_finder
-import json
 from history_manager import load_conversation_history, save_conversation_history, clear_conversation_history
-from app_utils import init_azure_client, init_chromadb_collection
+from app_utils import init_azure_client, get_collection
 from Function_calling import run_llm_with_function_call
 
 
 
 # --- 1. SETUP ---
-print("--- Initializing Recommendation App ---")
-
-# Load all environment variables
-from dotenv import load_dotenv
+# Load all environment variables. The Azure client and the ChromaDB catalog
+# are opened by the first request (or by warm_up), so importing this module
+# stays fast.
 load_dotenv()
 
-azure_client, AZURE_DEPLOYMENT_NAME = init_azure_client()
 
-# Initialize ChromaDB Client to access our "Content Catalog"
-collection = init_chromadb_collection()
+def warm_up():
+    """
+    Opens everything the first request needs: the Azure client, the ChromaDB
+    "Content Catalog", the title index, and the exported vector store,
+    neighbor table and lexical index when present. Safe to call from a
+    background thread.
+    """
+    from db_utils import current_index_version
+    from title_index import get_title_index
+    from vector_store import get_vector_store
+    from neighbor_table import get_neighbor_table
+    from lexical_index import get_lexical_index
+
+    print("--- Initializing Recommendation App ---")
+    init_azure_client()
+    collection = get_collection()
+    get_title_index(collection, version=current_index_version())
+    get_vector_store()
+    get_neighbor_table()
+    get_lexical_index()
+
+
+def run_app_file(user_input, on_chunk=None):
 
-def run_app_file(user_input):
-    
-    run_llm_with_function_call(user_input)
+    run_llm_with_function_call(user_input, on_chunk=on_chunk)
 
 if __name__ == "__main__":
+    warm_up()
     while True:
         user_input = input("You: ")
         if user_input.lower() in ["exit", "quit"]:
             break
-        run_app_file(user_input)
\ No newline at end of file
+        run_app_file(user_input)
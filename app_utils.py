@@ -1,40 +1,77 @@
 import os
+import threading
 from dotenv import load_dotenv
-from openai import AzureOpenAI
-import chromadb
 load_dotenv()
 
+# Clients are created on first use and then shared by every caller in the
+# process; openai and chromadb are only imported at that point.
+_shared = {}
+_shared_lock = threading.RLock()
 
 
 def init_azure_client():
-    try:
-        client = AzureOpenAI(
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_KEY"),
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-05-01-preview")
-        )
-        deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-        if not deployment:
-            raise EnvironmentError("AZURE_OPENAI_DEPLOYMENT_NAME not set in .env")
-        return client, deployment
-    except Exception as e:
-        print(f"Error initializing Azure OpenAI client: {e}")
-        exit()
+    """Return the process-wide (AzureOpenAI client, chat deployment), created on first call."""
+    with _shared_lock:
+        if "azure" not in _shared:
+            try:
+                from openai import AzureOpenAI
+                client = AzureOpenAI(
+                    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                    api_key=os.getenv("AZURE_OPENAI_KEY"),
+                    api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-05-01-preview")
+                )
+                deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+                if not deployment:
+                    raise EnvironmentError("AZURE_OPENAI_DEPLOYMENT_NAME not set in .env")
+                _shared["azure"] = (client, deployment)
+            except Exception as e:
+                print(f"Error initializing Azure OpenAI client: {e}")
+                exit()
+        return _shared["azure"]
+        
+def init_async_azure_client(max_connections=32, timeout=60.0):
+    """
+    Async chat client for the service: one pooled httpx client shared by every
+    request, holding up to `max_connections` connections open (keep-alive).
+    """
+    import httpx
+    from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
+    deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+    if not deployment:
+        raise EnvironmentError("AZURE_OPENAI_DEPLOYMENT_NAME not set in .env")
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=timeout
+    )
+    client = AsyncAzureOpenAI(
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_key=os.getenv("AZURE_OPENAI_KEY"),
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-05-01-preview"),
+        http_client=http_client
+    )
+    return client, deployment
         
 def init_chromadb_collection(db_path="./chroma_db"):
-    """Return (client, collection) — supports multi-vector collection."""
-    try:
-        client = chromadb.PersistentClient(path=db_path)
-        # Create (or get) a standard collection. Older/newer chromadb
-        # installations may not support `vector_names`, so keep a single-vector
-        # collection and store concatenated embeddings.
-        collection = client.get_or_create_collection(
-            name="movies",
-            metadata={"description": "movie collection (concatenated embeddings)"}
-        )
+    """Return (client, collection) — `collection` is a MovieCollections with
+    one vector collection per embedded field. Both are opened once per
+    database path and shared by every caller in the process."""
+    key = ("chroma", os.path.abspath(db_path))
+    with _shared_lock:
+        if key not in _shared:
+            try:
+                import chromadb
+                from db_utils import MovieCollections
+                client = chromadb.PersistentClient(path=db_path)
+                collection = MovieCollections(client)
+
+                print(f"Connected to ChromaDB: {collection.count()} entries")
+                _shared[key] = (client, collection)
+            except Exception as e:
+                print(f"Error connecting to ChromaDB: {e}")
+                raise
+        return _shared[key]
+
 
-        print(f"Connected to ChromaDB: {collection.count()} entries")
-        return client, collection
-    except Exception as e:
-        print(f"Error connecting to ChromaDB: {e}")
-        raise
+def get_collection(db_path="./chroma_db"):
+    """The shared MovieCollections for `db_path`, opened on first use."""
+    return init_chromadb_collection(db_path)[1]
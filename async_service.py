@@ -0,0 +1,330 @@
+"""
+Asyncio recommendation service with a local HTTP/JSON endpoint.
+
+The request flow matches Function_calling.iter_llm_answer, but chat
+completions go through one AsyncAzureOpenAI client with a pooled httpx
+connection pool, and CPU-bound steps (title matching, vector search, cache
+lookups, history reads and writes) run in worker threads via asyncio.to_thread, so
+the event loop keeps serving other sessions.
+
+At most `max_concurrency` requests run at once; up to `max_queue` more wait
+for a slot, and anything beyond that is refused with 503 + Retry-After.
+
+    python async_service.py --port 8000
+
+    POST /recommend   {"message": "I love Inception", "user_id": "alice", "stream": false, "use_cache": true}
+    GET  /health
+    GET  /stats
+    GET  /metrics     Prometheus text format (stage latencies need TRACING=1)
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from dotenv import load_dotenv
+from app_utils import init_async_azure_client, init_chromadb_collection
+from db_utils import current_index_version
+from result_cache import get_result_cache
+from response_cache import get_response_cache
+from intent_router import get_intent_router
+from prompts import PROMPT_VERSION, tools, build_system_prompt
+from recommendation_tools import (RECOMMENDATION_TOOL, recommendation_calls, run_recommendation_calls,
+                                  failure_message, tool_messages, answer_cache_ids, uses_taste_profile)
+from taste_profile import update_taste_profile
+from context_builder import context_stats
+from query_embeddings import get_query_embedding_cache
+from history_manager import load_conversation_history, save_conversation_history
+from http_json import HTTPError, start_server, write_json, write_stream, write_text
+from tracing import span, record_usage, stream_options, metrics_snapshot, prometheus_text
+
+load_dotenv()
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8000"))
+SERVICE_MAX_CONCURRENCY = int(os.getenv("SERVICE_MAX_CONCURRENCY", "16"))  # requests running at once
+SERVICE_MAX_QUEUE = int(os.getenv("SERVICE_MAX_QUEUE", "64"))              # requests waiting for a slot
+SERVICE_MAX_CONNECTIONS = int(os.getenv("SERVICE_MAX_CONNECTIONS", "32"))  # pooled connections to Azure
+SERVICE_LLM_TIMEOUT = float(os.getenv("SERVICE_LLM_TIMEOUT", "60"))
+
+
+class StreamFailed(Exception):
+    """A streamed answer failed after its 200 header went out; the client got an error event instead."""
+
+
+class RecommendationService:
+    """Shared clients, admission control and the async request flow."""
+
+    def __init__(self, azure_client=None, deployment=None, collection=None,
+                 max_concurrency=SERVICE_MAX_CONCURRENCY, max_queue=SERVICE_MAX_QUEUE):
+        if azure_client is None:
+            azure_client, deployment = init_async_azure_client(SERVICE_MAX_CONNECTIONS, SERVICE_LLM_TIMEOUT)
+        if collection is None:
+            _, collection = init_chromadb_collection()
+        self.azure_client = azure_client
+        self.deployment = deployment
+        self.collection = collection
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.admitted = 0
+        self.running = 0
+        self.counts = {"requests": 0, "completed": 0, "rejected": 0, "errors": 0,
+                       "cache": 0, "router": 0, "llm": 0}
+        self.latency_total = 0.0
+
+    def _cached_answer(self, response_cache, user_input, user_id):
+        response_cache.bind_version(current_index_version())
+        return response_cache.get_for_input(user_input, user_id)
+
+    async def iter_answer(self, user_input, use_cache=True, use_router=True, stream=True, info=None, user_id=None):
+        """
+        Async generator of answer text; `info` (a dict) receives the seed
+        movies, recommendations, which path served the request and the
+        estimated size of the tool payloads. History is
+        read and extended for `user_id` (default HISTORY_USER).
+        """
+        with span("chat_request") as request_span:
+            info = {} if info is None else info
+            response_cache = get_response_cache(PROMPT_VERSION) if use_cache else None
+            if response_cache is not None:
+                with span("response_cache.lookup") as lookup_span:
+                    cached = await asyncio.to_thread(self._cached_answer, response_cache, user_input, user_id)
+                    lookup_span.set(hit=cached is not None)
+                if cached is not None:
+                    info["path"] = "cache"
+                    request_span.set(path="cache")
+                    await asyncio.to_thread(save_conversation_history, cached["seed_titles"], user_id)
+                    yield cached["answer"]
+                    await asyncio.to_thread(update_taste_profile, cached.get("seed_ids"), self.collection, user_id)
+                    return
+
+            conversation_history = await asyncio.to_thread(load_conversation_history, user_id)
+            messages = [
+                {"role": "system", "content": build_system_prompt(conversation_history)},
+                {"role": "user", "content": user_input},
+            ]
+
+            router = get_intent_router() if use_router else None
+            route = None
+            if router is not None:
+                with span("router") as router_span:
+                    route = await asyncio.to_thread(router.route, user_input, self.collection,
+                                                    current_index_version())
+                    router_span.set(routed=route is not None)
+            request_span.set(path="router" if route is not None else "llm")
+            if route is not None:
+                info["path"] = "router"
+                func_args = {"query": route["query"]}
+                tool = {
+                    "id": "call_local_router",
+                    "type": "function",
+                    "function": {"name": RECOMMENDATION_TOOL, "arguments": json.dumps(func_args)}
+                }
+                calls = [(tool, func_args, route["movie_ids"])]
+            else:
+                info["path"] = "llm"
+                with span("llm.tool_choice"):
+                    response = await self.azure_client.chat.completions.create(
+                        model=self.deployment,
+                        messages=messages,
+                        tools=tools,
+                        tool_choice="auto"
+                    )
+                    record_usage(getattr(response, "usage", None), "tool_choice")
+                msg = response.choices[0].message
+                calls = recommendation_calls(msg.tool_calls)
+                if not calls:
+                    yield msg.content or ""
+                    return
+
+            with span("tools", calls=len(calls)):
+                results = await asyncio.to_thread(run_recommendation_calls, calls, self.collection, 5,
+                                                  user_id=user_id)
+            info["seed_movies"] = [movie for result in results for movie in result["seed_movies"]]
+            info["recommendations"] = [movie for result in results for movie in result["recommendations"]]
+            failure = failure_message(results)
+            if failure:
+                yield failure
+                return
+
+            seed_ids, recommendation_ids, seed_titles = answer_cache_ids(results)
+            await asyncio.to_thread(save_conversation_history, seed_titles, user_id)
+            await asyncio.to_thread(update_taste_profile, seed_ids, self.collection, user_id)
+            if uses_taste_profile(results):
+                response_cache = None  # the profile moves with every new like, so don't reuse these answers
+            if response_cache is not None:
+                # put() embeds the input when RESPONSE_CACHE_SEMANTIC=1, so cache calls stay off the event loop
+                cached = await asyncio.to_thread(response_cache.get_answer, seed_ids, recommendation_ids)
+                if cached is not None:
+                    await asyncio.to_thread(response_cache.put, user_input, seed_ids, recommendation_ids,
+                                            cached["answer"], seed_titles, user_id)
+                    yield cached["answer"]
+                    return
+
+            messages.extend(tool_messages(results, info=info))
+
+            with span("llm.answer", stream=stream) as answer_span:
+                if stream:
+                    parts = []
+                    started = time.perf_counter()
+                    chunks = await self.azure_client.chat.completions.create(
+                        model=self.deployment,
+                        messages=messages,
+                        stream=True,
+                        **stream_options()
+                    )
+                    async for chunk in chunks:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            if not parts:
+                                answer_span.set(first_token_ms=round((time.perf_counter() - started) * 1000, 3))
+                            parts.append(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+                        record_usage(getattr(chunk, "usage", None), "answer")
+                    answer = "".join(parts)
+                else:
+                    final = await self.azure_client.chat.completions.create(model=self.deployment, messages=messages)
+                    record_usage(getattr(final, "usage", None), "answer")
+                    answer = final.choices[0].message.content or ""
+                    yield answer
+
+            if response_cache is not None and answer:
+                await asyncio.to_thread(response_cache.put, user_input, seed_ids, recommendation_ids, answer,
+                                        seed_titles, user_id)
+
+    def _admit(self):
+        """Reserves a place for a request, or refuses it when the queue is full."""
+        self.counts["requests"] += 1
+        if self.admitted >= self.max_concurrency + self.max_queue:
+            self.counts["rejected"] += 1
+            raise HTTPError(503, "Server is busy, retry shortly", {"Retry-After": "1"})
+        self.admitted += 1
+
+    async def _run(self, work):
+        """Runs `work()` in a concurrency slot, keeping counters and latency."""
+        self._admit()
+        start = time.perf_counter()
+        try:
+            async with self._slots:
+                self.running += 1
+                try:
+                    result = await work()
+                finally:
+                    self.running -= 1
+            self.counts["completed"] += 1
+            return result
+        except HTTPError:
+            raise
+        except Exception:
+            self.counts["errors"] += 1
+            raise
+        finally:
+            self.admitted -= 1
+            self.latency_total += time.perf_counter() - start
+
+    async def handle(self, request, writer):
+        if request.method == "GET" and request.path == "/health":
+            await write_json(writer, 200, {"status": "ok", "running": self.running,
+                                           "queued": self.admitted - self.running}, keep_alive=request.keep_alive)
+            return
+        if request.method == "GET" and request.path == "/stats":
+            await write_json(writer, 200, self.stats(), keep_alive=request.keep_alive)
+            return
+        if request.method == "GET" and request.path == "/metrics":
+            text = await asyncio.to_thread(prometheus_text)
+            await write_text(writer, 200, text, "text/plain; version=0.0.4", keep_alive=request.keep_alive)
+            return
+        if request.path != "/recommend":
+            raise HTTPError(404)
+        if request.method != "POST":
+            raise HTTPError(405)
+
+        body = request.json()
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        message = str(body.get("message") or "").strip()
+        if not message:
+            raise HTTPError(400, "'message' is required")
+        options = {"use_cache": body.get("use_cache", True) is not False,
+                   "use_router": body.get("use_router", True) is not False,
+                   "user_id": str(body.get("user_id") or "").strip() or None}
+        info = {}
+
+        if body.get("stream"):
+            failures = []
+
+            async def ndjson():
+                try:
+                    async for text in self.iter_answer(message, stream=True, info=info, **options):
+                        yield json.dumps({"delta": text}, ensure_ascii=False) + "\n"
+                except Exception as e:  # pylint: disable=broad-except
+                    # the 200 header is already sent: end the stream with an error event, not a second response
+                    print(f"Error streaming answer: {e}")
+                    failures.append(e)
+                    yield json.dumps({"done": True, "error": "Internal server error"}) + "\n"
+                    return
+                yield json.dumps({"done": True, **info}, ensure_ascii=False) + "\n"
+
+            async def stream():
+                await write_stream(writer, ndjson(), keep_alive=request.keep_alive)
+                if failures:
+                    raise StreamFailed() from failures[0]  # counted as an error by _run
+
+            try:
+                await self._run(stream)
+            except StreamFailed:
+                return
+        else:
+            async def complete():
+                return "".join([text async for text in self.iter_answer(message, stream=False, info=info, **options)])
+            answer = await self._run(complete)
+            await write_json(writer, 200, {"answer": answer, **info}, keep_alive=request.keep_alive)
+        self.counts[info.get("path", "llm")] += 1
+
+    def stats(self):
+        result_cache = get_result_cache()
+        response_cache = get_response_cache(PROMPT_VERSION)
+        router = get_intent_router()
+        query_cache = get_query_embedding_cache()
+        finished = self.counts["completed"] + self.counts["errors"]
+        return {
+            "service": {**self.counts, "running": self.running, "queued": self.admitted - self.running,
+                        "max_concurrency": self.max_concurrency, "max_queue": self.max_queue,
+                        "mean_latency_s": self.latency_total / finished if finished else 0.0},
+            "result_cache": result_cache.stats() if result_cache else None,
+            "response_cache": response_cache.stats() if response_cache else None,
+            "router": router.stats() if router else None,
+            "context": context_stats(),
+            "query_embeddings": query_cache.stats() if query_cache else None,
+            "tracing": metrics_snapshot(),
+        }
+
+
+async def serve(host=SERVICE_HOST, port=SERVICE_PORT, service=None):
+    service = service or RecommendationService()
+    server = await start_server(service.handle, host, port)
+    print(f"Recommendation service listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async movie recommendation HTTP service.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--max-concurrency", type=int, default=SERVICE_MAX_CONCURRENCY)
+    parser.add_argument("--max-queue", type=int, default=SERVICE_MAX_QUEUE)
+    args = parser.parse_args()
+
+    async def run():
+        service = RecommendationService(max_concurrency=args.max_concurrency, max_queue=args.max_queue)
+        await serve(args.host, args.port, service)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
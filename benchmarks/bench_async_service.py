@@ -0,0 +1,123 @@
+"""
+Load test for async_service against a local fake LLM server.
+
+Starts FakeChatServer and the recommendation service in one event loop over
+a synthetic catalog, then fires requests at increasing client concurrency.
+Reports throughput, p50/p95/p99 latency, and how many requests were refused
+with 503 by admission control. Half the inputs name a movie (router fast path,
+one LLM call), half need the tool-choice call (two LLM calls).
+
+    python -m benchmarks.bench_async_service --requests 400 --concurrency 1 16 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+import chromadb
+import httpx
+import numpy as np
+import history_manager
+from openai import AsyncAzureOpenAI
+from async_service import RecommendationService
+from fake_azure import FakeChatServer
+from http_json import start_server
+from benchmarks.bench_vector_backend import synthetic_field_vectors, build_collection
+
+
+def make_inputs(ids, n, seed=0):
+    rng = random.Random(seed)
+    inputs = []
+    for _ in range(n):
+        movie_id = rng.choice(ids)
+        if rng.random() < 0.5:
+            inputs.append(f"I love Movie {movie_id}")
+        else:
+            inputs.append(f"Movie {movie_id}, but darker please?")
+    return inputs
+
+
+async def _fire(client, url, inputs, concurrency, stream):
+    latencies, statuses = [], []
+    queue = list(inputs)
+
+    async def worker():
+        while queue:
+            message = queue.pop()
+            start = time.perf_counter()
+            response = await client.post(url, json={"message": message, "stream": stream, "use_cache": False})
+            await response.aread()
+            latencies.append(time.perf_counter() - start)
+            statuses.append(response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, np.array(latencies) * 1000, statuses
+
+
+async def run(size, n_requests, concurrencies, max_concurrency, max_queue, llm_latency, stream, work_dir):
+    history_manager.HISTORY_DB = os.path.join(work_dir, "history.sqlite3")
+    history_manager.HISTORY_FILE = os.path.join(work_dir, "history.json")  # nothing to import
+    ids = [f"tt{i:07d}" for i in range(size)]
+    collection = build_collection(chromadb.PersistentClient(path=os.path.join(work_dir, "chroma")),
+                                  ids, synthetic_field_vectors(size, 64))
+    llm = await FakeChatServer(latency=llm_latency, first_token_latency=llm_latency / 4).start()
+    azure_client = AsyncAzureOpenAI(azure_endpoint=llm.endpoint, api_key="fake", api_version="2024-05-01-preview",
+                                    http_client=httpx.AsyncClient(limits=httpx.Limits(max_connections=256)))
+    service = RecommendationService(azure_client, "fake-chat", collection,
+                                    max_concurrency=max_concurrency, max_queue=max_queue)
+    server = await start_server(service.handle, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/recommend"
+
+    reports = []
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=1024), timeout=120) as client:
+        await _fire(client, url, make_inputs(ids, 4), 1, stream)   # warm up title index / caches
+        for concurrency in concurrencies:
+            inputs = make_inputs(ids, n_requests, seed=concurrency)
+            llm_calls = llm.calls
+            elapsed, latencies, statuses = await _fire(client, url, inputs, concurrency, stream)
+            ok = latencies[np.array(statuses) == 200]
+            report = {
+                "client_concurrency": concurrency, "max_concurrency": max_concurrency, "max_queue": max_queue,
+                "requests": n_requests, "ok": len(ok), "rejected_503": statuses.count(503),
+                "errors": sum(status not in (200, 503) for status in statuses),
+                "throughput_rps": round(len(ok) / elapsed, 1),
+                "p50_ms": round(float(np.percentile(ok, 50)), 1) if len(ok) else None,
+                "p95_ms": round(float(np.percentile(ok, 95)), 1) if len(ok) else None,
+                "p99_ms": round(float(np.percentile(ok, 99)), 1) if len(ok) else None,
+                "llm_calls_per_request": round((llm.calls - llm_calls) / max(len(ok), 1), 2),
+            }
+            reports.append(report)
+            print(json.dumps(report))
+    # close pooled keep-alive connections first, or wait_closed() waits on them
+    await azure_client.close()
+    server.close()
+    await server.wait_closed()
+    await llm.stop()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--max-queue", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per fake LLM call")
+    parser.add_argument("--stream", action="store_true", help="request NDJSON streaming responses")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        reports = asyncio.run(run(args.size, args.requests, args.concurrency, args.max_concurrency,
+                                  args.max_queue, args.llm_latency, args.stream, work_dir))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+find_similar_movies_bulk throughput across batch sizes, workers and backends.
+
+    python -m benchmarks.bench_bulk_recommendations --size 5000 --seed-sets 2000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import chromadb
+import vector_store
+from db_utils import find_similar_movies_bulk
+from vector_store import export_vectors
+from benchmarks.bench_vector_backend import synthetic_field_vectors, build_collection
+
+
+def run(size, dim, n_seed_sets, batch_sizes, workers, work_dir):
+    ids = [f"tt{i:07d}" for i in range(size)]
+    collection = build_collection(chromadb.PersistentClient(path=os.path.join(work_dir, "chroma")),
+                                  ids, synthetic_field_vectors(size, dim))
+    store_dir = os.path.join(work_dir, "store")
+    export_vectors(collection, store_dir, "float32")
+    vector_store.VECTOR_STORE_DIR = store_dir
+
+    rng = random.Random(0)
+    seed_sets = [rng.sample(ids, rng.randint(1, 3)) for _ in range(n_seed_sets)]
+    reports = []
+    for backend in ("chroma", "numpy"):
+        for batch_size in batch_sizes:
+            for max_workers in workers:
+                start = time.perf_counter()
+                produced = sum(1 for _ in find_similar_movies_bulk(
+                    seed_sets, collection, n_results=10, backend=backend,
+                    batch_size=batch_size, max_workers=max_workers))
+                elapsed = time.perf_counter() - start
+                report = {"backend": backend, "batch_size": batch_size, "workers": max_workers,
+                          "seed_sets": produced, "seed_sets_per_second": round(produced / elapsed, 1)}
+                reports.append(report)
+                print(json.dumps(report))
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--seed-sets", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        reports = run(args.size, args.dim, args.seed_sets, args.batch_sizes, args.workers, work_dir)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
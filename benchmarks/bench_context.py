@@ -0,0 +1,68 @@
+"""
+Tool payload size vs n_results: the old `json.dumps(indent=2)` payload
+against context_builder's budgeted one.
+
+Movies are synthetic with overview lengths typical of the TMDB catalog
+(300-900 characters). Reports estimated tokens (the prompt size of the
+follow-up completion) and the time to build the payload.
+
+    python -m benchmarks.bench_context --n-results 5 10 20 50 100 --budget 1500
+"""
+import argparse
+import json
+import random
+import time
+from context_builder import build_tool_contents, estimate_tokens
+
+WORDS = ("a young detective must uncover the truth behind a mysterious disappearance in a small town "
+         "while an old friend returns with secrets of his own and the family fights to survive").split()
+
+
+def synthetic_movie(i, rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(55, 160))]
+    overview = ". ".join(" ".join(words[j:j + 14]).capitalize() for j in range(0, len(words), 14)) + "."
+    return {"imdb_id": f"tt{i:07d}", "title": f"Movie {i}", "overview": overview,
+            "genre": rng.choice(["Drama, Thriller", "Comedy", "Action, Adventure, Science Fiction"]),
+            "popularity": rng.uniform(1, 300), "similarity_score": rng.uniform(0.2, 0.9)}
+
+
+def run(n_results_list, budget, seeds, repeats):
+    rng = random.Random(0)
+    reports = []
+    for n_results in n_results_list:
+        payload = {"seed_movies": [synthetic_movie(i, rng) for i in range(seeds)],
+                   "recommendations": [synthetic_movie(1000 + i, rng) for i in range(n_results)]}
+        start = time.perf_counter()
+        for _ in range(repeats):
+            legacy = json.dumps(payload, indent=2)
+        legacy_ms = (time.perf_counter() - start) / repeats * 1000
+        start = time.perf_counter()
+        for _ in range(repeats):
+            contents, report = build_tool_contents([payload], budget)
+        built_ms = (time.perf_counter() - start) / repeats * 1000
+        report = {"n_results": n_results, "seeds": seeds, "budget": budget,
+                  "legacy_tokens": estimate_tokens(legacy), "budgeted_tokens": report["estimated_tokens"],
+                  "recommendations_kept": n_results - report["dropped_recommendations"],
+                  "legacy_build_ms": round(legacy_ms, 3), "budgeted_build_ms": round(built_ms, 3)}
+        reports.append(report)
+        print(json.dumps(report))
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n-results", type=int, nargs="+", default=[5, 10, 20, 50, 100])
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--seeds", type=int, default=2)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    reports = run(args.n_results, args.budget, args.seeds, args.repeats)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
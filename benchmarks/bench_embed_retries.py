@@ -0,0 +1,98 @@
+"""
+Retry behaviour of the batch embedding pipeline against injected failures.
+
+Runs BatchEmbedder against a FakeAzureClient that throttles (429) or fails
+(5xx / 400) on chosen requests, with sleeping recorded instead of done, and
+checks for each scenario that:
+
+  - every retryable failure was retried once (stats["retries"] equals the
+    failures the fake injected) and the vectors still come back complete and
+    in input order;
+  - a Retry-After header sets the wait, and without one the wait follows
+    the exponential backoff;
+  - requests that keep failing past max_retries, and non-retryable errors,
+    raise instead of returning partial results.
+
+Exits non-zero when a check fails.
+
+    python -m benchmarks.bench_embed_retries --texts 200
+"""
+import argparse
+import json
+import sys
+import time
+from embeddings import BatchEmbedder
+from fake_azure import FakeAzureClient, FakeAPIError, fake_vector
+
+DIM = 16
+BATCH_SIZE = 8
+BACKOFF_BASE = 1.0
+
+SCENARIOS = [
+    # name, client options, embedder options, expected outcome
+    ("clean", {}, {}, "ok"),
+    ("throttled_start", {"fail_first": 3, "fail_status": 429, "retry_after": 2}, {}, "ok"),
+    ("flaky_5xx", {"fail_every": 4, "fail_status": 503, "retry_after": None}, {}, "ok"),
+    ("exhausted", {"fail_first": 100, "fail_status": 429}, {"max_retries": 3, "max_workers": 1}, "raises"),
+    ("bad_request", {"fail_first": 1, "fail_status": 400}, {"max_workers": 1}, "raises"),
+]
+
+
+def run(name, client_options, embedder_options, expected, texts):
+    client = FakeAzureClient(dim=DIM, **client_options)
+    sleeps = []
+    embedder = BatchEmbedder(client=client, cache=False, batch_size=BATCH_SIZE, backoff_base=BACKOFF_BASE,
+                             sleep=sleeps.append, **embedder_options)
+    report = {"scenario": name, "requests": None, "failures": None, "retries": None}
+    errors = []
+    start = time.perf_counter()
+    try:
+        vectors = embedder.embed(texts)
+        outcome = "ok"
+    except FakeAPIError as e:
+        vectors, outcome = None, "raises"
+        report["error_status"] = e.status_code
+    report.update(requests=client.calls, failures=client.failures, retries=embedder.stats["retries"],
+                  seconds=round(time.perf_counter() - start, 4), outcome=outcome,
+                  slept_s=round(sum(sleeps), 3))
+
+    if outcome != expected:
+        errors.append(f"expected {expected}, got {outcome}")
+    if outcome == "ok":
+        if embedder.stats["retries"] != client.failures:
+            errors.append(f"{client.failures} injected failures but {embedder.stats['retries']} retries")
+        if len(vectors) != len(texts) or any(v != fake_vector(t, DIM) for v, t in zip(vectors, texts)):
+            errors.append("vectors missing or out of order")
+    retry_after = client_options.get("retry_after", 0)
+    if retry_after is not None and any(s != retry_after for s in sleeps):
+        errors.append(f"waits {sleeps[:5]} don't follow Retry-After {retry_after}")
+    if retry_after is None and sleeps and not all(BACKOFF_BASE * 0.5 <= s <= embedder.backoff_max for s in sleeps):
+        errors.append(f"waits {sleeps[:5]} outside the backoff range")
+    if name == "exhausted" and client.calls != embedder_options["max_retries"] + 1:
+        errors.append(f"gave up after {client.calls} requests, expected {embedder_options['max_retries'] + 1}")
+    if name == "bad_request" and embedder.stats["retries"]:
+        errors.append("a 400 was retried")
+    report["errors"] = errors
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=200)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    texts = [f"Plot: synthetic movie {i}" for i in range(args.texts)]
+    reports = [run(name, client_options, embedder_options, expected, texts)
+               for name, client_options, embedder_options, expected in SCENARIOS]
+    for report in reports:
+        print(json.dumps(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+    if any(report["errors"] for report in reports):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Filtered search benchmark: filters applied inside the search (a bitmap mask
+for the NumPy backend; for ChromaDB, depending on how many movies match,
+exact scoring of all of them, every field's query limited to their IDs, or
+oversampled queries post-filtered; see db_utils._filter_args) against the
+naive alternative of over-fetching unfiltered results and dropping the
+non-matching ones afterwards.
+
+The synthetic catalog carries typed metadata (genres, year, runtime,
+language) drawn so that filters range from broad to very selective.
+"Complete" is the share of queries that got all k results; recall@k is
+measured against an exact, brute-force filtered search.
+
+    python -m benchmarks.bench_filtered_search --size 20000 --dim 256
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import numpy as np
+import chromadb
+from db_utils import resolve_weights, find_similar_movies, _similar_batch_numpy, _filter_args
+from metadata_index import typed_metadata, normalize_filters, get_store_metadata_index
+from vector_store import export_vectors, NumpyVectorStore
+from benchmarks.bench_vector_backend import build_collection, synthetic_field_vectors, _recall
+
+GENRES = ["Drama", "Comedy", "Thriller", "Action", "Romance", "Horror", "Science Fiction", "Animation",
+          "Documentary", "Western"]
+GENRE_WEIGHTS = [30, 25, 15, 12, 8, 5, 3, 1, 0.6, 0.4]
+LANGUAGES = ["en"] * 16 + ["fr", "es", "ja", "de"]
+
+FILTERS = {
+    "comedy": {"genres": ["Comedy"]},
+    "90s_drama": {"genres": ["Drama"], "year_min": 1990, "year_max": 1999},
+    "short_french": {"language": "fr", "runtime_max": 100},
+    "sci_fi_animation": {"genres": ["Science Fiction", "Animation"]},
+}
+
+
+def synthetic_metadatas(ids, seed=0):
+    rng = random.Random(seed)
+    metadatas = []
+    for movie_id in ids:
+        genres = list(dict.fromkeys(rng.choices(GENRES, GENRE_WEIGHTS, k=rng.randint(1, 3))))
+        movie = {"genres": str([{"id": i, "name": name} for i, name in enumerate(genres)]),
+                 "original_language": rng.choice(LANGUAGES), "runtime": rng.randint(75, 170)}
+        metadatas.append({"title": f"Movie {movie_id}", "title_lower": f"movie {movie_id}", "popularity": 1.0,
+                          "year": rng.randint(1950, 2020), **typed_metadata(movie)})
+    return metadatas
+
+
+def exact_filtered(store, allowed, seeds, k, weights):
+    """Brute-force reference: the full unfiltered ranking, then the first k matching movies."""
+    ranking = _similar_batch_numpy(store, [seeds], len(store), weights)[0]
+    return [movie["imdb_id"] for movie in ranking if movie["imdb_id"] in allowed][:k]
+
+
+def post_filtered(search, allowed, k, overfetch):
+    return [movie for movie in search(k * overfetch) if movie["imdb_id"] in allowed][:k]
+
+
+def _time(fn, seed_sets):
+    latencies, results = [], []
+    for seeds in seed_sets:
+        start = time.perf_counter()
+        results.append([movie["imdb_id"] for movie in fn(seeds)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, results
+
+
+def run(size, dim, n_queries, k, overfetch, work_dir):
+    ids = [f"tt{i:07d}" for i in range(size)]
+    collection = build_collection(chromadb.PersistentClient(path=os.path.join(work_dir, "chroma")), ids,
+                                  synthetic_field_vectors(size, dim), metadatas=synthetic_metadatas(ids))
+    store_dir = os.path.join(work_dir, "store")
+    export_vectors(collection, store_dir, "float32")
+    store = NumpyVectorStore(store_dir)
+    index = get_store_metadata_index(store)
+    weights = resolve_weights(None)
+    rng = random.Random(size)
+    seed_sets = [rng.sample(ids, rng.randint(1, 3)) for _ in range(n_queries)]
+
+    reports = []
+    for name, raw_filters in FILTERS.items():
+        filters = normalize_filters(raw_filters)
+        mask = index.mask(filters)
+        allowed = set(index.allowed_ids(filters))
+        chroma_args = _filter_args(filters, collection, None)
+        reference = [exact_filtered(store, allowed, seeds, k, weights) for seeds in seed_sets]
+
+        def numpy_post(seeds):
+            return post_filtered(lambda n: _similar_batch_numpy(store, [seeds], n, weights)[0], allowed, k, overfetch)
+
+        def chroma_post(seeds):
+            return post_filtered(lambda n: find_similar_movies(seeds, collection, n, backend="chroma"),
+                                 allowed, k, overfetch)
+
+        variants = {
+            "numpy_unfiltered": lambda seeds: _similar_batch_numpy(store, [seeds], k, weights)[0],
+            "numpy_filtered": lambda seeds: _similar_batch_numpy(store, [seeds], k, weights, mask=mask)[0],
+            "numpy_post_filter": numpy_post,
+            "chroma_unfiltered": lambda seeds: find_similar_movies(seeds, collection, k, backend="chroma"),
+            "chroma_filtered": lambda seeds: find_similar_movies(seeds, collection, k, backend="chroma",
+                                                                 filters=filters),
+            "chroma_post_filter": chroma_post,
+        }
+        report = {"size": size, "dim": dim, "k": k, "filter": name, "selectivity": round(len(allowed) / size, 4),
+                  "chroma_mode": "exact" if chroma_args.get("exact") else "ids" if "ids" in chroma_args else
+                                 "oversample"}
+        for variant, fn in variants.items():
+            fn(seed_sets[0])  # warm up caches / page in the matrices
+            latencies, results = _time(fn, seed_sets)
+            report[variant] = {"p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                               "p99_ms": round(float(np.percentile(latencies, 99)), 3)}
+            if not variant.endswith("unfiltered"):
+                report[variant]["complete"] = round(sum(len(r) == k for r in results) / len(results), 4)
+                report[variant]["recall_at_k"] = round(_recall(results, reference), 4)
+        reports.append(report)
+        print(json.dumps(report))
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--overfetch", type=int, default=4, help="post-filter fetches k * overfetch results")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        reports = run(args.size, args.dim, args.queries, args.k, args.overfetch, work_dir)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+History save cost: the SQLite HistoryStore vs the old JSON file rewrite.
+
+Grows a history to `--size` titles one request at a time (a few seed titles
+per request, some already liked), then times saves of new and of repeated
+titles at that size. Also runs `--threads` writers against one store and
+checks that no title was lost or duplicated.
+
+Finally it replays chat turns that like a movie, update the taste profile
+and then save titles the history already holds, and counts the SQL each
+such save runs. After the process's own profile update it should run
+nothing but the PRAGMA data_version check; after a write from another
+connection, one SELECT reloading the titles and no write transaction.
+Exits non-zero when either count is off.
+
+    python -m benchmarks.bench_history --size 5000 --threads 8
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+from app_utils import init_chromadb_collection
+from db_utils import batch_embed_texts, index_movie_vectors
+from embeddings import BatchEmbedder
+from fake_azure import FakeAzureClient
+from history_manager import HistoryStore
+from taste_profile import TasteProfileStore
+from benchmarks.synthetic_catalog import synthetic_movies
+
+
+def legacy_save(path, history):
+    """The previous save_conversation_history: read, dedupe and rewrite the whole JSON file."""
+    current = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            current = json.load(file)
+    existing = {movie.lower() for movie in current}
+    updated = False
+    for entry in history:
+        if entry.lower() not in existing:
+            current.append(entry)
+            existing.add(entry.lower())
+            updated = True
+    if updated:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(current, file, indent=4, ensure_ascii=False)
+    return current
+
+
+def _requests(size, per_request, seed):
+    rng = random.Random(seed)
+    titles = [f"Movie {i}" for i in range(size)]
+    batches = [titles[i:i + per_request] for i in range(0, size, per_request)]
+    # roughly one title in four was liked before
+    return [batch + [rng.choice(titles[:max(i * per_request, 1)])] for i, batch in enumerate(batches)]
+
+
+def _time_saves(save, batches):
+    latencies = []
+    for batch in batches:
+        start = time.perf_counter()
+        save(batch)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3)}
+
+
+def run(size, per_request, threads, work_dir):
+    json_path = os.path.join(work_dir, "history.json")
+    store = HistoryStore(os.path.join(work_dir, "history.sqlite3"))
+    grow = _requests(size, per_request, seed=0)
+    new = [[f"New {i}-{j}" for j in range(per_request)] for i in range(200)]
+    repeat = [[f"Movie {i}"] for i in range(0, size, max(size // 200, 1))]
+
+    reports = []
+    for name, save in (("json_rewrite", lambda batch: legacy_save(json_path, batch)),
+                       ("sqlite_store", store.add)):
+        start = time.perf_counter()
+        for batch in grow:
+            save(batch)
+        report = {"backend": name, "history_size": size,
+                  "grow_total_s": round(time.perf_counter() - start, 3),
+                  "save_new": _time_saves(save, new),
+                  "save_repeat": _time_saves(save, repeat)}
+        reports.append(report)
+        print(json.dumps(report))
+
+    # concurrent writers, each a different "session" sharing half their titles
+    shared = HistoryStore(os.path.join(work_dir, "shared.sqlite3"))
+    def writer(n):
+        for i in range(200):
+            shared.add([f"Shared {i}", f"Own {n}-{i}"], user_id="shared")
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    titles = shared.load("shared")
+    report = {"backend": "sqlite_store", "threads": threads,
+              "concurrent_s": round(time.perf_counter() - start, 3),
+              "titles": len(titles), "expected": 200 + threads * 200,
+              "duplicates": len(titles) - len({title.lower() for title in titles})}
+    reports.append(report)
+    print(json.dumps(report))
+    store.close()
+    shared.close()
+    return reports
+
+
+def _statements(store, fn):
+    """SQL statements `fn` runs on `store`'s connection, the data_version check left out."""
+    conn, _ = store.shared_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        fn()
+    finally:
+        conn.set_trace_callback(None)
+    return [s for s in statements if s != "PRAGMA data_version"]
+
+
+def run_profile_turns(turns, work_dir):
+    """Saves of already-liked titles right after a taste-profile update, and after an outside write."""
+    movies = synthetic_movies(turns)
+    with contextlib.redirect_stdout(io.StringIO()):
+        vectors = batch_embed_texts(movies, embedder=BatchEmbedder(client=FakeAzureClient(dim=32), cache=False))
+        _, collection = init_chromadb_collection(os.path.join(work_dir, "chroma_db"))
+        index_movie_vectors(collection, movies, vectors)
+    path = os.path.join(work_dir, "profile.sqlite3")
+    history = HistoryStore(path)
+    profiles = TasteProfileStore(history)
+    other = HistoryStore(path)
+    titles = [movie["title"] for movie in movies]
+    history.add(titles, user_id="u")
+
+    after_profile, after_outside = [], []
+    for i, movie in enumerate(movies):
+        profiles.add("u", [movie["imdb_id"]], collection)
+        after_profile.append(len(_statements(history, lambda: history.add([titles[i]], user_id="u"))))
+        other.add([f"Other {i}"], user_id="other")
+        after_outside.append(_statements(history, lambda: history.add([titles[i]], user_id="u")))
+    report = {"scenario": "save_after_profile_update", "turns": turns,
+              "statements_after_own_profile_update": sum(after_profile),
+              "statements_after_outside_write": sum(len(s) for s in after_outside),
+              "writes_after_outside_write": sum(1 for s in after_outside for sql in s
+                                                if not sql.startswith("SELECT"))}
+    errors = []
+    if report["statements_after_own_profile_update"]:
+        errors.append("saves of known titles hit the database after the process's own profile update")
+    if report["writes_after_outside_write"] or report["statements_after_outside_write"] != turns:
+        errors.append("saves of known titles after an outside write did more than reload the history")
+    report["errors"] = errors
+    print(json.dumps(report))
+    history.close()
+    other.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--per-request", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--profile-turns", type=int, default=50)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        reports = run(args.size, args.per_request, args.threads, work_dir)
+        reports.append(run_profile_turns(args.profile_turns, work_dir))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+    if reports[-1]["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Lexical (BM25) index benchmark: build time, on-disk size and query latency
+over a synthetic catalog whose overviews follow a Zipf word distribution,
+plus the end-to-end topic_search latency (lexical + vector fusion) on the
+NumPy backend. None of it makes an embedding call.
+
+    python -m benchmarks.bench_lexical --sizes 5000 20000 --dim 256
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import numpy as np
+import chromadb
+import lexical_index
+import result_cache
+import vector_store
+from db_utils import topic_search
+from lexical_index import build_lexical_index, LexicalIndex
+from vector_store import export_vectors
+from benchmarks.bench_vector_backend import build_collection, synthetic_field_vectors
+
+TOPICS = ["car", "space", "heist", "vampire", "war", "robot", "love", "detective", "island", "zombie"]
+
+
+def synthetic_catalog(size, vocabulary=20000, seed=0):
+    """(documents, metadatas): Zipf-distributed overview words, some with a topic mixed in."""
+    rng = np.random.default_rng(seed)
+    words = [f"w{i}" for i in range(vocabulary)]
+    documents, metadatas = [], []
+    for i in range(size):
+        picks = np.minimum(rng.zipf(1.3, size=int(rng.integers(40, 120))), vocabulary) - 1
+        text = [words[p] for p in picks]
+        if rng.random() < 0.3:
+            text += list(rng.choice(TOPICS, size=int(rng.integers(1, 4))))
+        documents.append(" ".join(text))
+        metadatas.append({"title": f"Movie {i}", "title_lower": f"movie {i}", "genre": "Drama", "popularity": 1.0,
+                          "year": 2000, "language": "en", "runtime": 100})
+    return documents, metadatas
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def _percentiles(latencies):
+    return {"p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3)}
+
+
+def run(size, dim, n_queries, k, work_dir):
+    ids = [f"tt{i:07d}" for i in range(size)]
+    documents, metadatas = synthetic_catalog(size)
+    collection = build_collection(chromadb.PersistentClient(path=os.path.join(work_dir, f"chroma_{size}")), ids,
+                                  synthetic_field_vectors(size, dim), metadatas=metadatas, documents=documents)
+
+    index_dir = os.path.join(work_dir, f"lexical_{size}")
+    start = time.perf_counter()
+    build_lexical_index(collection, out_dir=index_dir)
+    build_s = time.perf_counter() - start
+    index = LexicalIndex(index_dir)
+
+    rng = random.Random(size)
+    queries = [" ".join(rng.sample(TOPICS, rng.randint(1, 3))) for _ in range(n_queries)]
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, limit=50)
+        latencies.append((time.perf_counter() - start) * 1000)
+    precision = np.mean([all(set(query.split()) & set(documents[int(movie_id[2:])].split())
+                             for movie_id, _ in index.search(query, limit=k)) for query in queries])
+
+    vector_store.VECTOR_STORE_DIR = os.path.join(work_dir, f"store_{size}")
+    export_vectors(collection, vector_store.VECTOR_STORE_DIR, "float32")
+    lexical_index.LEXICAL_INDEX_DIR = index_dir
+    topic_latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        topic_search(query, collection, n_results=k, backend="numpy")
+        topic_latencies.append((time.perf_counter() - start) * 1000)
+
+    report = {"size": size, "queries": n_queries, "terms": len(index.term_of), "postings": len(index.docs),
+              "build_seconds": round(build_s, 2), "index_mb": round(_dir_size(index_dir) / 2 ** 20, 2),
+              "bm25_search": _percentiles(latencies), "topic_search_numpy": _percentiles(topic_latencies),
+              "top_k_contain_query_term": round(float(precision), 4)}
+    print(json.dumps(report))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 20000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    result_cache.RESULT_CACHE_ENABLED = False  # time the searches, not cache hits
+    with tempfile.TemporaryDirectory() as work_dir:
+        reports = [run(size, args.dim, args.queries, args.k, work_dir) for size in args.sizes]
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
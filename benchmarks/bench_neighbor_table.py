@@ -0,0 +1,91 @@
+"""
+Single-seed latency: precomputed neighbor table lookup vs live NumPy search.
+
+Also times the full table build and an incremental update after a small
+share of the catalog changed.
+
+    python -m benchmarks.bench_neighbor_table --size 5000 --dim 1536
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import numpy as np
+import chromadb
+from db_utils import resolve_weights, _similar_batch_numpy
+from vector_store import export_vectors, NumpyVectorStore
+from neighbor_table import NeighborTable, build_neighbor_table, update_neighbor_table
+from benchmarks.bench_vector_backend import synthetic_field_vectors, build_collection
+
+
+def _percentiles(latencies_ms):
+    return {"p50_us": round(float(np.percentile(latencies_ms, 50)) * 1000, 1),
+            "p99_us": round(float(np.percentile(latencies_ms, 99)) * 1000, 1)}
+
+
+def run(size, dim, n_queries, k, changed_fraction, work_dir):
+    ids = [f"tt{i:07d}" for i in range(size)]
+    vectors = synthetic_field_vectors(size, dim)
+    collection = build_collection(chromadb.PersistentClient(path=os.path.join(work_dir, "chroma")), ids, vectors)
+    store_dir, table_dir = os.path.join(work_dir, "store"), os.path.join(work_dir, "table")
+    export_vectors(collection, store_dir, "float32")
+    store = NumpyVectorStore(store_dir)
+    weights = resolve_weights(None)
+    hashes = {movie_id: "v1" for movie_id in ids}
+
+    start = time.perf_counter()
+    build_neighbor_table(store, weights, hashes, out_dir=table_dir)
+    build_s = time.perf_counter() - start
+    table = NeighborTable(table_dir)
+
+    seeds = random.Random(0).sample(ids, n_queries)
+    report = {"size": size, "dim": dim, "queries": n_queries, "k": k, "build_seconds": round(build_s, 2)}
+    for name, fn in [("table_lookup", lambda seed: table.lookup(seed, k)),
+                     ("live_numpy", lambda seed: _similar_batch_numpy(store, [[seed]], k, weights)[0])]:
+        latencies = []
+        for seed in seeds:
+            start = time.perf_counter()
+            fn(seed)
+            latencies.append((time.perf_counter() - start) * 1000)
+        report[name] = _percentiles(np.array(latencies))
+
+    # re-embed a slice of the catalog and update the table incrementally
+    changed = random.Random(1).sample(range(size), int(size * changed_fraction))
+    rng = np.random.default_rng(1)
+    for field, field_collection in collection.fields.items():
+        fresh = rng.normal(size=(len(changed), dim)).astype(np.float32)
+        fresh /= np.linalg.norm(fresh, axis=1, keepdims=True)
+        field_collection.upsert(ids=[ids[i] for i in changed], embeddings=fresh)
+    export_vectors(collection, store_dir, "float32")
+    store = NumpyVectorStore(store_dir)
+    for i in changed:
+        hashes[ids[i]] = "v2"
+    start = time.perf_counter()
+    update_neighbor_table(store, weights, hashes, out_dir=table_dir)
+    report["incremental_update_seconds"] = round(time.perf_counter() - start, 2)
+    report["changed_movies"] = len(changed)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--changed-fraction", type=float, default=0.01)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        report = run(args.size, args.dim, args.queries, args.k, args.changed_fraction, work_dir)
+    print(json.dumps(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
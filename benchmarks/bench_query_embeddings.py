@@ -0,0 +1,92 @@
+"""
+Query-embedding cache benchmark for free-text descriptions.
+
+Replays a chat-like workload against a FakeAzureClient with a realistic
+embedding round trip: popular descriptions come back often (Zipf), and
+near-repeats differ in case and punctuation ("heist movie with a twist
+ending" / "Heist movie with a twist ending!"), which share a cache entry,
+or in filler words ("show me a heist movie..."), which don't. Reports embedding API calls,
+cache hit rate and per-query latency with and without the LRU.
+
+    python -m benchmarks.bench_query_embeddings --queries 2000 --latency 0.12
+"""
+import argparse
+import json
+import random
+import time
+import numpy as np
+from embeddings import BatchEmbedder
+from fake_azure import FakeAzureClient
+import query_embeddings
+from query_embeddings import QueryEmbeddingCache, embed_query
+
+DESCRIPTIONS = [
+    "heist movie with a twist ending", "lonely robot falls in love", "detective hunting a serial killer",
+    "astronauts stranded on mars", "small town haunted by a ghost", "road trip with an old friend",
+    "time travel paradox thriller", "underdog boxer fights for a title", "survival on a deserted island",
+    "spy betrayed by his own agency", "family road trip comedy", "zombie outbreak in a city",
+    "coming of age story at summer camp", "courtroom drama about a wrongful conviction",
+    "dog finds its way home", "revenge story in the old west",
+]
+FILLERS = ["", "a ", "some ", "I want a ", "show me a ", "any good "]
+ENDINGS = ["", "!", "?", " please", " movie", " film"]
+
+
+def make_workload(n, base_count, seed=0):
+    rng = random.Random(seed)
+    bases = [DESCRIPTIONS[i % len(DESCRIPTIONS)] + ("" if i < len(DESCRIPTIONS) else f" {i}")
+             for i in range(base_count)]
+    weights = [1.0 / (rank + 1) for rank in range(base_count)]
+    workload = []
+    for _ in range(n):
+        text = rng.choices(bases, weights)[0]
+        if rng.random() < 0.5:
+            text = rng.choice(FILLERS) + text + rng.choice(ENDINGS)
+        if rng.random() < 0.3:
+            text = text.capitalize() if rng.random() < 0.5 else text.upper()
+        workload.append(text)
+    return workload
+
+
+def replay(workload, latency, max_entries):
+    client = FakeAzureClient(dim=64, latency=latency)
+    embedder = BatchEmbedder(client=client, cache=False)
+    query_embeddings._cache = QueryEmbeddingCache(max_entries) if max_entries else None
+    query_embeddings.QUERY_CACHE_ENABLED = bool(max_entries)
+    latencies = []
+    for text in workload:
+        start = time.perf_counter()
+        embed_query(text, embedder=embedder)
+        latencies.append((time.perf_counter() - start) * 1000)
+    report = {"max_entries": max_entries, "api_calls": client.calls,
+              "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+              "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+              "mean_ms": round(float(np.mean(latencies)), 3)}
+    if query_embeddings._cache is not None:
+        report["hit_rate"] = round(query_embeddings._cache.stats()["hit_rate"], 4)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--distinct", type=int, default=400, help="distinct base descriptions in the workload")
+    parser.add_argument("--latency", type=float, default=0.12, help="seconds per embedding request")
+    parser.add_argument("--cache-sizes", type=int, nargs="+", default=[0, 64, 2048])
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    workload = make_workload(args.queries, args.distinct)
+    reports = []
+    for max_entries in args.cache_sizes:
+        report = {"queries": args.queries, "distinct": args.distinct, "latency_s": args.latency,
+                  **replay(workload, args.latency, max_entries)}
+        reports.append(report)
+        print(json.dumps(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Startup time of each entry point.
+
+Every module is imported in a fresh interpreter (so nothing is cached in
+`sys.modules`) from an empty working directory, with placeholder Azure
+settings; nothing talks to the network. Reports the median wall time of the
+whole process, the in-process import time, and for `app` the time its
+background warm-up takes to get the first request ready.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ENTRY_POINTS = ["app", "Function_calling", "gui", "async_service", "build_index", "embeddings"]
+HEAVY_MODULES = ["chromadb", "pandas", "rapidfuzz", "openai"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter() - start
+warm_up = None
+if {warm_up} and hasattr({module}, "warm_up"):
+    start = time.perf_counter()
+    {module}.warm_up()
+    warm_up = time.perf_counter() - start
+print(json.dumps({{"import_s": imported, "warm_up_s": warm_up,
+                  "loaded": [m for m in {heavy} if m in sys.modules]}}))
+"""
+
+FAKE_ENV = {
+    "AZURE_OPENAI_ENDPOINT": "http://127.0.0.1:9",
+    "AZURE_OPENAI_KEY": "fake",
+    "AZURE_OPENAI_API_KEY": "fake",
+    "AZURE_OPENAI_DEPLOYMENT_NAME": "fake-chat",
+    "AZURE_EMBEDDING_DEPLOYMENT": "fake-embedding",
+    "EMBEDDING_CACHE": "0",
+}
+
+
+def measure(module, runs, work_dir, warm_up=False):
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, **FAKE_ENV, "PYTHONPATH": repo_root}
+    code = PROBE.format(module=module, warm_up=warm_up, heavy=HEAVY_MODULES)
+    walls, imports, warm_ups, loaded = [], [], [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", code], cwd=work_dir, env=env,
+                              capture_output=True, text=True)
+        walls.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            return {"module": module, "error": proc.stderr.strip().splitlines()[-1:]}
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        imports.append(result["import_s"])
+        if result["warm_up_s"] is not None:
+            warm_ups.append(result["warm_up_s"])
+        loaded = result["loaded"]
+    report = {
+        "module": module,
+        "process_ms": round(statistics.median(walls) * 1000, 1),
+        "import_ms": round(statistics.median(imports) * 1000, 1),
+        "heavy_modules_loaded": loaded,
+    }
+    if warm_ups:
+        report["warm_up_ms"] = round(statistics.median(warm_ups) * 1000, 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modules", nargs="+", default=ENTRY_POINTS)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    reports = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for module in args.modules:
+            report = measure(module, args.runs, work_dir, warm_up=(module == "app"))
+            reports.append(report)
+            print(json.dumps(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Title lookup benchmark: trigram-pruned TitleIndex vs the full WRatio scan.
+
+Builds synthetic catalogs, queries them with exact, typo'd and partial titles,
+and reports p50/p99 latency plus top-1 accuracy for both strategies.
+
+    python -m benchmarks.bench_title_lookup --sizes 5000 50000 500000
+"""
+import argparse
+import json
+import random
+import string
+import time
+import numpy as np
+from title_index import TitleIndex
+
+STOP_WORDS = ["the", "of", "a", "and", "in", "to", "my", "love", "night", "man", "return", "last"]
+
+
+def _word(rng):
+    consonants, vowels = "bcdfghjklmnprstvwz", "aeiou"
+    return "".join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 4)))
+
+
+def synthetic_titles(n, seed=0):
+    """Returns (ids, metadatas) for n titles, ~2% of them same-title remakes."""
+    rng = random.Random(seed)
+    vocab = [_word(rng) for _ in range(max(2000, n // 20))]
+    ids, metadatas = [], []
+    for i in range(n):
+        if i and rng.random() < 0.02:
+            title = metadatas[rng.randrange(len(metadatas))]["title"]
+        else:
+            words = [rng.choice(vocab) for _ in range(rng.randint(1, 4))]
+            if rng.random() < 0.4:
+                words.insert(rng.randrange(len(words) + 1), rng.choice(STOP_WORDS))
+            title = " ".join(words).title()
+        ids.append(f"tt{i:07d}")
+        metadatas.append({"title": title, "title_lower": title.lower(),
+                          "popularity": rng.expovariate(0.2), "year": rng.randint(1930, 2020)})
+    return ids, metadatas
+
+
+def _typo(text, rng):
+    if len(text) < 4:
+        return text
+    i = rng.randrange(len(text))
+    op = rng.choice(["drop", "swap", "replace"])
+    if op == "drop":
+        return text[:i] + text[i + 1:]
+    if op == "swap" and i < len(text) - 1:
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    return text[:i] + rng.choice(string.ascii_lowercase) + text[i + 1:]
+
+
+def make_queries(index, n_queries, seed=1):
+    """(query, expected_id) pairs; the expected ID is the tie-break winner for that title."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n_queries):
+        idx = rng.randrange(len(index.titles))
+        title = index.entries[idx][0][3]
+        kind = rng.random()
+        if kind < 0.4:
+            query = _typo(title, rng)
+        elif kind < 0.6:
+            query = _typo(_typo(title, rng), rng)
+        else:
+            query = title
+        queries.append((query, index.ids[idx]))
+    return queries
+
+
+def _time(fn, queries):
+    latencies, results = [], []
+    for query, _ in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies), results
+
+
+def run(size, n_queries):
+    ids, metadatas = synthetic_titles(size)
+    start = time.perf_counter()
+    # force trigram postings regardless of catalog size so both paths are measured
+    index = TitleIndex(ids, metadatas, full_scan_max_titles=0)
+    build_s = time.perf_counter() - start
+    queries = make_queries(index, n_queries)
+
+    def indexed(query):
+        best = index.match([query])
+        return best[0] if best else None
+
+    report = {"size": size, "unique_titles": len(index), "queries": n_queries, "build_seconds": round(build_s, 3)}
+    answers = {}
+    for name, fn in [("full_scan", index.full_scan), ("trigram_index", indexed)]:
+        latencies, results = _time(fn, queries)
+        answers[name] = results
+        correct = sum(r == expected for r, (_, expected) in zip(results, queries))
+        report[name] = {
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+            "accuracy": round(correct / n_queries, 4),
+        }
+    agree = sum(a == b for a, b in zip(answers["full_scan"], answers["trigram_index"]))
+    report["agreement"] = round(agree / n_queries, 4)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 50000, 500000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    reports = []
+    for size in args.sizes:
+        report = run(size, args.queries)
+        reports.append(report)
+        print(json.dumps(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Tracing overhead: cost of a span, a traced call and record_usage with
+tracing off and on, and the per-request cost at the ~15 spans a chat turn
+opens. For the end-to-end effect, run benchmarks.suite with TRACING=0 and
+TRACING=1 and --compare the two result files.
+
+    python -m benchmarks.bench_tracing --iterations 200000
+"""
+import argparse
+import json
+import time
+from types import SimpleNamespace
+import tracing
+from tracing import span, traced, record_usage
+
+SPANS_PER_REQUEST = 15
+
+
+@traced("bench.call")
+def _work(x):
+    return x + 1
+
+
+def _time_ns(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+def measure(enabled, iterations):
+    tracing.TRACING_ENABLED = enabled
+    tracing.reset_metrics()
+    usage = SimpleNamespace(prompt_tokens=100, completion_tokens=20)
+
+    def one_span():
+        with span("bench.span"):
+            pass
+
+    def nested_span():
+        # under a long-lived root, as stages are during a request, so no trace is emitted per call
+        with span("bench.child"):
+            pass
+
+    report = {"enabled": enabled, "baseline_call_ns": round(_time_ns(lambda: _work.__wrapped__(1), iterations), 1),
+              "traced_call_ns": round(_time_ns(lambda: _work(1), iterations), 1),
+              "record_usage_ns": round(_time_ns(lambda: record_usage(usage, "bench"), iterations), 1)}
+    with span("bench.root"):
+        report["span_ns"] = round(_time_ns(nested_span, iterations), 1)
+    report["root_span_ns"] = round(_time_ns(one_span, iterations // 10 or 1), 1)
+    report["per_request_us"] = round(report["span_ns"] * SPANS_PER_REQUEST / 1000, 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    # trace and metrics files are not written here: only the in-process bookkeeping is timed
+    tracing.TRACE_FILE = tracing.METRICS_FILE = ""
+    reports = [measure(enabled, args.iterations) for enabled in (False, True)]
+    for report in reports:
+        print(json.dumps(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
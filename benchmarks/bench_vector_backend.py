@@ -0,0 +1,124 @@
+"""
+find_similar_movies benchmark: ChromaDB vs the memory-mapped NumPy backend.
+
+Indexes a synthetic clustered catalog into an in-process ChromaDB, exports it
+as float32 / float16 / int8 matrices, then runs the same seed sets through each
+backend. Recall@k is measured against the exact float32 NumPy result.
+
+    python -m benchmarks.bench_vector_backend --sizes 5000 20000 --dim 256
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import numpy as np
+import chromadb
+from db_utils import MovieCollections, FIELDS, PRIMARY_FIELD, resolve_weights, find_similar_movies, _similar_batch_numpy
+from vector_store import export_vectors, NumpyVectorStore
+
+
+def synthetic_field_vectors(n, dim, n_clusters=50, seed=0):
+    """Unit vectors drawn around random cluster centres, one matrix per field."""
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, n_clusters, size=n)
+    vectors = {}
+    for field in FIELDS:
+        centres = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+        field_vectors = centres[labels] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+        vectors[field] = field_vectors / np.linalg.norm(field_vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def build_collection(client, ids, vectors, batch=1000, metadatas=None, documents=None):
+    collection = MovieCollections(client)
+    for start in range(0, len(ids), batch):
+        batch_ids = ids[start:start + batch]
+        for field, field_collection in collection.fields.items():
+            kwargs = {}
+            if field == PRIMARY_FIELD:
+                kwargs = {
+                    "documents": documents[start:start + batch] if documents else
+                                 [f"Overview of {movie_id}" for movie_id in batch_ids],
+                    "metadatas": metadatas[start:start + batch] if metadatas else
+                                 [{"title": f"Movie {movie_id}", "title_lower": f"movie {movie_id}",
+                                   "genre": "", "popularity": 1.0} for movie_id in batch_ids],
+                }
+            field_collection.upsert(ids=batch_ids, embeddings=vectors[field][start:start + batch], **kwargs)
+    return collection
+
+
+def _latency_and_results(fn, seed_sets):
+    latencies, results = [], []
+    for seeds in seed_sets:
+        start = time.perf_counter()
+        results.append([m["imdb_id"] for m in fn(seeds)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies), results
+
+
+def _recall(results, reference):
+    hits = sum(len(set(r) & set(ref)) for r, ref in zip(results, reference))
+    total = sum(len(ref) for ref in reference)
+    return hits / total if total else 0.0
+
+
+def run(size, dim, n_queries, k, work_dir):
+    ids = [f"tt{i:07d}" for i in range(size)]
+    vectors = synthetic_field_vectors(size, dim)
+    client = chromadb.PersistentClient(path=os.path.join(work_dir, f"chroma_{size}"))
+    start = time.perf_counter()
+    collection = build_collection(client, ids, vectors)
+    index_s = time.perf_counter() - start
+
+    rng = random.Random(size)
+    seed_sets = [rng.sample(ids, rng.randint(1, 3)) for _ in range(n_queries)]
+    weights = resolve_weights(None)
+
+    stores = {}
+    for dtype in ("float32", "float16", "int8"):
+        store_dir = os.path.join(work_dir, f"store_{size}_{dtype}")
+        export_vectors(collection, store_dir, dtype)
+        stores[dtype] = NumpyVectorStore(store_dir)
+
+    backends = {"chroma": lambda seeds: find_similar_movies(seeds, collection, k, backend="chroma")}
+    for dtype, store in stores.items():
+        backends[f"numpy_{dtype}"] = (lambda s: lambda seeds: _similar_batch_numpy(s, [seeds], k, weights)[0])(store)
+
+    report = {"size": size, "dim": dim, "queries": n_queries, "k": k, "chroma_index_seconds": round(index_s, 2)}
+    results = {}
+    for name, fn in backends.items():
+        fn(seed_sets[0])  # warm up caches / page in the matrices
+        latencies, results[name] = _latency_and_results(fn, seed_sets)
+        report[name] = {
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        }
+    for name in backends:
+        report[name]["recall_at_k"] = round(_recall(results[name], results["numpy_float32"]), 4)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 20000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    reports = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in args.sizes:
+            report = run(size, args.dim, args.queries, args.k, work_dir)
+            reports.append(report)
+            print(json.dumps(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Offline benchmark suite: the main paths end to end, with no Azure access
+and no movies_metadata.csv.
+
+For every catalog size, a synthetic catalog (benchmarks.synthetic_catalog)
+is embedded with a deterministic FakeAzureClient and indexed into a fresh
+ChromaDB in a temporary working directory, then the app runs against it
+with the same fake client standing in for chat completions. Measured:
+
+    embed           batch_embed_texts throughput (movies/s, texts/s)
+    index           index_movie_vectors throughput (movies/s)
+    movie_finder    title index build time, lookup p50/p99 (exact, case, typo)
+    similar         find_similar_movies p50/p99 (chroma, and numpy when exported)
+    end_to_end      run_llm_with_function_call p50/p99, router fast path and
+                    tool-calling path separately
+
+Fake embeddings cost a hash and a few random draws, so embedding numbers are
+the pipeline's own overhead; pass --embed-latency / --chat-latency to model
+network round trips. Results are written as JSON (with the git commit) so
+runs can be compared across versions with --compare.
+
+    python -m benchmarks.suite --sizes 1000 10000 100000 --dim 64
+    python -m benchmarks.suite --sizes 1000 --compare bench_results/previous.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import app_utils
+import neighbor_table
+import result_cache
+from app_utils import init_chromadb_collection
+from db_utils import batch_embed_texts, index_movie_vectors, movie_finder, find_similar_movies
+from embeddings import BatchEmbedder
+from fake_azure import FakeAzureClient
+from vector_store import export_vectors
+from benchmarks.synthetic_catalog import synthetic_movies
+
+RESULTS_DIR = "bench_results"
+
+
+def _percentiles(latencies_ms):
+    return {"p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+            "n": len(latencies_ms)}
+
+
+def _timed(fn, inputs):
+    latencies = []
+    for item in inputs:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return _percentiles(latencies)
+
+
+def _typo(title, rng):
+    i = rng.randrange(4, max(len(title) - 1, 5))
+    return title[:i] + title[i + 1:]
+
+
+def _quiet(fn, *args, **kwargs):
+    """Runs `fn` with its progress prints swallowed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def run_size(size, args, work_dir):
+    report = {"size": size}
+    rng = random.Random(size)
+    client = FakeAzureClient(dim=args.dim, latency=args.embed_latency, chat_latency=args.chat_latency)
+
+    start = time.perf_counter()
+    movies = synthetic_movies(size)
+    report["generate_s"] = round(time.perf_counter() - start, 3)
+
+    embedder = BatchEmbedder(client=client, cache=False)
+    start = time.perf_counter()
+    vectors = _quiet(batch_embed_texts, movies, embedder=embedder)
+    elapsed = time.perf_counter() - start
+    report["embed"] = {"seconds": round(elapsed, 3), "movies_per_s": round(size / elapsed, 1),
+                       "texts_per_s": round(size * len(vectors[0]) / elapsed, 1), "requests": client.calls}
+
+    # ChromaDB shares one system per path string, so every size gets its own absolute
+    # path; the chat flow's get_collection() resolves "./chroma_db" to the same entry
+    os.chdir(work_dir)
+    _, collection = _quiet(init_chromadb_collection, os.path.join(work_dir, "chroma_db"))
+    start = time.perf_counter()
+    _quiet(index_movie_vectors, collection, movies, vectors, batch_size=args.index_batch)
+    elapsed = time.perf_counter() - start
+    report["index"] = {"seconds": round(elapsed, 3), "movies_per_s": round(size / elapsed, 1)}
+    del vectors
+
+    sample = rng.sample(movies, min(args.queries, size))
+    start = time.perf_counter()
+    movie_finder([sample[0]["title"]], collection)
+    report["movie_finder"] = {"cold_ms": round((time.perf_counter() - start) * 1000, 3)}
+    for variant, make in (("exact", lambda m: m["title"]), ("lowercase", lambda m: m["title"].lower()),
+                          ("typo", lambda m: _typo(m["title"], rng))):
+        queries = [make(movie) for movie in sample]
+        report["movie_finder"][variant] = _timed(lambda title: movie_finder([title], collection), queries)
+
+    seed_sets = [[m["imdb_id"] for m in rng.sample(movies, rng.randint(1, 3))] for _ in range(args.queries)]
+    report["similar"] = {"chroma": _timed(lambda seeds: find_similar_movies(seeds, collection, 5, backend="chroma"),
+                                          seed_sets)}
+    if args.numpy:
+        _quiet(export_vectors, collection)
+        find_similar_movies(seed_sets[0], collection, 5, backend="numpy")  # page the matrices in
+        report["similar"]["numpy"] = _timed(
+            lambda seeds: find_similar_movies(seeds, collection, 5, backend="numpy"), seed_sets)
+
+    # the chat flow picks up the shared client on first use
+    app_utils._shared["azure"] = (client, "fake-chat")
+    from Function_calling import run_llm_with_function_call
+    titles = [movie["title"] for movie in sample]
+
+    def ask(user_input):
+        run_llm_with_function_call(user_input, use_cache=False, on_chunk=lambda chunk: None)
+
+    _quiet(ask, f"I love {titles[0]}")
+    chat_calls = client.chat_calls
+    report["end_to_end"] = {
+        "router_fast_path": _quiet(_timed, ask, [f"I love {title}" for title in titles]),
+        "tool_calling": _quiet(_timed, ask, [f"{title}, but darker please?" for title in titles]),
+    }
+    report["end_to_end"]["chat_calls_per_request"] = round((client.chat_calls - chat_calls) / (2 * len(titles)), 2)
+    return report
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, (int, float)) and prefix.endswith(("_ms", "_s", "per_s")):
+        out[prefix] = value
+    return out
+
+
+def compare(previous, current, threshold=20.0):
+    """Prints the relative change of every timing and throughput metric present in both runs,
+    flagging changes for the worse beyond `threshold` percent."""
+    before = {r["size"]: _flatten("", r, {}) for r in previous.get("results", [])}
+    for result in current["results"]:
+        old = before.get(result["size"])
+        if not old:
+            continue
+        print(f"size {result['size']} vs {previous.get('git_commit')}:")
+        for key, value in _flatten("", result, {}).items():
+            if key in old and old[key]:
+                change = (value - old[key]) / old[key] * 100
+                # higher is better for throughput, lower for everything else
+                worse = change < 0 if key.endswith("per_s") else change > 0
+                flag = "  <-- regression" if worse and abs(change) > threshold else ""
+                print(f"  {key:45s} {old[key]:>12} -> {value:>12} ({change:+.1f}%){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=64, help="fake embedding dimension")
+    parser.add_argument("--queries", type=int, default=200, help="lookups / searches / chat turns per size")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds per fake embedding request")
+    parser.add_argument("--chat-latency", type=float, default=0.0, help="seconds per fake chat completion")
+    parser.add_argument("--index-batch", type=int, default=1000, help="index_movie_vectors batch size")
+    parser.add_argument("--no-numpy", dest="numpy", action="store_false", help="skip the NumPy backend export")
+    parser.add_argument("--output", help=f"JSON results file (default: {RESULTS_DIR}/suite_<time>_<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=20.0, help="percent change flagged as a regression")
+    args = parser.parse_args()
+
+    # time the searches, not cache hits; each size runs in its own empty working
+    # directory, so ChromaDB, history and on-disk indexes start clean too
+    result_cache.RESULT_CACHE_ENABLED = False
+    neighbor_table.NEIGHBOR_TABLE_ENABLED = False
+    repo_dir = os.getcwd()
+    run = {"suite": "offline", "git_commit": _git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+           "python": platform.python_version(), "platform": platform.platform(), "config": vars(args), "results": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            work_dir = os.path.join(tmp, f"catalog_{size}")
+            os.makedirs(work_dir)
+            try:
+                result = run_size(size, args, work_dir)
+            finally:
+                os.chdir(repo_dir)
+            run["results"].append(result)
+            print(json.dumps(result))
+            sys.stdout.flush()
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"suite_{time.strftime('%Y%m%d-%H%M%S')}_{run['git_commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2)
+    print(f"Results written to {output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), run, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
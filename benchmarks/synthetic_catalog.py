@@ -0,0 +1,113 @@
+"""
+Synthetic movie catalogs in the schema of movies_metadata.csv.
+
+Rows carry the columns _clean_movie_chunk and text_for_embedding read (imdb_id,
+title, overview, popularity, genres as a stringified list of {"id", "name"}
+dicts, release_date, original_language, runtime, cast, director) plus the
+remaining TMDB columns, so the same code paths run as on the real file.
+Titles are built from word lists (with occasional remakes sharing a title),
+overviews from topic sentences, and popularity follows a long tail. The
+output is deterministic for a given size and seed.
+
+    python -m benchmarks.synthetic_catalog --size 10000 --out movies_metadata.csv
+"""
+import argparse
+import csv
+import random
+
+GENRES = [(18, "Drama"), (35, "Comedy"), (53, "Thriller"), (28, "Action"), (10749, "Romance"), (27, "Horror"),
+          (878, "Science Fiction"), (16, "Animation"), (99, "Documentary"), (37, "Western"), (80, "Crime"),
+          (12, "Adventure"), (14, "Fantasy"), (10751, "Family"), (9648, "Mystery"), (10752, "War")]
+GENRE_WEIGHTS = [30, 25, 15, 14, 10, 7, 5, 3, 2, 1, 10, 9, 5, 5, 4, 2]
+LANGUAGES = ["en"] * 14 + ["fr", "es", "ja", "de", "it", "ko"]
+ADJECTIVES = ("Silent Broken Last Hidden Golden Dark Lost Red Wild Frozen Burning Empty Midnight Crimson Final "
+              "Secret Distant Savage Quiet Endless Hollow Iron Electric Bitter Velvet Fallen Restless Shattered "
+              "Northern Forgotten").split()
+NOUNS = ("River Empire Horizon Garden Highway Kingdom Signal Harbor Shadow Machine Island Witness Storm Mirror "
+         "Frontier Heart Station Circus Orchard Comet Labyrinth Engine Canyon Lighthouse Carnival Citadel Echo "
+         "Voyage Archive Tide").split()
+SUBJECTS = ["a retired detective", "an estranged sister", "a young pilot", "a small-town mechanic",
+            "an ambitious lawyer", "a lonely robot", "a crew of astronauts", "a family of farmers",
+            "a disgraced boxer", "a teenage hacker", "an aging rock star", "a rookie cop", "a wandering gunslinger",
+            "a marine biologist", "a loyal best friend", "a stubborn grandmother"]
+GOALS = ["must pull off one last heist", "races against time to stop a bombing", "falls in love with a stranger",
+         "uncovers a conspiracy inside the government", "fights to survive a zombie outbreak",
+         "searches for a missing child", "travels across the desert in a stolen car",
+         "is stranded on a deserted island", "discovers a portal to another world", "seeks revenge for a murder",
+         "enters a dangerous car race", "hunts a vampire in the city", "defends a village from bandits",
+         "investigates a haunted mansion", "tries to save the family business", "journeys into deep space"]
+TWISTS = ["Nothing is what it seems.", "An old enemy returns.", "The truth changes everything.",
+          "Friendship is put to the test.", "Time is running out.", "A secret from the past resurfaces.",
+          "Every choice has a price.", "Help comes from an unexpected place."]
+FIRST_NAMES = "James Maria Akira Chloe Omar Lena Diego Priya Lucas Ingrid Kwame Sofia Hugo Mei Pavel Aisha".split()
+LAST_NAMES = "Carter Moreau Tanaka Silva Novak Haddad Lindqvist Okafor Rossi Kim Brennan Costa Weber Patel".split()
+COLUMNS = ["adult", "belongs_to_collection", "budget", "genres", "homepage", "id", "imdb_id", "original_language",
+           "original_title", "overview", "popularity", "poster_path", "production_companies",
+           "production_countries", "release_date", "revenue", "runtime", "spoken_languages", "status", "tagline",
+           "title", "video", "vote_average", "vote_count", "cast", "director"]
+
+
+def _person(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def synthetic_title(i, rng):
+    """Mostly distinct titles; large catalogs add a subtitle so they stay mostly unique."""
+    title = f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}"
+    if i >= len(ADJECTIVES) * len(NOUNS) // 2:
+        title += f" of {rng.choice(NOUNS)}"
+    if i >= len(ADJECTIVES) * len(NOUNS) * len(NOUNS) // 4:
+        title += f" {rng.randint(2, 99)}"
+    return title
+
+
+def synthetic_movie(i, rng):
+    genres = list(dict.fromkeys(rng.choices(GENRES, GENRE_WEIGHTS, k=rng.randint(1, 3))))
+    overview = (f"{rng.choice(SUBJECTS).capitalize()} {rng.choice(GOALS)}. "
+                f"Along the way, {rng.choice(SUBJECTS)} {rng.choice(GOALS)}. {rng.choice(TWISTS)}")
+    year = rng.randint(1950, 2020)
+    title = synthetic_title(i, rng)
+    return {
+        "adult": "False", "belongs_to_collection": "", "budget": rng.randint(0, 200) * 1_000_000,
+        "genres": str([{"id": gid, "name": name} for gid, name in genres]), "homepage": "",
+        "id": 100000 + i, "imdb_id": f"tt{i + 1:07d}", "original_language": rng.choice(LANGUAGES),
+        "original_title": title, "overview": overview,
+        "popularity": round(rng.paretovariate(1.2), 6), "poster_path": "", "production_companies": "[]",
+        "production_countries": "[]", "release_date": f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "revenue": 0, "runtime": float(rng.randint(75, 180)), "spoken_languages": "[]", "status": "Released",
+        "tagline": "", "title": title, "video": "False", "vote_average": round(rng.uniform(3, 9), 1),
+        "vote_count": rng.randint(0, 5000),
+        "cast": ", ".join(_person(rng) for _ in range(3)), "director": _person(rng),
+    }
+
+
+def synthetic_movies(size, seed=0):
+    """`size` movie records in the shape iter_movie_chunks yields (one dict per CSV row)."""
+    rng = random.Random(seed)
+    movies = [synthetic_movie(i, rng) for i in range(size)]
+    # a few remakes: same title, different year and ID
+    for i in range(0, size, 50):
+        if i + 1 < size:
+            movies[i + 1]["title"] = movies[i + 1]["original_title"] = movies[i]["title"]
+    return movies
+
+
+def write_csv(path, movies):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(movies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="synthetic_movies_metadata.csv")
+    args = parser.parse_args()
+    write_csv(args.out, synthetic_movies(args.size, args.seed))
+    print(f"Wrote {args.size} movies to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,18 @@
-from db_utils import load_movie_data, index_movie_vectors, save_manifest, batch_embed_texts
+import argparse
+import json
+import os
+from db_utils import (index_movie_vectors, batch_embed_texts, load_manifest, delete_movies,
+                      select_top_movie_ids, iter_movie_chunks, movie_hashes, save_manifest_entries,
+                      drop_legacy_collection, resolve_weights, top_k, chunk_size, INDEX_LAYOUT)
 from app_utils import init_chromadb_collection
+from vector_store import export_vectors, get_vector_store, VECTOR_BACKEND
+from neighbor_table import update_neighbor_table, NEIGHBOR_TABLE_BUILD
+from lexical_index import build_lexical_index, LEXICAL_INDEX_ENABLED
+from tracing import span, traced
 
 MOVIES_CSV = "movies_metadata.csv"
 CHROMA_DB_PATH = "./chroma_db"
+CHECKPOINT_FILE = "build_checkpoint.jsonl"
 
 
 def count_indexed_movies(collection):
@@ -10,18 +20,168 @@ def count_indexed_movies(collection):
     return collection.count()
 
 
-def main():
-    movies = load_movie_data(MOVIES_CSV)
+class BuildCheckpoint:
+    """
+    Append-only progress log for a streaming build.
+
+    The first line identifies the build (CSV size/mtime and build settings);
+    every following line records one finished chunk and the manifest entries
+    of its movies. A build with a different signature starts from scratch.
+    """
+
+    def __init__(self, path, signature):
+        self.path = path
+        self.signature = signature
+        self.done_chunks = set()
+        self.entries = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline() or "null")
+                if header != {"signature": self.signature}:
+                    return
+                for line in f:
+                    record = json.loads(line)
+                    self.done_chunks.update(record["chunks"])
+                    self.entries.update(record["entries"])
+        except (json.JSONDecodeError, KeyError, ValueError):
+            # a torn last line means that chunk never finished; keep what parsed
+            pass
+
+    def start(self):
+        """(Re)writes the log: the header plus, when resuming, one compacted
+        record of the progress loaded from the previous run."""
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"signature": self.signature}) + "\n")
+            if self.done_chunks:
+                record = {"chunks": sorted(self.done_chunks), "entries": self.entries}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def record(self, chunk_number, entries):
+        self.done_chunks.add(chunk_number)
+        self.entries.update(entries)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"chunks": [chunk_number], "entries": entries}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _build_signature(csv_file, k, chunksize, incremental):
+    stat = os.stat(csv_file)
+    return {"csv": os.path.abspath(csv_file), "size": stat.st_size, "mtime": stat.st_mtime,
+            "top_k": k, "chunksize": chunksize, "incremental": incremental}
+
+
+@traced("build_index")
+def main(incremental=False, k=top_k, chunksize=chunk_size, export=None, neighbors=None, lexical=None):
+    """
+    Streams the catalog into ChromaDB chunk by chunk: each CSV chunk is
+    cleaned, embedded and upserted before the next one is read, so memory
+    stays bounded by the chunk size rather than the catalog size. Progress is
+    checkpointed per chunk; rerunning after a crash resumes at the first
+    unfinished chunk.
+
+    With `incremental=True`, only movies that are new or whose content hash
+    changed since the last manifest are embedded and upserted. Movies that
+    dropped out of the top-k are deleted in both modes.
+
+    The memory-mapped NumPy vector store is re-exported afterwards when
+    `export` is True (default: when VECTOR_BACKEND=numpy). The item-to-item
+    neighbor table, which needs that export, is then updated for the movies
+    that changed when `neighbors` is True (default: only with
+    NEIGHBOR_TABLE=1, so a ChromaDB-only build skips the export); the app
+    picks it up from disk unless NEIGHBOR_TABLE=0.
+    The BM25 lexical index over titles, genres and overviews is rebuilt when
+    `lexical` is True (default: LEXICAL_INDEX setting); it needs no embeddings.
+    """
     client, collection = init_chromadb_collection(CHROMA_DB_PATH)
-    movie_vectors = batch_embed_texts(movies)
-    index_movie_vectors(collection, movies, movie_vectors)
-    save_manifest(movies)
+    old_manifest = load_manifest() or {}
+    old_entries = old_manifest.get("movies") or {}
+    old_ids = set(old_manifest.get("ids") or old_entries)
+    layout_changed = old_manifest.get("layout") != INDEX_LAYOUT
+    if layout_changed:
+        # vectors from another storage layout can't be reused: re-index everything
+        print(f"Index layout changed to '{INDEX_LAYOUT}'; indexing all movies.")
+        old_entries, old_ids = {}, set()
+
+    with span("build.select"):
+        selected_ids = select_top_movie_ids(MOVIES_CSV, k, chunksize)
+    print(f"Selected {len(selected_ids)} movies for indexing.")
+
+    checkpoint = BuildCheckpoint(CHECKPOINT_FILE, _build_signature(MOVIES_CSV, k, chunksize, incremental))
+    if checkpoint.done_chunks:
+        print(f"Resuming build: {len(checkpoint.done_chunks)} chunks already indexed.")
+    checkpoint.start()
+
+    indexed = skipped = 0
+    for chunk_number, movies in iter_movie_chunks(MOVIES_CSV, selected_ids, chunksize):
+        if chunk_number in checkpoint.done_chunks:
+            continue
+        entries = {m['imdb_id']: movie_hashes(m) for m in movies}
+        if incremental:
+            to_index = [m for m in movies
+                        if old_entries.get(m['imdb_id'], {}).get("hash") != entries[m['imdb_id']]["hash"]]
+        else:
+            to_index = movies
+        with span("build.chunk", chunk=chunk_number, movies=len(movies), indexed=len(to_index)):
+            if to_index:
+                movie_vectors = batch_embed_texts(to_index)
+                index_movie_vectors(collection, to_index, movie_vectors)
+        indexed += len(to_index)
+        skipped += len(movies) - len(to_index)
+        checkpoint.record(chunk_number, entries)
+        print(f"Chunk {chunk_number}: {len(to_index)} indexed, {len(movies) - len(to_index)} unchanged.")
+
+    delete_movies(collection, sorted(old_ids - set(selected_ids)))
+    entries = {movie_id: checkpoint.entries[movie_id] for movie_id in selected_ids if movie_id in checkpoint.entries}
+    manifest = save_manifest_entries([movie_id for movie_id in selected_ids if movie_id in entries], entries)
+    checkpoint.clear()
+    if layout_changed:
+        drop_legacy_collection(client)
+    neighbors = NEIGHBOR_TABLE_BUILD if neighbors is None else neighbors
+    export = VECTOR_BACKEND == "numpy" if export is None else export
+    if export or neighbors:
+        with span("build.export_vectors"):
+            export_vectors(collection, index_version=manifest["index_version"])
+    if neighbors:
+        with span("build.neighbor_table"):
+            update_neighbor_table(get_vector_store(), resolve_weights(None),
+                                  {movie_id: entry["hash"] for movie_id, entry in entries.items()},
+                                  index_version=manifest["index_version"])
+    if LEXICAL_INDEX_ENABLED if lexical is None else lexical:
+        with span("build.lexical_index"):
+            build_lexical_index(collection, index_version=manifest["index_version"])
+    print(f"{indexed} movies indexed, {skipped} unchanged this run.")
     print(f"Indexed {count_indexed_movies(collection)} movies in ChromaDB.")
     print("✅ Batch multi-vector indexing complete! ChromaDB ready for hybrid search.")
-    
 
-if __name__ == "__main__":
-    main()
-    
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or refresh the movie vector index.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only embed new/changed movies and delete dropped ones (uses chroma_manifest.json)")
+    parser.add_argument("--top-k", type=int, default=top_k,
+                        help=f"number of most popular movies to index (default: {top_k})")
+    parser.add_argument("--chunksize", type=int, default=chunk_size,
+                        help=f"CSV rows per streaming chunk (default: {chunk_size})")
+    parser.add_argument("--export-vectors", action="store_true", default=None,
+                        help="export the memory-mapped NumPy vector store after indexing")
+    parser.add_argument("--neighbors", dest="neighbors", action="store_true", default=None,
+                        help="export the vector store and update the precomputed neighbor table "
+                             "(used by the app unless NEIGHBOR_TABLE=0)")
+    parser.add_argument("--no-neighbors", dest="neighbors", action="store_false", default=None,
+                        help="skip updating the neighbor table even when NEIGHBOR_TABLE=1")
+    parser.add_argument("--no-lexical", dest="lexical", action="store_false", default=None,
+                        help="skip rebuilding the BM25 lexical index")
+    args = parser.parse_args()
+    main(incremental=args.incremental, k=args.top_k, chunksize=args.chunksize,
+         export=args.export_vectors, neighbors=args.neighbors, lexical=args.lexical)
 
@@ -0,0 +1,165 @@
+"""
+Builds the tool-message payloads for the follow-up completion within a
+token budget.
+
+Movies are serialized compactly (no indentation, no IMDb IDs, rounded
+numbers, overviews shortened to whole sentences), and when a payload is
+still over budget, detail is given up in a fixed order: popularity and
+seed overviews first, then shorter recommendation overviews, then the
+similarity scores, then overviews altogether, and finally the lowest-ranked
+recommendations. The size of the final prompt therefore stops growing with
+n_results, and so does the latency of the completion that reads it.
+
+Token counts are estimated at ~4 characters per token, which is close
+enough for budgeting without a tokenizer dependency.
+"""
+import json
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))  # per turn, across all tool messages
+OVERVIEW_MAX_CHARS = int(os.getenv("OVERVIEW_MAX_CHARS", "300"))
+CHARS_PER_TOKEN = 4
+
+# (recommendation overview chars, seed overview chars, fields left out), least to most aggressive
+TRIM_LEVELS = [
+    (OVERVIEW_MAX_CHARS, OVERVIEW_MAX_CHARS, ()),
+    (OVERVIEW_MAX_CHARS, 0, ("popularity",)),
+    (150, 0, ("popularity",)),
+    (80, 0, ("popularity", "similarity")),
+    (0, 0, ("popularity", "similarity")),
+]
+
+_stats = {"payloads": 0, "estimated_tokens": 0, "trimmed": 0, "dropped_recommendations": 0, "last_turn": None}
+_stats_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def dumps_compact(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def shorten(text, max_chars):
+    """Whole leading sentences up to `max_chars`, else a word-boundary cut with an ellipsis."""
+    text = " ".join(str(text or "").split())
+    if len(text) <= max_chars:
+        return text
+    if max_chars <= 0:
+        return ""
+    cut = text[:max_chars + 1]
+    end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    if end >= max_chars // 3:
+        return cut[:end + 1]
+    return cut[:max_chars].rsplit(" ", 1)[0].rstrip(",;:") + "…"
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def compact_movie(movie, overview_chars, drop=()):
+    """The fields of a movie dict the model needs, in compact form."""
+    compact = {"title": movie.get("title", "Unknown")}
+    if movie.get("genre"):
+        compact["genre"] = movie["genre"]
+    if overview_chars and movie.get("overview"):
+        compact["overview"] = shorten(movie["overview"], overview_chars)
+    if "similarity" not in drop and _number(movie.get("similarity_score")) is not None:
+        compact["similarity"] = round(_number(movie["similarity_score"]), 3)
+    if "popularity" not in drop and _number(movie.get("popularity")) is not None:
+        compact["popularity"] = round(_number(movie["popularity"]), 1)
+    return compact
+
+
+def _compact_payload(payload, recommendation_chars, seed_chars, drop):
+    compact = {}
+    for key, value in payload.items():
+        if key == "seed_movies":
+            compact[key] = [compact_movie(movie, seed_chars, drop) for movie in value]
+        elif key == "recommendations":
+            compact[key] = [compact_movie(movie, recommendation_chars, drop) for movie in value]
+        else:
+            compact[key] = value
+    return compact
+
+
+def build_tool_content(payload, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Serializes one tool result ({"seed_movies", "recommendations", ...} or an
+    error) within `budget` estimated tokens.
+
+    Returns (content, estimated_tokens, dropped_recommendations, trimmed).
+    """
+    if "recommendations" not in payload and "seed_movies" not in payload:
+        content = dumps_compact(payload)
+        return content, estimate_tokens(content), 0, False
+
+    # every level is smaller than the one before, so binary-search the first that fits
+    low, high, fits = 0, len(TRIM_LEVELS) - 1, None
+    while low <= high:
+        level = (low + high) // 2
+        compact = _compact_payload(payload, *TRIM_LEVELS[level])
+        content = dumps_compact(compact)
+        tokens = estimate_tokens(content)
+        if tokens <= budget:
+            fits, high = (level, content, tokens), level - 1
+        else:
+            low = level + 1
+    if fits is not None:
+        level, content, tokens = fits
+        return content, tokens, 0, level > 0
+
+    # Still over budget: keep the best-ranked recommendations that fit (at least one)
+    if level != len(TRIM_LEVELS) - 1:
+        compact = _compact_payload(payload, *TRIM_LEVELS[-1])
+    recommendations = compact.get("recommendations", [])
+    used = estimate_tokens(dumps_compact({**compact, "recommendations": []}))
+    keep = 0
+    for movie in recommendations:
+        used += estimate_tokens(dumps_compact(movie)) + 1
+        if used > budget and keep:
+            break
+        keep += 1
+    compact["recommendations"] = recommendations[:keep]
+    content = dumps_compact(compact)
+    return content, estimate_tokens(content), len(recommendations) - keep, True
+
+
+def build_tool_contents(payloads, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    build_tool_content for every tool result of a turn, sharing `budget`
+    evenly between them. Returns (contents, report) where report holds the
+    estimated tokens, trimmed payloads and dropped recommendations.
+    """
+    share = max(budget // max(len(payloads), 1), 1)
+    contents, report = [], {"estimated_tokens": 0, "trimmed": 0, "dropped_recommendations": 0}
+    for payload in payloads:
+        content, tokens, dropped, trimmed = build_tool_content(payload, share)
+        contents.append(content)
+        report["estimated_tokens"] += tokens
+        report["trimmed"] += int(trimmed)
+        report["dropped_recommendations"] += dropped
+    with _stats_lock:
+        _stats["payloads"] += len(payloads)
+        for key in ("estimated_tokens", "trimmed", "dropped_recommendations"):
+            _stats[key] += report[key]
+        _stats["last_turn"] = report
+    return contents, report
+
+
+def context_stats():
+    """Totals since start-up, the report of the latest turn and the mean estimated tokens per payload."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["mean_tokens_per_payload"] = stats["estimated_tokens"] / stats["payloads"] if stats["payloads"] else 0.0
+    stats["budget"] = CONTEXT_TOKEN_BUDGET
+    return stats
@@ -1,9 +1,19 @@
-import chromadb
 import numpy as np
-import pandas as pd
 import os   
-import time
-from embeddings import create_embedding
+import hashlib
+import heapq
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from embeddings import get_default_embedder
+from title_index import get_title_index
+from vector_store import VECTOR_BACKEND, get_vector_store, top_k_rows
+from neighbor_table import get_neighbor_table
+from result_cache import get_result_cache, cache_key
+from metadata_index import typed_metadata, normalize_filters, get_metadata_index, get_store_metadata_index
+from lexical_index import get_lexical_index, rrf_fuse
+from query_embeddings import embed_query
+from tracing import traced, bind
 import json
 
 
@@ -12,25 +22,113 @@ movies_csv = "movies_metadata.csv"
 chromadb_path = "./chroma_db"
 top_k = 5000
 batch_size = 100
+chunk_size = 5000  # CSV rows per streaming chunk
 MANIFEST_FILE = "chroma_manifest.json"
+FIELDS = ["plot", "cast_director", "title_genre_popularity"]
+PRIMARY_FIELD = "title_genre_popularity"  # its collection also holds documents + metadata
+FIELD_COLLECTION_PREFIX = "movies_"
+LEGACY_COLLECTION = "movies"              # pre-v3 concatenated embeddings
+INDEX_LAYOUT = "per_field"
 
 
-# Load and clean movie data
-def load_movie_data(csv_file, k = top_k):
-    df = pd.read_csv(csv_file, low_memory=False)
+def _clean_movie_chunk(df, seen_ids):
+    """Cleans one CSV chunk: drops rows missing an overview, IMDb ID, title or
+    popularity, and non-"tt" IDs. `seen_ids` carries the first-occurrence
+    dedup across chunks and is updated in place."""
+    import pandas as pd
     df = df.dropna(subset=['overview', 'imdb_id', 'title','popularity'])
-    df = df.drop_duplicates(subset=['imdb_id'])
-    df = df[df['imdb_id'].str.startswith('tt')]
+    df = df[~df['imdb_id'].isin(seen_ids)].drop_duplicates(subset=['imdb_id'])
+    seen_ids.update(df['imdb_id'])
+    df = df[df['imdb_id'].str.startswith('tt')].copy()
     df['popularity'] = pd.to_numeric(df['popularity'], errors='coerce')
-    df = df.dropna(subset=['popularity'])
-    df = df.sort_values(by='popularity', ascending=False).head(k)
-    return df.to_dict(orient='records')
+    return df.dropna(subset=['popularity'])
+
+
+def select_top_movie_ids(csv_file, k = top_k, chunksize = chunk_size):
+    """
+    First streaming pass: returns the IDs of the k most popular movies,
+    most popular first, without loading the whole CSV into memory.
+    """
+    import pandas as pd
+    heap = []
+    seen_ids = set()
+    columns = ['overview', 'imdb_id', 'title', 'popularity']
+    for df in pd.read_csv(csv_file, usecols=columns, chunksize=chunksize, low_memory=False):
+        df = _clean_movie_chunk(df, seen_ids)
+        for movie_id, popularity in zip(df['imdb_id'], df['popularity']):
+            if len(heap) < k:
+                heapq.heappush(heap, (popularity, movie_id))
+            elif popularity > heap[0][0]:
+                heapq.heapreplace(heap, (popularity, movie_id))
+    return [movie_id for _, movie_id in sorted(heap, reverse=True)]
+
+
+def iter_movie_chunks(csv_file, selected_ids, chunksize = chunk_size):
+    """
+    Second streaming pass: yields (chunk_number, movies) for every CSV chunk,
+    keeping only movies in `selected_ids`. Chunk numbers are stable for a given
+    file and chunksize, which is what build checkpoints rely on.
+    """
+    import pandas as pd
+    selected_ids = set(selected_ids)
+    seen_ids = set()
+    for chunk_number, df in enumerate(pd.read_csv(csv_file, chunksize=chunksize, low_memory=False)):
+        df = _clean_movie_chunk(df, seen_ids)
+        df = df[df['imdb_id'].isin(selected_ids)]
+        yield chunk_number, df.to_dict(orient='records')
     
 
+class MovieCollections:
+    """
+    One ChromaDB collection per embedded field ("movies_plot", ...), all keyed
+    by the same imdb_id. The primary field's collection also stores documents
+    and metadata, so it doubles as the catalog: `get`, `count`, `id` and `name`
+    are forwarded to it and metadata-only callers can treat this object as a
+    plain collection.
+    """
+
+    def __init__(self, client, fields=FIELDS, primary=PRIMARY_FIELD, prefix=FIELD_COLLECTION_PREFIX):
+        self.client = client
+        self.primary_field = primary
+        self.fields = {
+            field: client.get_or_create_collection(
+                name=f"{prefix}{field}",
+                metadata={"description": f"movie {field} vectors"}
+            )
+            for field in fields
+        }
+        self.primary = self.fields[primary]
+
+    @property
+    def id(self):
+        return self.primary.id
+
+    @property
+    def name(self):
+        return self.primary.name
+
+    def field(self, name):
+        return self.fields[name]
+
+    def get(self, **kwargs):
+        return self.primary.get(**kwargs)
+
+    def count(self):
+        return self.primary.count()
+
+
+def drop_legacy_collection(client, name=LEGACY_COLLECTION):
+    """Deletes the pre-v3 collection of concatenated 3x-wide embeddings, if present."""
+    if name in [c if isinstance(c, str) else c.name for c in client.list_collections()]:
+        client.delete_collection(name)
+        print(f"Dropped legacy collection '{name}'.")
+
+
 # Initialize ChromaDB Client   
 def init_chromadb_client(db_path=chromadb_path):
+    import chromadb
     client = chromadb.PersistentClient(path=db_path)
-    collection = client.get_or_create_collection(name="movies")
+    collection = MovieCollections(client)
     return client, collection
     
 # create dictionary of metadatas for embedding
@@ -58,119 +156,229 @@ def text_for_embedding(movie):
 
     
 # Batch indexing
-def batch_embed_texts(movies, batch_size= batch_size):
+@traced()
+def batch_embed_texts(movies, embedder=None):
     """
     Returns a list of dicts per movie:
-    [{"plot": vec1, "cast_director": vec2, "title_genre": vec3}, ...]
+    [{"plot": vec1, "cast_director": vec2, "title_genre_popularity": vec3}, ...]
+
+    All field texts are sent through a BatchEmbedder, which packs many inputs
+    per request and keeps several requests in flight under the rate limit.
     """
-    all_vectors = []
-    for i in range(0, len(movies), batch_size):
-        batch = movies[i:i+batch_size]
-        for movie in batch:
-            texts = text_for_embedding(movie)
-            vectors = {key: create_embedding(text) for key, text in texts.items()}
-            all_vectors.append(vectors)
-        print(f"Embedded {min(i+batch_size, len(movies))}/{len(movies)} movies...")
-        time.sleep(0.5)  #avoid rate limits
+    embedder = embedder or get_default_embedder()
+    texts = [text_for_embedding(movie) for movie in movies]
+    flat_texts = [text for movie_texts in texts for text in movie_texts.values()]
+
+    def report(done, total):
+        print(f"Embedded {done}/{total} texts...")
+
+    flat_vectors = iter(embedder.embed(flat_texts, on_progress=report))
+    all_vectors = [{key: next(flat_vectors) for key in movie_texts} for movie_texts in texts]
+    if embedder.cache:
+        stats = embedder.cache.stats()
+        print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+    print(f"Embedded {len(movies)} movies.")
     return all_vectors
 
 
 
+def release_year(movie):
+    """Year from the CSV's release_date ("1995-10-30"), or 0 if unknown."""
+    release_date = str(movie.get('release_date') or '')
+    return int(release_date[:4]) if release_date[:4].isdigit() else 0
+
+
+# metadata stored alongside each movie's vector; genre/language/runtime are typed
+# (see metadata_index) so searches can filter on them
+def movie_metadata(movie):
+    return {
+        "title": movie['title'],
+        "title_lower": movie['title'].lower(),
+        "popularity": movie.get('popularity', ''),
+        "year": release_year(movie),
+        **typed_metadata(movie)
+    }
+
+
 #movie indexer function
+@traced()
 def index_movie_vectors(collection,movies,movie_vectors,batch_size = batch_size):
     
-    """Indexes the given movie vectors into the ChromaDB collection."""
+    """Indexes (upserts) the given movie vectors into the per-field collections.
+    Re-indexing an existing imdb_id replaces its rows instead of duplicating them."""
     for i in range(0, len(movies), batch_size):
         batch_movies = movies[i:i+batch_size]
         batch_vectors = movie_vectors[i:i+batch_size]
         
         ids = [movie['imdb_id'] for movie in batch_movies]
-        # Concatenate per-field vectors into a single flat embedding for each movie.
-        # This is compatible with ChromaDB versions that expect one vector per document.
-        embeddings = [
-            np.concatenate([
-                np.array(vecs['title_genre_popularity']),
-                np.array(vecs['plot']),
-                np.array(vecs['cast_director'])
-            ]).tolist()
-            for vecs in batch_vectors
-        ]
-        
         documents = [movie['overview'] for movie in batch_movies]
-        metadatas = [{
-        "title": movie['title'],
-        "title_lower": movie['title'].lower(),
-        "genre": str(movie.get('genres', '')),
-        "popularity": movie.get('popularity', ''),
-        "vector_parts": "title_genre_popularity,plot,cast_director"  
-    } for movie in batch_movies]
+        metadatas = [movie_metadata(movie) for movie in batch_movies]
         
-        collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            documents=documents,
-            metadatas=metadatas
-        )
+        for field, field_collection in collection.fields.items():
+            embeddings = [vecs[field] for vecs in batch_vectors]
+            if field == collection.primary_field:
+                field_collection.upsert(
+                    ids=ids,
+                    embeddings=embeddings,
+                    documents=documents,
+                    metadatas=metadatas
+                )
+            else:
+                field_collection.upsert(ids=ids, embeddings=embeddings)
         print(f"Indexed {min(i+batch_size, len(movies))}/{len(movies)} movies...")
 
 
+@traced()
+def delete_movies(collection, movie_ids, batch_size=batch_size):
+    """Removes the given IMDb IDs from every field collection."""
+    for i in range(0, len(movie_ids), batch_size):
+        for field_collection in collection.fields.values():
+            field_collection.delete(ids=movie_ids[i:i+batch_size])
+    if movie_ids:
+        print(f"Deleted {len(movie_ids)} movies from the collection.")
+
+
+def _hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def movie_hashes(movie):
+    """
+    Content hashes for one movie: one per embedded field, plus a movie-level
+    hash that also covers the stored document and metadata.
+    """
+    field_hashes = {key: _hash_text(text) for key, text in text_for_embedding(movie).items()}
+    payload = json.dumps(
+        {"fields": field_hashes, "document": movie['overview'], "metadata": movie_metadata(movie)},
+        sort_keys=True, default=str, ensure_ascii=False
+    )
+    return {"hash": _hash_text(payload), "fields": field_hashes}
+
+
+def compute_index_version(movie_entries):
+    """Content-derived version of the whole index: changes whenever any
+    movie is added, removed or modified."""
+    digest = hashlib.sha256()
+    for movie_id in sorted(movie_entries):
+        digest.update(f"{movie_id}:{movie_entries[movie_id]['hash']};".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
 #function to save manifest file
-def save_manifest(movies, version="v2"):
+def save_manifest_entries(ids, entries, version="v3", manifest_file=None):
+    """Writes a manifest from precomputed movie_hashes entries (streaming builds)."""
     manifest = {
         "version": version,
-        "total_movies": len(movies),
-        "fields": ["plot","cast_director","title_genre_popularity"],
-        "ids": [m['imdb_id'] for m in movies]
+        "index_version": compute_index_version(entries),
+        "total_movies": len(ids),
+        "fields": FIELDS,
+        "layout": INDEX_LAYOUT,
+        "ids": list(ids),
+        "movies": entries
     }
-    with open(MANIFEST_FILE, 'w', encoding='utf-8') as f:
+    manifest_file = manifest_file or MANIFEST_FILE
+    with open(manifest_file, 'w', encoding='utf-8') as f:
         json.dump(manifest, f, indent=4, ensure_ascii=False)
-    print(f"Saved manifest to {MANIFEST_FILE}")
+    print(f"Saved manifest to {manifest_file}")
+    return manifest
 
 
+def load_manifest(manifest_file=None):
+    """Returns the saved manifest dict, or None if missing/unreadable."""
+    manifest_file = manifest_file or MANIFEST_FILE
+    if not os.path.exists(manifest_file):
+        return None
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, ValueError):
+        return None
+
+
+_version_cache = {"mtime": None, "version": None}
+
+
+def current_index_version(manifest_file=None):
+    """
+    Returns the manifest's index_version (falls back to its "version" field
+    for older manifests). The file is only re-read when its mtime changes,
+    so this is cheap enough to call per request.
+    """
+    manifest_file = manifest_file or MANIFEST_FILE
+    try:
+        mtime = os.stat(manifest_file).st_mtime_ns
+    except OSError:
+        return None
+    if _version_cache["mtime"] != (manifest_file, mtime):
+        manifest = load_manifest(manifest_file) or {}
+        _version_cache["version"] = manifest.get("index_version") or manifest.get("version")
+        _version_cache["mtime"] = (manifest_file, mtime)
+    return _version_cache["version"]
 
 
 #function to find movie IDs given titles
-from rapidfuzz import process, fuzz
+@traced()
 def movie_finder(titles, collection):
     '''Given a list of movie titles, return their corresponding IDs from the ChromaDB collection.
+    The title index is cached per process and rebuilt only when the collection
+    or the manifest's index version changes; resolved titles are also kept in
+    the result cache.
     '''
     if not titles or not isinstance(titles, list):
         return []
-    resp = collection.get(include=["metadatas"])
-    db_ids = resp.get("ids", [])
-    db_metadatas = resp.get("metadatas", [])
-    
-    #mapping title_lower to id
-    title_map = {}
-    for i, meta in enumerate(db_metadatas):
-        title_lower = meta.get('title_lower') or meta.get('title', '').lower()
-        title_map[title_lower] = db_ids[i]
-    
-    #fuzzy matching
-    found_ids = []
-    for title in titles:
-        title_lower = title.lower()
-        #find best match
-        best_match = process.extractOne(
-            title_lower,
-            title_map.keys(),
-            scorer=fuzz.WRatio,
-            score_cutoff=80  #threshold for matching
-        )
-        if best_match:
-            matched_title = best_match[0]
-            found_ids.append(title_map[matched_title])
-            
-    return found_ids
+    version = current_index_version()
+    cache = get_result_cache()
+    if cache is not None:
+        cache.bind_version(version)
+        key = cache_key("titles", [str(title).strip().lower() for title in titles])
+        movie_ids = cache.get(key)
+        if movie_ids is not None:
+            return list(movie_ids)
+    title_index = get_title_index(collection, version=version)
+    movie_ids = title_index.match(titles)
+    if cache is not None and movie_ids:
+        cache.put(key, movie_ids)
+    return movie_ids
+
 
+_stale_store_warned = set()
 
-def get_movie_details(movie_ids, collection):
+
+def get_backend_store(backend=None):
+    """
+    Returns the NumpyVectorStore when the numpy backend is selected (argument
+    or VECTOR_BACKEND setting) and its export matches the current index
+    version; None means "use ChromaDB".
+    """
+    backend = backend or VECTOR_BACKEND
+    if backend == "chroma":
+        return None
+    if backend != "numpy":
+        raise ValueError(f"Unknown vector backend '{backend}'")
+    store = get_vector_store()
+    if store is None:
+        if "missing" not in _stale_store_warned:
+            print("NumPy vector store not exported yet; falling back to ChromaDB.")
+            _stale_store_warned.add("missing")
+        return None
+    version = current_index_version()
+    if store.index_version and version and store.index_version != version:
+        if version not in _stale_store_warned:
+            print("NumPy vector store is older than the index; falling back to ChromaDB.")
+            _stale_store_warned.add(version)
+        return None
+    return store
+
+
+@traced()
+def get_movie_details(movie_ids, collection, backend=None):
     """
     Retrieve full movie details for given IMDb IDs.
     
     Args:
         movie_ids: List of IMDb IDs (e.g., ["tt0133093", "tt0234215"])
         collection: ChromaDB collection
+        backend: "chroma" or "numpy" (defaults to the VECTOR_BACKEND setting)
         
     Returns:
         List of dictionaries with movie details (title, overview, genre, popularity)
@@ -179,6 +387,10 @@ def get_movie_details(movie_ids, collection):
         return []
     
     try:
+        store = get_backend_store(backend)
+        if store is not None:
+            return [store.catalog_entry(row) for row in store.rows_for(movie_ids)]
+        
         # Get movies by IDs
         results = collection.get(
             ids=movie_ids,
@@ -204,14 +416,323 @@ def get_movie_details(movie_ids, collection):
         return []
 
 
-def find_similar_movies(movie_ids, collection, n_results=5):
+# Per-field weights for find_similar_movies; a preset name or a dict may be passed.
+WEIGHT_PRESETS = {
+    "balanced": {"title_genre_popularity": 1.0, "plot": 1.0, "cast_director": 1.0},
+    "plot": {"plot": 1.0},
+    "cast": {"cast_director": 1.0, "plot": 0.5},
+    "genre": {"title_genre_popularity": 1.0, "plot": 0.5},
+}
+DEFAULT_WEIGHTS = "balanced"
+FUSION_OVERSAMPLE = 4  # per-field candidates fetched per requested result when fusing
+# filtered ChromaDB searches (see _filter_args)
+FILTER_EXACT_MAX = 256         # up to this many matches, score them all instead of querying
+FILTER_OVERSAMPLE_MAX = 20     # broader filters (>= 1/20 of the catalog) oversample and post-filter
+FILTER_MAX_IDS = 20000         # most IDs passed to one ChromaDB query
+BULK_BATCH_SIZE = 256  # seed lists per batch in find_similar_movies_bulk
+TOPIC_CANDIDATES = 50  # lexical and vector hits fused per topic query
+TOPIC_SEEDS = 3        # best lexical hits that seed the vector side of a topic query
+
+
+def resolve_weights(weights=None):
+    """Returns {field: weight} with only positive weights for known fields."""
+    if weights is None:
+        weights = DEFAULT_WEIGHTS
+    if isinstance(weights, str):
+        if weights not in WEIGHT_PRESETS:
+            raise ValueError(f"Unknown weight preset '{weights}'. Choose one of: {', '.join(WEIGHT_PRESETS)}")
+        weights = WEIGHT_PRESETS[weights]
+    resolved = {field: float(w) for field, w in weights.items() if field in FIELDS and w and w > 0}
+    if not resolved:
+        raise ValueError("At least one field needs a positive weight.")
+    return resolved
+
+
+def _get_embeddings(field_collection, movie_ids, page_size=5000):
+    """Returns {imdb_id: vector} for the IDs present in a field collection."""
+    vectors = {}
+    for i in range(0, len(movie_ids), page_size):
+        fetched = field_collection.get(ids=movie_ids[i:i+page_size], include=["embeddings"])
+        for movie_id, embedding in zip(fetched["ids"], fetched["embeddings"]):
+            vectors[movie_id] = np.asarray(embedding, dtype=np.float32)
+    return vectors
+
+
+def get_field_vectors(movie_ids, collection, fields=FIELDS, backend=None):
+    """Returns {field: {imdb_id: float32 vector}} for the IDs present in the index."""
+    store = get_backend_store(backend)
+    if store is not None:
+        present = [movie_id for movie_id in movie_ids if movie_id in store.row_of]
+        rows = store.rows_for(present)
+        return {field: dict(zip(present, store.vectors(field, rows))) if rows else {}
+                for field in fields if field in store.matrices}
+    return {field: _get_embeddings(collection.field(field), list(movie_ids)) for field in fields}
+
+
+def _similar_batch_numpy(store, seed_lists, n_results, weights, mask=None):
+    """Exact weighted search for a batch of seed lists over the memory-mapped
+    store: every item is scored in every weighted field, so no candidate
+    pooling is needed. Only rows set in `mask` (a filter bitmap) can be
+    returned. Returns one result list per seed list."""
+    row_lists = [store.rows_for(ids) for ids in seed_lists]
+    unique_rows = sorted({row for rows in row_lists for row in rows})
+    position = {row: pos for pos, row in enumerate(unique_rows)}
+    centroids = [{} for _ in seed_lists]
+    for field in weights:
+        if field not in store.matrices or not unique_rows:
+            continue
+        # all seed vectors for the batch in one read, then one centroid per seed list
+        seed_vectors = store.vectors(field, unique_rows)
+        for i, rows in enumerate(row_lists):
+            if rows:
+                centroids[i][field] = seed_vectors[[position[row] for row in rows]].mean(axis=0)
+    return _search_centroids_numpy(store, centroids, row_lists, n_results, weights, mask)
+
+
+def _search_centroids_numpy(store, centroids, exclude_row_lists, n_results, weights, mask=None):
+    """Weighted search from per-field query vectors ({field: vector} per query)
+    over the memory-mapped store; `exclude_row_lists` are left out of each result."""
+    valid = [i for i, vectors in enumerate(centroids) if vectors]
+    results = [[] for _ in centroids]
+    if not valid:
+        return results
+    fused = np.zeros((len(store), len(valid)), dtype=np.float32)
+    total_weight = 0.0
+    for field, weight in weights.items():
+        if field not in store.matrices or field not in centroids[valid[0]]:
+            continue
+        fused += weight * store.similarities(field, np.stack([centroids[i][field] for i in valid]))
+        total_weight += weight
+    if not total_weight:
+        return results
+    fused /= total_weight
+    for column, i in enumerate(valid):
+        scores = fused[:, column]
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        for row in top_k_rows(scores, n_results, exclude_rows=exclude_row_lists[i]):
+            movie = store.catalog_entry(row)
+            movie["similarity_score"] = float(scores[row])
+            results[i].append(movie)
+    return results
+
+
+def _similar_batch_chroma(collection, seed_lists, n_results, weights, ids=None, exact=False, oversample=1.0,
+                          keep=None):
+    """
+    Weighted search for a batch of seed lists through ChromaDB: one `get` for
+    all seed embeddings per field, then the centroid search below.
+    """
+    unique_ids = list(dict.fromkeys(movie_id for seeds in seed_lists for movie_id in seeds))
+    centroids = [{} for _ in seed_lists]      # per seed list: {field: centroid}
+    for field in weights:
+        seed_vectors = _get_embeddings(collection.field(field), unique_ids)
+        for i, seeds in enumerate(seed_lists):
+            vectors = [seed_vectors[movie_id] for movie_id in seeds if movie_id in seed_vectors]
+            if vectors:
+                # Average the embeddings if multiple seed movies
+                centroids[i][field] = np.mean(vectors, axis=0)
+    return _search_centroids_chroma(collection, centroids, [set(seeds) for seeds in seed_lists], n_results, weights,
+                                    ids, exact, oversample, keep)
+
+
+def _search_centroids_chroma(collection, centroids, exclude_sets, n_results, weights, ids=None, exact=False,
+                             oversample=1.0, keep=None):
+    """
+    Weighted search from per-field query vectors ({field: vector} per query)
+    through ChromaDB: one multi-row `query` per field, then per-query fusion.
+    Candidates missing from one field's top-k are scored exactly from their
+    stored vectors (one more `get` per field for the whole batch).
+
+    With a filter (see _filter_args), either every field's query is limited
+    to the matching `ids`, or, with `exact`, those few `ids` are the
+    candidates and no query runs; for broad filters, every field fetches
+    `oversample` times more candidates and `keep` drops the ones that don't
+    match.
+    """
+    if ids is not None and not ids:
+        return [[] for _ in centroids]
+    n_candidates = n_results + max(len(excluded) for excluded in exclude_sets)
+    if len(weights) > 1:
+        n_candidates *= FUSION_OVERSAMPLE
+    n_candidates = int(n_candidates * oversample)
+    field_scores = [{} for _ in centroids]   # per query: {field: {imdb_id: similarity}}
+    
+    for field in weights:
+        valid = [i for i, vectors in enumerate(centroids) if field in vectors]
+        if not valid:
+            continue
+        if exact:
+            for i in valid:
+                field_scores[i][field] = {}
+            continue
+        matrix = np.stack([centroids[i][field] for i in valid])
+        results = collection.field(field).query(
+            query_embeddings=matrix.tolist(),
+            n_results=n_candidates,
+            include=["distances"],
+            **({"ids": ids} if ids is not None else {})
+        )
+        for row, i in enumerate(valid):
+            field_scores[i][field] = {
+                movie_id: 1 - distance  # Convert distance to similarity
+                for movie_id, distance in zip(results["ids"][row], results["distances"][row])
+            }
+    
+    candidates = [(set(ids) if exact else set().union(*scores.values())) - exclude_sets[i] if scores else set()
+                  for i, scores in enumerate(field_scores)]
+    if keep is not None:
+        candidates = [keep(ids) for ids in candidates]
+    for field in weights:
+        missing = {movie_id for i, scores in enumerate(field_scores) if field in scores
+                   for movie_id in candidates[i] if movie_id not in scores[field]}
+        if not missing:
+            continue
+        vectors = _get_embeddings(collection.field(field), sorted(missing))
+        for i, scores in enumerate(field_scores):
+            if field not in scores:
+                continue
+            ids = [movie_id for movie_id in candidates[i] if movie_id not in scores[field] and movie_id in vectors]
+            if ids:
+                diffs = np.stack([vectors[movie_id] for movie_id in ids]) - centroids[i][field]
+                for movie_id, distance in zip(ids, np.einsum("ij,ij->i", diffs, diffs)):
+                    scores[field][movie_id] = 1 - float(distance)
+    
+    ranked_lists, fused_lists = [], []
+    for i, scores in enumerate(field_scores):
+        total_weight = sum(weights[field] for field in scores)
+        fused = {
+            movie_id: sum(weights[f] * scores[f].get(movie_id, 0.0) for f in scores) / total_weight
+            for movie_id in candidates[i]
+        }
+        ranked_lists.append(sorted(fused, key=fused.get, reverse=True)[:n_results])
+        fused_lists.append(fused)
+    
+    all_ranked = list(dict.fromkeys(movie_id for ranked in ranked_lists for movie_id in ranked))
+    details = {movie["imdb_id"]: movie for movie in get_movie_details(all_ranked, collection, backend="chroma")}
+    results = []
+    for ranked, fused in zip(ranked_lists, fused_lists):
+        similar_movies = []
+        for movie_id in ranked:
+            if movie_id not in details:
+                continue
+            movie = dict(details[movie_id])
+            movie["similarity_score"] = fused[movie_id]
+            similar_movies.append(movie)
+        results.append(similar_movies)
+    return results
+
+
+def _similar_from_neighbor_table(movie_id, collection, n_results, weights):
+    """
+    Single-seed hot path: answers from the precomputed neighbor table when it
+    matches the current index and weights and holds enough neighbors.
+    Returns None when the live search has to run instead.
+    """
+    table = get_neighbor_table()
+    if table is None or table.weights != weights or n_results > table.n_neighbors:
+        return None
+    version = current_index_version()
+    if table.index_version and version and table.index_version != version:
+        return None
+    neighbors = table.lookup(movie_id, n_results)
+    if neighbors is None:
+        return None
+    store = get_vector_store()
+    if store is not None and store.index_version == table.index_version:
+        details = {m: store.catalog_entry(store.row_of[m]) for m, _ in neighbors if m in store.row_of}
+    else:
+        details = {movie["imdb_id"]: movie
+                   for movie in get_movie_details([m for m, _ in neighbors], collection, backend="chroma")}
+    similar_movies = []
+    for neighbor_id, score in neighbors:
+        if neighbor_id in details:
+            movie = dict(details[neighbor_id])
+            movie["similarity_score"] = score
+            similar_movies.append(movie)
+    return similar_movies
+
+
+def _filter_args(filters, collection, store):
+    """
+    Backend arguments for normalized `filters`: a row bitmap for the NumPy
+    store; for ChromaDB, by how many movies the local metadata bitmap
+    matches: a handful are all scored exactly, a broad filter oversamples
+    unfiltered queries by 1 / its share of the catalog and drops the
+    non-matching candidates, and anything between limits every field's
+    query to the matching IDs. ChromaDB's own `where` is not used: it scans
+    the metadata on every query and only the primary field could apply it.
+    {} when nothing filters.
+    """
+    if not filters:
+        return {}
+    if store is not None:
+        return {"mask": get_store_metadata_index(store).mask(filters)}
+    index = get_metadata_index(collection, version=current_index_version())
+    mask = index.mask(filters)
+    rows = np.flatnonzero(mask)
+    oversample = len(index) / max(len(rows), 1)
+    if len(rows) <= FILTER_EXACT_MAX:
+        return {"ids": [index.ids[row] for row in rows], "exact": True}
+    if len(rows) <= FILTER_MAX_IDS and oversample > FILTER_OVERSAMPLE_MAX:
+        return {"ids": [index.ids[row] for row in rows]}
+
+    def keep(movie_ids):
+        return {movie_id for movie_id in movie_ids if movie_id in index.row_of and mask[index.row_of[movie_id]]}
+
+    # one extra round of candidates: the matching share near a query varies around the catalog-wide one
+    return {"oversample": oversample + 1, "keep": keep}
+
+
+def _similar_seed_lists(seed_lists, collection, n_results, weights, backend=None, filters=None):
+    """
+    find_similar_movies for several seed lists sharing resolved `weights`
+    and normalized `filters`. Single seeds are answered from the neighbor
+    table when it applies; the rest run as one batch, so a seed shared by
+    several lists has its embeddings fetched once.
+    """
+    results = [None] * len(seed_lists)
+    if not filters and backend in (None, "numpy"):
+        for i, seeds in enumerate(seed_lists):
+            if len(seeds) == 1:
+                results[i] = _similar_from_neighbor_table(seeds[0], collection, n_results, weights)
+    rest = [i for i, similar_movies in enumerate(results) if similar_movies is None]
+    if rest:
+        store = get_backend_store(backend)
+        search = _filter_args(filters, collection, store)
+        batch = [seed_lists[i] for i in rest]
+        if store is not None:
+            searched = _similar_batch_numpy(store, batch, n_results, weights, **search)
+        else:
+            searched = _similar_batch_chroma(collection, batch, n_results, weights, **search)
+        for i, similar_movies in zip(rest, searched):
+            results[i] = similar_movies
+    return results
+
+
+@traced()
+def find_similar_movies(movie_ids, collection, n_results=5, weights=None, backend=None, filters=None):
     """
     Find similar movies using vector similarity search (RAG).
     
+    Each weighted field is searched in its own vector space with the centroid
+    of the seed movies' vectors for that field; per-field results are fused by
+    the weighted mean of their similarities. Candidates missing from one
+    field's top-k are scored exactly from their stored vectors in that field.
+    Single-seed queries are answered from the precomputed neighbor table
+    when one is available for the current index, unless `backend="chroma"`
+    asks for a live ChromaDB search.
+    
     Args:
         movie_ids: List of IMDb IDs to use as seed movies
-        collection: ChromaDB collection
+        collection: MovieCollections
         n_results: Number of similar movies to return (default: 5)
+        weights: Preset name from WEIGHT_PRESETS ("balanced", "plot", "cast",
+            "genre") or a {field: weight} dict; defaults to "balanced"
+        backend: "chroma" or "numpy" (defaults to the VECTOR_BACKEND setting)
+        filters: Optional {"genres", "year_min", "year_max", "runtime_min",
+            "runtime_max", "language"} (see metadata_index); only matching
+            movies are returned
         
     Returns:
         List of similar movies with full details, excluding the seed movies
@@ -220,55 +741,267 @@ def find_similar_movies(movie_ids, collection, n_results=5):
         return []
     
     try:
-        # Get embeddings for the seed movies
-        seed_movies = collection.get(
-            ids=movie_ids,
-            include=["embeddings"]
-        )
-        
-        embeddings = seed_movies.get("embeddings")
-        if embeddings is None or len(embeddings) == 0:
-            print("No embeddings found for the provided movie IDs")
+        filters = normalize_filters(filters)
+        similar_movies = _similar_seed_lists([movie_ids], collection, n_results, resolve_weights(weights), backend,
+                                             filters)[0]
+        if not similar_movies:
+            print("No movies match the filters" if filters else "No embeddings found for the provided movie IDs")
+        return similar_movies
+    except Exception as e:
+        print(f"Error finding similar movies: {e}")
+        return []
+
+
+def find_similar_to_vectors(field_vectors, collection, n_results=5, weights=None, exclude_ids=(), backend=None,
+                            filters=None):
+    """
+    find_similar_movies for query vectors that are already known, e.g. a
+    user's taste profile: one weighted search with `field_vectors`
+    ({field: vector}) in place of the seed centroids.
+
+    Returns:
+        List of similar movies with full details, excluding `exclude_ids`
+    """
+    try:
+        weights = {field: weight for field, weight in resolve_weights(weights).items() if field in field_vectors}
+        if not weights:
             return []
+        query = {field: np.asarray(field_vectors[field], dtype=np.float32) for field in weights}
+        store = get_backend_store(backend)
+        search = _filter_args(normalize_filters(filters), collection, store)
+        if store is not None:
+            return _search_centroids_numpy(store, [query], [store.rows_for(list(exclude_ids))], n_results, weights,
+                                           **search)[0]
+        return _search_centroids_chroma(collection, [query], [set(exclude_ids)], n_results, weights, **search)[0]
+    except Exception as e:
+        print(f"Error finding similar movies: {e}")
+        return []
+
+
+def find_similar_movies_bulk(seed_id_lists, collection, n_results=5, weights=None, backend=None,
+                             batch_size=BULK_BATCH_SIZE, max_workers=1, filters=None):
+    """
+    Recommendations for many seed sets at once (offline jobs, digests, rails).
+    
+    Seed lists are processed in batches: each batch fetches all of its seed
+    embeddings in one call per field, builds the centroid matrix and runs one
+    multi-row query per field (or one matrix product on the NumPy backend).
+    With `max_workers > 1`, batches run concurrently in a thread pool; NumPy
+    and ChromaDB release the GIL for the heavy work.
+    
+    Args:
+        seed_id_lists: Iterable of IMDb ID lists; consumed lazily
+        collection: MovieCollections
+        n_results: Recommendations per seed list
+        weights / backend / filters: As for find_similar_movies
+        batch_size: Seed lists per batch
+        max_workers: Batches processed in parallel
         
-        # Average the embeddings if multiple seed movies
-        if len(embeddings) > 1:
-            avg_embedding = np.mean(embeddings, axis=0).tolist()
+    Yields:
+        (index, similar_movies) in input order, seed movies excluded. Empty
+        seed lists, or seeds missing from the index, yield an empty list.
+    """
+    weights = resolve_weights(weights)
+    store = get_backend_store(backend)
+    search = _filter_args(normalize_filters(filters), collection, store)
+    
+    def run_batch(batch):
+        searchable = [ids for ids in batch if ids]
+        if not searchable:
+            results = []
+        elif store is not None:
+            results = _similar_batch_numpy(store, searchable, n_results, weights, **search)
         else:
-            avg_embedding = embeddings[0]
+            results = _similar_batch_chroma(collection, searchable, n_results, weights, **search)
+        results = iter(results)
+        return [next(results) if ids else [] for ids in batch]
+    
+    def batches():
+        iterator = iter(seed_id_lists)
+        while True:
+            batch = [list(ids or []) for ids in itertools.islice(iterator, batch_size)]
+            if not batch:
+                return
+            yield batch
+    
+    index = 0
+    if max_workers <= 1:
+        for batch in batches():
+            for similar_movies in run_batch(batch):
+                yield index, similar_movies
+                index += 1
+        return
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()
+        for batch in batches():
+            pending.append(pool.submit(run_batch, batch))
+            # bounded read-ahead: stream finished batches out in input order
+            while len(pending) >= 2 * max_workers:
+                for similar_movies in pending.popleft().result():
+                    yield index, similar_movies
+                    index += 1
+        while pending:
+            for similar_movies in pending.popleft().result():
+                yield index, similar_movies
+                index += 1
+
+
+def get_recommendations(movie_ids, collection, n_results=5, weights=None, backend=None, filters=None):
+    """
+    Seed details plus recommendations for one seed set, served from the
+    result cache when the same seeds were asked for under the current index.
+    
+    The cache key is the sorted, de-duplicated seed IDs, `n_results`, the
+    resolved weights and the normalized filters; entries are dropped when
+    the index version changes.
+    Empty results are never cached.
+    
+    Returns:
+        (seed_movie_details, similar_movies)
+    """
+    if not movie_ids or not isinstance(movie_ids, list):
+        return [], []
+    return get_recommendations_many([(movie_ids, weights, filters)], collection, n_results, backend)[0]
+
+
+@traced()
+def get_recommendations_many(seed_requests, collection, n_results=5, backend=None, max_workers=4):
+    """
+    get_recommendations for several (movie_ids, weights) or
+    (movie_ids, weights, filters) requests at once, e.g. all tool calls of
+    one chat turn.
+    
+    Requests with the same seed set, weights and filters are computed once, the seed
+    details for every uncached request come from a single
+    get_movie_details call, and requests sharing weights and filters are
+    searched as one batch, so a seed movie that appears in several of them
+    has its embeddings fetched once. Batches for different weights or
+    filters run concurrently in a thread pool of up to `max_workers`.
+    
+    Returns:
+        One (seed_movie_details, similar_movies) pair per request, in order
+    """
+    cache = get_result_cache()
+    if cache is not None:
+        cache.bind_version(current_index_version())
+    keys, results, pending = [], {}, {}
+    for movie_ids, weights, *filters in seed_requests:
+        movie_ids = list(dict.fromkeys(movie_ids or []))
+        filters = normalize_filters(filters[0] if filters else None)
+        key = cache_key("recommendations", sorted(movie_ids), n_results, resolve_weights(weights),
+                        *([filters] if filters else []))
+        keys.append(key)
+        if key in results or key in pending or not movie_ids:
+            continue
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            results[key] = (cached["seed_movies"], cached["recommendations"])
+        else:
+            pending[key] = (movie_ids, weights, filters)
+    
+    if pending:
+        all_seeds = list(dict.fromkeys(movie_id for ids, *_ in pending.values() for movie_id in ids))
+        details = {movie["imdb_id"]: movie for movie in get_movie_details(all_seeds, collection, backend=backend)}
         
-        # Query for similar movies
-        # Request more results to account for filtering out seed movies
-        results = collection.query(
-            query_embeddings=[avg_embedding],
-            n_results=n_results + len(movie_ids),
-            include=["metadatas", "documents", "distances"]
-        )
+        groups = {}
+        for key, (ids, weights, filters) in pending.items():
+            weights = resolve_weights(weights)
+            group = groups.setdefault(json.dumps([weights, filters], sort_keys=True), (weights, filters, []))
+            group[2].append(key)
         
-        similar_movies = []
-        for i, movie_id in enumerate(results["ids"][0]):
-            # Skip if this is one of the seed movies
-            if movie_id in movie_ids:
-                continue
-            
-            metadata = results["metadatas"][0][i]
-            document = results["documents"][0][i]
-            distance = results["distances"][0][i]
-            
-            similar_movies.append({
-                "imdb_id": movie_id,
-                "title": metadata.get("title", "Unknown"),
-                "overview": document,
-                "genre": metadata.get("genre", ""),
-                "popularity": metadata.get("popularity", ""),
-                "similarity_score": 1 - distance  # Convert distance to similarity
-            })
-            
-            # Stop once we have enough results
-            if len(similar_movies) >= n_results:
-                break
+        def search(group):
+            weights, filters, group_keys = group
+            try:
+                searched = _similar_seed_lists([pending[key][0] for key in group_keys], collection, n_results,
+                                               weights, backend, filters)
+            except Exception as e:
+                print(f"Error finding similar movies: {e}")
+                searched = [[] for _ in group_keys]
+            return zip(group_keys, searched)
         
-        return similar_movies
+        if len(groups) == 1 or max_workers <= 1:
+            searched = [pair for group in groups.values() for pair in search(group)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(groups))) as pool:
+                searched = [pair for pairs in pool.map(bind(search), groups.values()) for pair in pairs]
+        for key, similar_movies in searched:
+            seed_movie_details = [details[movie_id] for movie_id in pending[key][0] if movie_id in details]
+            results[key] = (seed_movie_details, similar_movies)
+            if cache is not None and seed_movie_details and similar_movies:
+                cache.put(key, {"seed_movies": seed_movie_details, "recommendations": similar_movies})
+    return [results.get(key, ([], [])) for key in keys]
+
+
+@traced()
+def topic_search(query, collection, n_results=5, weights=None, backend=None, filters=None):
+    """
+    Movies about a keyword or topic ("car", "space heist") without an
+    embedding call: BM25 over titles, genres and overviews (see
+    lexical_index), fused by reciprocal rank with a vector search seeded by
+    the best lexical hits, so related movies whose overviews use other
+    words still surface. Results are kept in the result cache.
+    
+    Returns:
+        List of movies with full details, best first; [] when the lexical
+        index hasn't been built or nothing matches
+    """
+    index = get_lexical_index()
+    if index is None or not str(query or "").strip():
+        return []
+    try:
+        filters = normalize_filters(filters)
+        cache = get_result_cache()
+        if cache is not None:
+            cache.bind_version(current_index_version())
+            key = cache_key("topic", " ".join(str(query).lower().split()), n_results, resolve_weights(weights),
+                            *([filters] if filters else []))
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        allowed = None
+        if filters:
+            store = get_backend_store(backend)
+            metadata = (get_store_metadata_index(store) if store is not None
+                        else get_metadata_index(collection, version=current_index_version()))
+            allowed = metadata.allowed_ids(filters)
+        lexical = [movie_id for movie_id, _ in index.search(query, TOPIC_CANDIDATES, allowed)]
+        if not lexical:
+            return []
+        similar = find_similar_movies(lexical[:TOPIC_SEEDS], collection, n_results=TOPIC_CANDIDATES,
+                                      weights=weights, backend=backend, filters=filters)
+        ranked = [movie_id for movie_id, _ in rrf_fuse([lexical, [movie["imdb_id"] for movie in similar]],
+                                                       limit=n_results)]
+        details = {movie["imdb_id"]: movie for movie in similar}
+        missing = [movie_id for movie_id in ranked if movie_id not in details]
+        details.update({movie["imdb_id"]: movie for movie in get_movie_details(missing, collection, backend=backend)})
+        # fused ranks aren't similarities, so no movie carries a score
+        movies = [{k: v for k, v in details[movie_id].items() if k != "similarity_score"}
+                  for movie_id in ranked if movie_id in details]
+        if cache is not None and movies:
+            cache.put(key, movies)
+        return movies
     except Exception as e:
-        print(f"Error finding similar movies: {e}")
+        print(f"Error in topic search: {e}")
+        return []
+
+
+@traced()
+def semantic_search(description, collection, n_results=5, backend=None, filters=None):
+    """
+    Movies matching a free-text description ("heist movie with a twist
+    ending"): the text is embedded once (see query_embeddings, which caches
+    near-repeats) and searched against the `plot` vectors only.
+    
+    Returns:
+        List of movies with full details and similarity scores, best first
+    """
+    if not str(description or "").strip():
+        return []
+    try:
+        vector = embed_query(description)
+    except Exception as e:
+        print(f"Error embedding the description: {e}")
         return []
+    return find_similar_to_vectors({"plot": vector}, collection, n_results=n_results, weights="plot",
+                                   backend=backend, filters=filters)
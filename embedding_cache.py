@@ -0,0 +1,218 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1") != "0"
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))      # 0 = unlimited
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "0"))  # 0 = unlimited
+
+_SQL_CHUNK = 500  # keep IN (...) lists under SQLite's variable limit
+_TOUCH_FLUSH_EVERY = 1024  # hits whose last_used is buffered before writing them out
+
+
+def text_hash(text):
+    """Content address of an embedding input."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def pack_vector(vector):
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(blob):
+    vec = array("f")
+    vec.frombytes(blob)
+    return vec.tolist()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (deployment, sha256(text)).
+
+    Vectors are stored as float32 blobs in a SQLite file. When the cache grows
+    past `max_bytes` or `max_entries`, the least recently used entries are
+    evicted down to 90% of the limit. Hit/miss counters cover the lifetime of
+    this object.
+
+    The row count and byte total are read once when the cache opens and then
+    kept up to date on every insert and eviction, so a write costs only its
+    own rows. Other processes sharing the file are picked up by a recount
+    just before evicting. Reads don't write: the last_used of hits is
+    buffered in memory and written with the next put_many, after
+    _TOUCH_FLUSH_EVERY buffered hits, or on close.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_bytes=EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+                 max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.max_entries = int(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                   deployment TEXT NOT NULL,
+                   text_hash TEXT NOT NULL,
+                   dim INTEGER NOT NULL,
+                   vector BLOB NOT NULL,
+                   last_used REAL NOT NULL,
+                   PRIMARY KEY (deployment, text_hash)
+               ) WITHOUT ROWID"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._touched = {}  # (deployment, text_hash) -> last_used not yet written
+        self._entries, self._bytes = self._count_locked()
+
+    def _count_locked(self):
+        return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+
+    def get(self, deployment, text):
+        return self.get_many(deployment, [text])[0]
+
+    def get_many(self, deployment, texts):
+        """Returns a list aligned with `texts`; misses are None."""
+        hashes = [text_hash(t) for t in texts]
+        found = {}
+        with self._lock:
+            unique = list(dict.fromkeys(hashes))
+            for i in range(0, len(unique), _SQL_CHUNK):
+                chunk = unique[i:i + _SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE deployment = ? AND text_hash IN ({placeholders})",
+                    [deployment, *chunk],
+                ).fetchall()
+                found.update((h, blob) for h, blob in rows)
+            if found:
+                now = time.time()
+                self._touched.update(((deployment, h), now) for h in found)
+                if len(self._touched) >= _TOUCH_FLUSH_EVERY:
+                    self._flush_touched_locked()
+                    self._conn.commit()
+            results = []
+            for h in hashes:
+                blob = found.get(h)
+                if blob is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(unpack_vector(blob))
+        return results
+
+    def put(self, deployment, text, vector):
+        self.put_many(deployment, [text], [vector])
+
+    def put_many(self, deployment, texts, vectors):
+        now = time.time()
+        rows = {text_hash(t): (deployment, text_hash(t), len(v), pack_vector(v), now) for t, v in zip(texts, vectors)}
+        with self._lock:
+            # rows being replaced: only their size difference changes the totals
+            replaced = {}
+            hashes = list(rows)
+            for i in range(0, len(hashes), _SQL_CHUNK):
+                chunk = hashes[i:i + _SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                replaced.update(self._conn.execute(
+                    f"SELECT text_hash, LENGTH(vector) FROM embeddings WHERE deployment = ? AND text_hash IN ({placeholders})",
+                    [deployment, *chunk],
+                ).fetchall())
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (deployment, text_hash, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                list(rows.values()),
+            )
+            self._entries += len(rows) - len(replaced)
+            self._bytes += sum(len(row[3]) for row in rows.values()) - sum(replaced.values())
+            self._flush_touched_locked()
+            self._conn.commit()
+            self._evict_locked()
+
+    def _flush_touched_locked(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE deployment = ? AND text_hash = ?",
+                [(last_used, deployment, h) for (deployment, h), last_used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _over_limit(self):
+        return bool((self.max_entries and self._entries > self.max_entries)
+                    or (self.max_bytes and self._bytes > self.max_bytes))
+
+    def _evict_locked(self):
+        if not self._over_limit():
+            return
+        # other processes may have written to the file since the totals were last read
+        self._entries, self._bytes = self._count_locked()
+        if not self._over_limit():
+            return
+        entries, size = self._entries, self._bytes
+        over_entries = self.max_entries and entries > self.max_entries
+        over_bytes = self.max_bytes and size > self.max_bytes
+        to_drop = 0
+        if over_entries:
+            to_drop = entries - int(self.max_entries * 0.9)
+        if over_bytes:
+            avg = size / max(entries, 1)
+            to_drop = max(to_drop, int((size - self.max_bytes * 0.9) / avg) + 1)
+        victims = self._conn.execute(
+            "SELECT deployment, text_hash, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT ?", (to_drop,)
+        ).fetchall()
+        self._conn.executemany("DELETE FROM embeddings WHERE deployment = ? AND text_hash = ?",
+                               [(deployment, h) for deployment, h, _ in victims])
+        self._conn.commit()
+        self._entries -= len(victims)
+        self._bytes -= sum(length for _, _, length in victims)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._touched.clear()
+            self._entries, self._bytes = 0, 0
+
+    def stats(self):
+        """Returns hit/miss counters plus the current on-disk footprint."""
+        with self._lock:
+            entries, size = self._entries, self._bytes
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_touched_locked()
+            self._conn.commit()
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Returns the shared on-disk cache, or None when EMBEDDING_CACHE=0."""
+    global _default_cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
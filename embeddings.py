@@ -1,22 +1,261 @@
-from openai import AzureOpenAI
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from embedding_cache import get_embedding_cache
+from tracing import bind, record_usage
 
 load_dotenv()
 
-client = AzureOpenAI(
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version= "2024-05-01-preview"
-)
-
 DEPLOYMENT = os.getenv("AZURE_EMBEDDING_DEPLOYMENT")
 
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the shared Azure OpenAI client used for embeddings, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import AzureOpenAI  # deferred: importing openai costs most of a second
+            _client = AzureOpenAI(
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                api_version= "2024-05-01-preview"
+            )
+        return _client
+
+
+# Batched embedding settings (override in .env to match the deployment's quota)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))            # inputs per embeddings.create request
+EMBED_MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "100000"))
+EMBED_MAX_WORKERS = int(os.getenv("EMBED_MAX_WORKERS", "4"))            # requests in flight
+EMBED_REQUESTS_PER_MINUTE = int(os.getenv("EMBED_REQUESTS_PER_MINUTE", "0"))  # 0 = unlimited
+EMBED_TOKENS_PER_MINUTE = int(os.getenv("EMBED_TOKENS_PER_MINUTE", "0"))      # 0 = unlimited
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+
+
 def create_embedding(text):
-    result = client.embeddings.create(
+    cache = get_embedding_cache()
+    if cache is not None:
+        cached = cache.get(DEPLOYMENT, text)
+        if cached is not None:
+            return cached
+    result = get_client().embeddings.create(
         model=DEPLOYMENT,
         input=text
     )
-    return result.data[0].embedding
+    record_usage(getattr(result, "usage", None), "embeddings")
+    vector = result.data[0].embedding
+    if cache is not None:
+        cache.put(DEPLOYMENT, text, vector)
+    return vector
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for rate limiting."""
+    return len(text) // 4 + 1
+
+
+class RateLimiter:
+    """Token-bucket limiter for requests per minute and tokens per minute.
+    A limit of 0 disables that bucket."""
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, clock=time.monotonic, sleep=time.sleep):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._request_budget = float(requests_per_minute)
+        self._token_budget = float(tokens_per_minute)
+        self._last = clock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._last
+        self._last = now
+        if self.requests_per_minute:
+            self._request_budget = min(self.requests_per_minute,
+                                       self._request_budget + elapsed * self.requests_per_minute / 60.0)
+        if self.tokens_per_minute:
+            self._token_budget = min(self.tokens_per_minute,
+                                     self._token_budget + elapsed * self.tokens_per_minute / 60.0)
+
+    def acquire(self, tokens=1):
+        """Block until one request costing `tokens` fits in both budgets."""
+        if self.tokens_per_minute:
+            # a single request larger than the whole budget waits for a full bucket
+            tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill()
+                wait = 0.0
+                if self.requests_per_minute and self._request_budget < 1:
+                    wait = max(wait, (1 - self._request_budget) * 60.0 / self.requests_per_minute)
+                if self.tokens_per_minute and self._token_budget < tokens:
+                    wait = max(wait, (tokens - self._token_budget) * 60.0 / self.tokens_per_minute)
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._request_budget -= 1
+                    if self.tokens_per_minute:
+                        self._token_budget -= tokens
+                    return
+            self._sleep(wait)
+
+
+def _is_retryable(error):
+    """True for throttling (429), server-side (5xx) and connection/timeout errors."""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def _retry_after(error):
+    """Seconds requested by the server's Retry-After header, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            return float(value) / 1000.0
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class BatchEmbedder:
+    """
+    Embeds many texts with few round trips.
+
+    Texts are split into requests of up to `batch_size` inputs (and
+    `max_batch_tokens` estimated tokens); up to `max_workers` requests are kept
+    in flight under a shared RateLimiter. Throttling and 5xx errors are retried
+    with exponential backoff, honouring Retry-After when the server sends it.
+
+    `client` is anything exposing `embeddings.create(model=..., input=[...])`,
+    so a local fake (see fake_azure.py) can stand in for Azure. `cache`
+    defaults to the shared EmbeddingCache; pass False to bypass it.
+    """
+
+    def __init__(self, client=None, deployment=None, batch_size=EMBED_BATCH_SIZE,
+                 max_workers=EMBED_MAX_WORKERS, requests_per_minute=EMBED_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=EMBED_TOKENS_PER_MINUTE, max_retries=EMBED_MAX_RETRIES,
+                 max_batch_tokens=EMBED_MAX_BATCH_TOKENS, backoff_base=1.0, backoff_max=60.0,
+                 cache=None, sleep=time.sleep):
+        self.client = client if client is not None else get_client()
+        self.deployment = deployment or DEPLOYMENT
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.max_batch_tokens = max_batch_tokens
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cache = get_embedding_cache() if cache is None else (cache or None)
+        self._sleep = sleep
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute, sleep=sleep)
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "inputs": 0, "retries": 0}
+
+    def _make_batches(self, texts):
+        """Yields (texts, estimated_tokens) request payloads."""
+        batch, batch_tokens = [], 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if batch and (len(batch) >= self.batch_size or batch_tokens + tokens > self.max_batch_tokens):
+                yield batch, batch_tokens
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            yield batch, batch_tokens
+
+    def _backoff(self, attempt, error):
+        delay = _retry_after(error)
+        if delay is None:
+            delay = self.backoff_base * (2 ** attempt) * random.uniform(0.5, 1.0)
+        return min(delay, self.backoff_max)
+
+    def _embed_batch(self, texts, tokens):
+        attempt = 0
+        while True:
+            self.limiter.acquire(tokens)
+            try:
+                result = self.client.embeddings.create(model=self.deployment, input=texts)
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                with self._stats_lock:
+                    self.stats["retries"] += 1
+                self._sleep(self._backoff(attempt, e))
+                attempt += 1
+                continue
+            record_usage(getattr(result, "usage", None), "embeddings")
+            with self._stats_lock:
+                self.stats["requests"] += 1
+                self.stats["inputs"] += len(texts)
+            # the API may return items out of order; `index` is authoritative
+            data = sorted(result.data, key=lambda item: item.index)
+            return [item.embedding for item in data]
+
+    def embed(self, texts, on_progress=None):
+        """
+        Returns one vector per text, in input order.
+
+        Cached texts are served from the EmbeddingCache and duplicate texts are
+        embedded once; only the remaining texts are sent to the API.
+
+        Args:
+            texts: List of strings to embed
+            on_progress: Optional callback(done, total) called as requests finish
+        """
+        texts = list(texts)
+        vectors = self.cache.get_many(self.deployment, texts) if self.cache else [None] * len(texts)
+        positions = {}
+        for i, (text, vector) in enumerate(zip(texts, vectors)):
+            if vector is None:
+                positions.setdefault(text, []).append(i)
+        pending = list(positions)
+        batches = list(self._make_batches(pending))
+        if not batches:
+            return vectors
+        done = 0
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+            futures = {pool.submit(bind(self._embed_batch), batch, tokens): batch
+                       for batch, tokens in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    batch_vectors = future.result()
+                except Exception:
+                    # the call fails as a whole: don't spend quota on batches that haven't started
+                    for other in futures:
+                        other.cancel()
+                    raise
+                for text, vector in zip(batch, batch_vectors):
+                    for i in positions[text]:
+                        vectors[i] = vector
+                if self.cache:
+                    self.cache.put_many(self.deployment, batch, batch_vectors)
+                done += len(batch)
+                if on_progress:
+                    on_progress(done, len(pending))
+        return vectors
+
+
+_default_embedder = None
+_default_embedder_lock = threading.Lock()
 
 
+def get_default_embedder():
+    """Returns the shared BatchEmbedder configured from the environment."""
+    global _default_embedder
+    with _default_embedder_lock:
+        if _default_embedder is None:
+            _default_embedder = BatchEmbedder()
+        return _default_embedder
@@ -0,0 +1,254 @@
+"""
+Deterministic local stand-ins for the Azure OpenAI client.
+
+They expose the same call shapes the app uses (`client.embeddings.create`,
+`client.chat.completions.create`), so the embedding pipeline and the chat
+flow can be exercised without network access or quota:
+
+    from embeddings import BatchEmbedder
+    from fake_azure import FakeAzureClient
+
+    embedder = BatchEmbedder(client=FakeAzureClient(fail_first=2), sleep=lambda s: None)
+    vectors = embedder.embed(["Plot: ...", "Cast: ..."])
+
+`FakeChatServer` serves chat completions over local HTTP for load tests of
+the async service.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from types import SimpleNamespace
+from http_json import HTTPError, start_server, write_json, write_stream
+
+
+class FakeAPIError(Exception):
+    """Mimics openai.APIStatusError closely enough for the retry logic."""
+
+    def __init__(self, status_code, message="fake API error", retry_after=None):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+
+def fake_vector(text, dim=64):
+    """Unit-length pseudo-random vector derived from the text's hash."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vec = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+class _FakeEmbeddings:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, model=None, input=None, **kwargs):
+        return self._owner._create_embeddings(model, input)
+
+
+class _FakeCompletions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, model=None, messages=None, tools=None, stream=False, **kwargs):
+        include_usage = bool((kwargs.get("stream_options") or {}).get("include_usage"))
+        return self._owner._create_chat(model, messages or [], tools, stream, include_usage)
+
+
+class FakeAzureClient:
+    """
+    Fake Azure OpenAI client.
+
+    Chat completions behave like FakeChatServer: a request that offers tools
+    gets a `get_movie_recommendations` call whose query is the last user
+    message, any other request a canned answer of `answer_tokens` words
+    (streamed as chunks when `stream` is set, after an empty first chunk
+    like Azure's content-filter chunk).
+
+    Args:
+        dim: Embedding dimension
+        latency: Seconds to sleep per embedding request (simulates a round trip)
+        fail_first: Number of initial requests that raise `fail_status`
+        fail_every: Raise `fail_status` on every n-th request (0 disables)
+        fail_status: HTTP status used for injected failures (429, 500, ...)
+        retry_after: Retry-After seconds sent with injected failures (None sends no header)
+        max_inputs: Reject requests with more inputs than this (400), like Azure
+        chat_latency: Seconds to sleep per chat completion
+        answer_tokens: Words in the canned chat answer
+    """
+
+    def __init__(self, dim=64, latency=0.0, fail_first=0, fail_every=0, fail_status=429, retry_after=0,
+                 max_inputs=2048, chat_latency=0.0, answer_tokens=40):
+        self.dim = dim
+        self.latency = latency
+        self.fail_first = fail_first
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.max_inputs = max_inputs
+        self.chat_latency = chat_latency
+        self.answer_tokens = answer_tokens
+        self.embeddings = _FakeEmbeddings(self)
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.inputs = 0
+        self.chat_calls = 0
+
+    def _maybe_fail(self):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+            fail = call <= self.fail_first or (self.fail_every and call % self.fail_every == 0)
+            if fail:
+                self.failures += 1
+        if fail:
+            raise FakeAPIError(self.fail_status, retry_after=self.retry_after)
+
+    def _create_embeddings(self, model, inputs):
+        if self.latency:
+            time.sleep(self.latency)
+        self._maybe_fail()
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        if len(texts) > self.max_inputs:
+            raise FakeAPIError(400, "too many inputs")
+        with self._lock:
+            self.inputs += len(texts)
+        tokens = sum(len(t) // 4 + 1 for t in texts)
+        data = [SimpleNamespace(index=i, embedding=fake_vector(t, self.dim), object="embedding")
+                for i, t in enumerate(texts)]
+        return SimpleNamespace(
+            data=data,
+            model=model,
+            usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens),
+        )
+
+    def _create_chat(self, model, messages, tools, stream, include_usage=False):
+        with self._lock:
+            self.chat_calls += 1
+            call = self.chat_calls
+        if self.chat_latency:
+            time.sleep(self.chat_latency)
+        prompt_tokens = sum(len(str(m.get("content") or "")) // 4 + 1 for m in messages if isinstance(m, dict))
+        if tools:
+            user_message = next((m["content"] for m in reversed(messages)
+                                 if isinstance(m, dict) and m.get("role") == "user"), "")
+            tool_call = SimpleNamespace(id=f"call_{call}", type="function", function=SimpleNamespace(
+                name="get_movie_recommendations", arguments=json.dumps({"query": user_message})))
+            message = SimpleNamespace(role="assistant", content=None, tool_calls=[tool_call])
+            return SimpleNamespace(id=f"fake-{call}", model=model, choices=[
+                SimpleNamespace(index=0, finish_reason="tool_calls", message=message)],
+                usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=10,
+                                      total_tokens=prompt_tokens + 10))
+
+        words = [f"word{i} " for i in range(self.answer_tokens)]
+        if not stream:
+            message = SimpleNamespace(role="assistant", content="".join(words), tool_calls=None)
+            return SimpleNamespace(id=f"fake-{call}", model=model, choices=[
+                SimpleNamespace(index=0, finish_reason="stop", message=message)],
+                usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(words),
+                                      total_tokens=prompt_tokens + len(words)))
+
+        def chunks():
+            yield SimpleNamespace(id=f"fake-{call}", model=model, choices=[])
+            for word in words:
+                yield SimpleNamespace(id=f"fake-{call}", model=model, choices=[
+                    SimpleNamespace(index=0, delta=SimpleNamespace(content=word), finish_reason=None)])
+            yield SimpleNamespace(id=f"fake-{call}", model=model, choices=[
+                SimpleNamespace(index=0, delta=SimpleNamespace(content=None), finish_reason="stop")], usage=None)
+            if include_usage:
+                yield SimpleNamespace(id=f"fake-{call}", model=model, choices=[], usage=SimpleNamespace(
+                    prompt_tokens=prompt_tokens, completion_tokens=len(words),
+                    total_tokens=prompt_tokens + len(words)))
+        return chunks()
+
+
+class FakeChatServer:
+    """
+    Local HTTP stand-in for Azure OpenAI chat completions, for load tests.
+
+    Point AsyncAzureOpenAI / AzureOpenAI at `endpoint`. Requests that offer
+    tools get a `get_movie_recommendations` tool call whose query is the
+    user's message; all others get a canned answer, streamed as SSE deltas
+    when `stream` is set. Every response waits `latency` seconds (plus up to
+    `jitter`), and the first token of a stream waits `first_token_latency`.
+    """
+
+    def __init__(self, latency=0.2, jitter=0.05, first_token_latency=None, tokens=40, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.first_token_latency = latency if first_token_latency is None else first_token_latency
+        self.tokens = tokens
+        self.calls = 0
+        self.tool_calls = 0
+        self._rng = random.Random(seed)
+        self._server = None
+        self.port = None
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._server = await start_server(self._handle, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _delay(self, base):
+        return base + self._rng.uniform(0, self.jitter)
+
+    async def _handle(self, request, writer):
+        if request.method != "POST" or not request.path.endswith("/chat/completions"):
+            raise HTTPError(404)
+        body = request.json()
+        self.calls += 1
+        created = int(time.time())
+        base = {"id": f"fake-{self.calls}", "created": created, "model": body.get("model", "fake")}
+        user_message = next((m["content"] for m in reversed(body.get("messages", []))
+                             if m.get("role") == "user"), "")
+
+        if body.get("tools"):
+            self.tool_calls += 1
+            await asyncio.sleep(self._delay(self.latency))
+            tool_call = {"id": f"call_{self.calls}", "type": "function",
+                         "function": {"name": "get_movie_recommendations",
+                                      "arguments": json.dumps({"query": user_message})}}
+            await write_json(writer, 200, {**base, "object": "chat.completion", "choices": [
+                {"index": 0, "finish_reason": "tool_calls",
+                 "message": {"role": "assistant", "content": None, "tool_calls": [tool_call]}}]},
+                keep_alive=request.keep_alive)
+            return
+
+        words = [f"word{i} " for i in range(self.tokens)]
+        if not body.get("stream"):
+            await asyncio.sleep(self._delay(self.latency))
+            await write_json(writer, 200, {**base, "object": "chat.completion", "choices": [
+                {"index": 0, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": "".join(words)}}]},
+                keep_alive=request.keep_alive)
+            return
+
+        async def events():
+            await asyncio.sleep(self._delay(self.first_token_latency))
+            per_token = max(self.latency - self.first_token_latency, 0) / max(len(words), 1)
+            for word in words:
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                if per_token:
+                    await asyncio.sleep(per_token)
+            done = {**base, "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            yield f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n"
+        await write_stream(writer, events(), content_type="text/event-stream", keep_alive=request.keep_alive)
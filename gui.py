@@ -3,7 +3,6 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 import threading
 import sys
-import app
 
 class AppGUI:
     def __init__(self,root):
@@ -18,6 +17,11 @@ class AppGUI:
 
         
         self.setup_ui()
+
+        # `app` pulls in openai/chromadb and opens the catalog; do that in the
+        # background so the window shows up immediately
+        self.warm_thread = threading.Thread(target=self._warm_up_thread, daemon=True)
+        self.warm_thread.start()
         
         
     def setup_ui(self):
@@ -68,6 +72,9 @@ class AppGUI:
         )
         # Use columnspan=2 to make the text area span both columns
         self.output_text.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+
+        self.status_label = ttk.Label(main_frame, text="Warming up...", font=("Arial", 9))
+        self.status_label.grid(row=6, column=0, columnspan=2, sticky=tk.W)
         
          # Buttons frame
         button_frame = ttk.Frame(main_frame)
@@ -100,6 +107,16 @@ class AppGUI:
     
     
     
+    def _warm_up_thread(self):
+        """Imports the app and opens its clients before the first search."""
+        try:
+            import app
+            app.warm_up()
+            status = "Ready"
+        except (Exception, SystemExit) as e: # pylint: disable=broad-except
+            status = f"Warm-up failed ({e}); the first search will retry"
+        self.root.after(0, lambda: self.status_label.config(text=status))
+
     def run_app(self):
         """Run the selected lab in a separate thread."""
         # Disable run button
@@ -124,19 +141,24 @@ class AppGUI:
                 return
             
             
+            # a search started during warm-up waits for it instead of racing it
+            self.warm_thread.join()
+
             # Redirect stdout to capture prints
             original_stdout = sys.stdout
             sys.stdout = captured_output = io.StringIO()
             
             
             try:
-                app.run_app_file(query)
+                import app
+
+                # answer text is appended on the Tk thread as it streams in
+                app.run_app_file(query, on_chunk=lambda chunk: self.root.after(0, self.write_output, chunk))
                 
-                # get captured output
+                # anything else that was printed (warnings, errors) goes after the answer
                 output = captured_output.getvalue()
-                
-                #write to gui
-                self.root.after(0, lambda: self.write_output(output))
+                if output:
+                    self.root.after(0, lambda: self.write_output(output))
             
             finally:
                 # Restore original stdout
@@ -1,56 +1,225 @@
+"""
+Conversation history: the movies each user has liked, in the order they
+were first mentioned.
+
+History lives in a SQLite file in WAL mode, one row per (user, title), so
+adding a title is a single indexed insert instead of rewriting a JSON file,
+and the CLI, GUI and service can share it safely. A unique key on the
+lower-cased title makes de-duplication atomic even across processes.
+
+Each process keeps the titles it has seen in memory and only goes back to
+the database when another connection has committed since (PRAGMA
+data_version), so a save whose titles are all known costs no I/O at all.
+An existing conversation_history.json is imported once for the default user.
+"""
 import json
 import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from tracing import traced
+
+load_dotenv()
+
+HISTORY_DB = os.getenv("HISTORY_DB", "conversation_history.sqlite3")
+HISTORY_FILE = "conversation_history.json"  # legacy format, imported on first use
+HISTORY_USER = os.getenv("HISTORY_USER", "default")
+
+
+def _clean_titles(history):
+    """Accept both a single string or a list of strings; returns stripped, non-empty titles."""
+    entries = history if isinstance(history, list) else [history]
+    return [entry.strip() for entry in entries if isinstance(entry, str) and entry.strip()]
+
+
+class HistoryStore:
+    """
+    Per-user liked-movie history in SQLite.
+
+    Thread-safe; every add() is one transaction, so either all of its new
+    titles are recorded or none are.
+    """
+
+    def __init__(self, path=HISTORY_DB, legacy_file=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._titles = {}   # user_id -> [title, ...] in insertion order
+        self._keys = {}     # user_id -> {title.lower(), ...}
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS history (
+                   id INTEGER PRIMARY KEY,
+                   user_id TEXT NOT NULL,
+                   title TEXT NOT NULL,
+                   title_key TEXT NOT NULL,
+                   added_at REAL NOT NULL,
+                   UNIQUE (user_id, title_key)
+               )"""
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._data_version = self._current_data_version()
+        if legacy_file:
+            self._import_legacy(legacy_file)
+
+    def _current_data_version(self):
+        # changes whenever *another* connection commits to the database
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _refresh_locked(self):
+        version = self._current_data_version()
+        if version != self._data_version:
+            self._titles.clear()
+            self._keys.clear()
+            self._data_version = version
+
+    def _load_locked(self, user_id):
+        if user_id not in self._titles:
+            rows = self._conn.execute(
+                "SELECT title, title_key FROM history WHERE user_id = ? ORDER BY id", (user_id,)
+            ).fetchall()
+            self._titles[user_id] = [title for title, _ in rows]
+            self._keys[user_id] = {key for _, key in rows}
+        return self._titles[user_id]
+
+    def _import_legacy(self, legacy_file):
+        """Copies a conversation_history.json list into the default user's history, once."""
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+                return
+            titles = []
+            if os.path.exists(legacy_file):
+                try:
+                    with open(legacy_file, "r", encoding="utf-8") as file:
+                        titles = _clean_titles(json.load(file))
+                except (json.JSONDecodeError, ValueError, OSError) as e:
+                    print(f"Skipping unreadable {legacy_file}: {e}")
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not self._conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+                    now = time.time()
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO history (user_id, title, title_key, added_at) VALUES (?, ?, ?, ?)",
+                        [(HISTORY_USER, title, title.lower(), now) for title in titles],
+                    )
+                    self._conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)", (legacy_file,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            if titles:
+                print(f"Imported {len(titles)} titles from {legacy_file} into {self.path}")
+
+    def load(self, user_id=HISTORY_USER):
+        """The user's liked titles, oldest first."""
+        with self._lock:
+            self._refresh_locked()
+            return list(self._load_locked(user_id))
+
+    def add(self, history, user_id=HISTORY_USER):
+        """
+        Appends the titles not already in the user's history (case-insensitive)
+        and returns the full history.
+        """
+        titles = _clean_titles(history)
+        with self._lock:
+            self._refresh_locked()
+            # a (re)load is a plain read; only titles that are really new need the write lock
+            known = self._load_locked(user_id)
+            keys = self._keys[user_id]
+            if all(title.lower() in keys for title in titles):
+                return list(known)
+
+            # another process may have written in the meantime; re-check under the write lock
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh_locked()
+                current = self._load_locked(user_id)
+                keys = self._keys[user_id]
+                new_rows, now = [], time.time()
+                for title in titles:
+                    if title.lower() not in keys:
+                        keys.add(title.lower())
+                        current.append(title)
+                        new_rows.append((user_id, title, title.lower(), now))
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO history (user_id, title, title_key, added_at) VALUES (?, ?, ?, ?)",
+                    new_rows,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._titles.pop(user_id, None)
+                self._keys.pop(user_id, None)
+                raise
+            return list(current)
+
+    def shared_connection(self):
+        """
+        (connection, lock) for other tables kept in the same file, such as the
+        taste profiles. Their commits through this connection don't count as
+        outside writes, so they leave the cached history valid.
+        """
+        return self._conn, self._lock
+
+    def clear(self, user_id=HISTORY_USER):
+        """Deletes the user's history; returns how many titles were removed."""
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM history WHERE user_id = ?", (user_id,)).rowcount
+            self._titles.pop(user_id, None)
+            self._keys.pop(user_id, None)
+            return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_history_store():
+    """The shared HistoryStore for HISTORY_DB (opened, and the legacy file imported, on first use)."""
+    with _stores_lock:
+        store = _stores.get(HISTORY_DB)
+        if store is None:
+            store = _stores[HISTORY_DB] = HistoryStore(HISTORY_DB, legacy_file=HISTORY_FILE)
+        return store
+
+
+@traced("history.load")
+def load_conversation_history(user_id=None):
+    """Loading conversation history for `user_id` (default HISTORY_USER)."""
+    try:
+        return get_history_store().load(user_id or HISTORY_USER)
+    except sqlite3.Error as e:
+        print(f"Error loading conversation history: {e}")
+        return []
+
+@traced("history.save")
+def save_conversation_history(history, user_id=None):
+    """Adding new titles (a string or a list) to the history; returns the full history."""
+    try:
+        return get_history_store().add(history, user_id or HISTORY_USER)
+    except sqlite3.Error as e:
+        print(f"Error saving conversation history: {e}")
+        return load_conversation_history(user_id)
 
-HISTORY_FILE = "conversation_history.json"
-
-def load_conversation_history():
-    """Loading conversation history from JSON file."""
-    if os.path.exists(HISTORY_FILE):
-        try:
-            with open(HISTORY_FILE, "r") as file:
-                return json.load(file)
-        except (json.JSONDecodeError, ValueError):
-            # File exists but is empty or corrupted — reset to empty history
-            return []
-    return []
-
-def save_conversation_history(history):
-    """Saving conversation history to JSON file."""
-    #Load existing history
-    current_history = load_conversation_history()
-    # duplicate check (case-insensitive)
-    existing_entries = {movie.lower() for movie in current_history if isinstance(movie, str)}
-    updated = False
-
-    # Accept both single string or list of strings
-    new_entries = history if isinstance(history, list) else [history]
-
-    for entry in new_entries:
-        if not isinstance(entry, str):
-            continue
-        cleaned = entry.strip()
-        if cleaned and cleaned.lower() not in existing_entries:
-            current_history.append(cleaned)
-            existing_entries.add(cleaned.lower())
-            updated = True
-
-    if updated:
-        try:
-            with open(HISTORY_FILE, "w", encoding="utf-8") as file:
-                json.dump(current_history, file, indent=4, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error saving conversation history: {e}")
-
-    return current_history
-
-def clear_conversation_history():
-    """Clearing the conversation history file."""
-    if os.path.exists(HISTORY_FILE):
-        try:
-            os.remove(HISTORY_FILE)
-            print("Conversation history cleared.")
-        except Exception as e:
-            print(f"Error clearing conversation history: {e}")
+def clear_conversation_history(user_id=None):
+    """Clearing the conversation history (and the taste profile built from it)."""
+    from taste_profile import get_taste_profiles
+    try:
+        removed = get_history_store().clear(user_id or HISTORY_USER)
+        profiles = get_taste_profiles()
+        if profiles is not None:
+            profiles.clear(user_id or HISTORY_USER)
+    except sqlite3.Error as e:
+        print(f"Error clearing conversation history: {e}")
+        return
+    if removed:
+        print("Conversation history cleared.")
     else:
         print("No conversation history to clear.")
-                  
@@ -0,0 +1,161 @@
+"""
+Minimal HTTP/1.1 JSON server on asyncio streams.
+
+Just enough protocol for local services and fakes: keep-alive, Content-Length
+bodies, JSON responses and chunked streaming. It is meant to sit behind a
+reverse proxy (or on localhost), not to face the internet directly.
+"""
+import asyncio
+import json
+from http import HTTPStatus
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization, api-key",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None, headers=None):
+        super().__init__(message or HTTPStatus(status).phrase)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Request:
+    def __init__(self, method, target, headers, body):
+        self.method = method
+        self.path, _, self.query = target.partition("?")
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, "Request body is not valid JSON")
+
+    @property
+    def keep_alive(self):
+        return self.headers.get("connection", "").lower() != "close"
+
+
+async def read_request(reader):
+    """Parses one request from the stream; None on a cleanly closed connection."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if e.partial.strip():
+            raise HTTPError(400, "Incomplete request")
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431)
+    if len(head) > MAX_HEADER_BYTES:
+        raise HTTPError(431)
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length < 0:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413)
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target, headers, body)
+
+
+def _head(status, headers):
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def write_json(writer, status, payload, headers=None, keep_alive=True):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    all_headers = {"Content-Type": "application/json", "Content-Length": str(len(body)),
+                   "Connection": "keep-alive" if keep_alive else "close", **CORS_HEADERS, **(headers or {})}
+    writer.write(_head(status, all_headers) + body)
+    await writer.drain()
+
+
+async def write_text(writer, status, text, content_type="text/plain; charset=utf-8", keep_alive=True):
+    body = text.encode("utf-8")
+    all_headers = {"Content-Type": content_type, "Content-Length": str(len(body)),
+                   "Connection": "keep-alive" if keep_alive else "close", **CORS_HEADERS}
+    writer.write(_head(status, all_headers) + body)
+    await writer.drain()
+
+
+async def write_stream(writer, chunks, content_type="application/x-ndjson", keep_alive=True):
+    """Sends an async iterable of bytes/str with chunked transfer encoding."""
+    headers = {"Content-Type": content_type, "Transfer-Encoding": "chunked",
+               "Cache-Control": "no-cache", "Connection": "keep-alive" if keep_alive else "close",
+               **CORS_HEADERS}
+    writer.write(_head(200, headers))
+    async for chunk in chunks:
+        data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+        if data:
+            writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+            await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+def make_connection_handler(handle):
+    """
+    Wraps `handle(request, writer)` (which writes exactly one response) into
+    an asyncio.start_server callback that serves keep-alive connections.
+    """
+    async def on_connection(reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    await write_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                if request.method == "OPTIONS":
+                    writer.write(_head(204, {"Content-Length": "0", **CORS_HEADERS}))
+                    await writer.drain()
+                else:
+                    try:
+                        await handle(request, writer)
+                    except HTTPError as e:
+                        await write_json(writer, e.status, {"error": str(e)}, e.headers, request.keep_alive)
+                    except Exception as e:  # pylint: disable=broad-except
+                        print(f"Error handling {request.method} {request.path}: {e}")
+                        await write_json(writer, 500, {"error": "Internal server error"}, keep_alive=False)
+                        break
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+    return on_connection
+
+
+async def start_server(handle, host, port):
+    return await asyncio.start_server(make_connection_handler(handle), host, port,
+                                      limit=MAX_HEADER_BYTES)
@@ -0,0 +1,171 @@
+"""
+Local intent router for the chat entry points.
+
+Inputs that plainly name movies ("I love Inception", "movies like Heat and
+Ronin", "Alien, Aliens") are resolved against the title index before any LLM
+call. When every named title matches confidently, the caller can run the
+recommendation tool directly and only needs the LLM for the final answer.
+Anything vague, topical or ambiguous falls through to the normal tool-calling
+round trip, including single words that are genres or everyday words ("I
+love war", "I like it") even when a film has that title: the model treats
+those as topics.
+"""
+import os
+import re
+import threading
+from collections import Counter
+from dotenv import load_dotenv
+from rapidfuzz import fuzz, utils
+from title_index import get_title_index
+from metadata_index import GENRE_NAMES, canonical_genre
+from lexical_index import tokenize
+
+load_dotenv()
+
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER", "1") != "0"
+ROUTER_MIN_SCORE = float(os.getenv("ROUTER_MIN_SCORE", "88"))            # titles after "I love ..." or in lists
+ROUTER_BARE_MIN_SCORE = float(os.getenv("ROUTER_BARE_MIN_SCORE", "97"))  # an input that is only a title
+ROUTER_MIN_MARGIN = float(os.getenv("ROUTER_MIN_MARGIN", "5"))           # lead over the next different title
+ROUTER_MAX_TITLES = int(os.getenv("ROUTER_MAX_TITLES", "5"))
+
+_LEAD = re.compile(
+    r"^(?:"
+    r"i\s+(?:really\s+|just\s+|also\s+)?(?:love|loved|like|liked|enjoy|enjoyed|adore|adored)"
+    r"|(?:(?:can\s+you\s+)?(?:recommend|suggest|show|find)\s+(?:me\s+)?)?"
+    r"(?:some\s+|more\s+)?(?:movies|films|something|anything)\s+(?:like|similar\s+to)"
+    r"|more\s+like|similar\s+to"
+    r")\s+(?P<rest>.+)$",
+    re.IGNORECASE,
+)
+_LIST_SEPARATORS = re.compile(r"\s*[,;]\s*")
+_AND_SEPARATORS = re.compile(r"\s*(?:&|\+|\band\b)\s*", re.IGNORECASE)
+_ARTICLE = re.compile(r"^(?:the|a|an)\s+")
+_TRIM = " \t\"'“”‘’.!?"
+
+
+def _comparable(title):
+    return _ARTICLE.sub("", utils.default_process(title))
+
+
+def title_confidence(query, title):
+    """0-100 closeness of a whole query to a whole title (leading articles ignored)."""
+    query, title = _comparable(query), _comparable(title)
+    if not query or not title:
+        return 0.0
+    return max(fuzz.ratio(query, title), fuzz.token_sort_ratio(query, title))
+
+
+def is_topic_word(text):
+    """True when `text` reads as a genre ("war", "rom-com", "comedies") or is only common words ("it")."""
+    text = " ".join(str(text).lower().split())
+    if canonical_genre(text) in GENRE_NAMES:
+        return True
+    terms = tokenize(text)
+    if not terms:
+        return True
+    return len(text.split()) == 1 and canonical_genre(terms[0]) in GENRE_NAMES
+
+
+class IntentRouter:
+    """
+    Decides whether an input can skip the tool-choice LLM call.
+
+    `route` returns None to fall back, or a dict with the resolved
+    `movie_ids`, the matched `titles` and a `query` string suitable as the
+    tool's arguments. Decisions are counted for `stats()`.
+    """
+
+    def __init__(self, min_score=ROUTER_MIN_SCORE, bare_min_score=ROUTER_BARE_MIN_SCORE,
+                 min_margin=ROUTER_MIN_MARGIN, max_titles=ROUTER_MAX_TITLES):
+        self.min_score = min_score
+        self.bare_min_score = bare_min_score
+        self.min_margin = min_margin
+        self.max_titles = max_titles
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, outcome):
+        with self._lock:
+            self._counts["inputs"] += 1
+            self._counts[outcome] += 1
+
+    def candidate_lists(self, user_input):
+        """
+        Possible readings of the input as title lists, most literal first,
+        each with the score threshold it has to meet.
+        """
+        text = user_input.strip().strip(_TRIM)
+        lead = _LEAD.match(text)
+        if lead:
+            rest = lead.group("rest").strip(_TRIM)
+            readings = [[rest]]
+            parts = [p.strip(_TRIM) for p in _LIST_SEPARATORS.split(rest) if p.strip(_TRIM)]
+            if len(parts) > 1:
+                readings.append(parts)
+            split_and = [q.strip(_TRIM) for p in parts for q in _AND_SEPARATORS.split(p) if q.strip(_TRIM)]
+            if len(split_and) > len(parts):
+                readings.append(split_and)
+            return [(reading, self.min_score) for reading in readings]
+        parts = [p.strip(_TRIM) for p in _LIST_SEPARATORS.split(text) if p.strip(_TRIM)]
+        if len(parts) > 1:
+            return [(parts, self.min_score)]
+        return [([text], self.bare_min_score)] if text else []
+
+    def resolve_title(self, title_index, title, min_score):
+        """(imdb_id, matched_title) when `title` confidently names one movie, else None."""
+        if is_topic_word(title):
+            return None
+        hits = title_index.lookup(title, limit=3)
+        if not hits:
+            return None
+        scored = sorted(((title_confidence(title, hit["title"]), hit) for hit in hits),
+                        key=lambda pair: pair[0], reverse=True)
+        confidence, best = scored[0]
+        if confidence < min_score:
+            return None
+        if confidence < 100 and len(scored) > 1 and confidence - scored[1][0] < self.min_margin:
+            return None
+        return best["movies"][0]["imdb_id"], best["title"]
+
+    def route(self, user_input, collection, version=None):
+        if not user_input or not user_input.strip():
+            self._count("fallback_empty")
+            return None
+        readings = self.candidate_lists(user_input)
+        if not readings:
+            self._count("fallback_no_pattern")
+            return None
+        title_index = get_title_index(collection, version=version)
+        for titles, min_score in readings:
+            if len(titles) > self.max_titles:
+                continue
+            resolved = [self.resolve_title(title_index, title, min_score) for title in titles]
+            if all(resolved):
+                movie_ids = list(dict.fromkeys(movie_id for movie_id, _ in resolved))
+                matched = [matched_title for _, matched_title in resolved]
+                self._count("fast_path")
+                return {"movie_ids": movie_ids, "titles": matched, "query": ", ".join(matched)}
+        self._count("fallback_low_confidence")
+        return None
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        inputs = counts.get("inputs", 0)
+        counts["fast_path_rate"] = counts.get("fast_path", 0) / inputs if inputs else 0.0
+        return counts
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_intent_router():
+    """Shared IntentRouter, or None when INTENT_ROUTER=0."""
+    global _router
+    if not INTENT_ROUTER_ENABLED:
+        return None
+    with _router_lock:
+        if _router is None:
+            _router = IntentRouter()
+        return _router
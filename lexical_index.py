@@ -0,0 +1,192 @@
+"""
+In-process BM25 index over titles, genres and overviews.
+
+Topic and keyword queries ("car", "space", "heist") are not titles, so the
+title index either misses them or latches onto an unrelated title. This
+index answers them locally: it is built once per `build_index` run from the
+indexed documents and stored as flat arrays, i.e. CSR-style postings:
+
+    terms       sorted vocabulary (meta.json); term i's postings are
+    docs[offsets[i]:offsets[i + 1]]   row numbers into `ids`
+    tfs [offsets[i]:offsets[i + 1]]   field-weighted term frequencies
+    doc_len                           field-weighted document lengths
+
+A query touches only the postings of its own terms, so it costs a few
+vectorized array operations and no embedding call. Title and genre terms
+count more than overview terms (a simple BM25F). `rrf_fuse` merges this
+ranking with vector rankings by reciprocal rank.
+"""
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import numpy as np
+from dotenv import load_dotenv
+from metadata_index import parse_genres
+from vector_store import replace_dir, _fetch_all
+
+load_dotenv()
+
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX", "1") != "0"
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", "./lexical_index")
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60                                         # rank offset of reciprocal rank fusion
+FIELD_WEIGHTS = {"title": 3, "genre": 2, "overview": 1}
+META_FILE = "meta.json"
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been before but by can do does for from get had has have
+he her his how i if in into is it its just like me more most my new no not of on one or other our out she
+so some than that the their them then there these they this to too up us was we were what when where which
+while who whom why will with would you your
+movie movies film films show shows something anything recommend recommendation recommendations similar
+want watch see find please
+""".split())
+
+
+def _stem(token):
+    """Folds plurals so "cars" finds "car": a deliberately light, predictable stemmer."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Lower-cased, stemmed terms of `text` without stopwords."""
+    return [_stem(token) for token in _TOKEN.findall(str(text or "").lower()) if token not in STOPWORDS]
+
+
+def document_terms(title, genres, overview):
+    """{term: weighted frequency} for one movie, title and genre terms counting extra."""
+    counts = {}
+    for field, text in (("title", title), ("genre", " ".join(genres)), ("overview", overview)):
+        for term in tokenize(text):
+            counts[term] = counts.get(term, 0) + FIELD_WEIGHTS[field]
+    return counts
+
+
+def _write_index(out_dir, ids, doc_terms, index_version):
+    vocabulary = sorted({term for counts in doc_terms for term in counts})
+    term_of = {term: i for i, term in enumerate(vocabulary)}
+    postings = [[] for _ in vocabulary]
+    for row, counts in enumerate(doc_terms):
+        for term, tf in counts.items():
+            postings[term_of[term]].append((row, tf))
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(p) for p in postings])
+    docs = np.fromiter((row for p in postings for row, _ in p), dtype=np.int32, count=int(offsets[-1]))
+    tfs = np.fromiter((tf for p in postings for _, tf in p), dtype=np.float32, count=int(offsets[-1]))
+    doc_len = np.array([sum(counts.values()) for counts in doc_terms], dtype=np.float32)
+
+    tmp_dir = f"{out_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(tmp_dir, "docs.npy"), docs)
+    np.save(os.path.join(tmp_dir, "tfs.npy"), tfs)
+    np.save(os.path.join(tmp_dir, "doc_len.npy"), doc_len)
+    with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"ids": ids, "terms": vocabulary, "index_version": index_version}, f, ensure_ascii=False)
+    replace_dir(tmp_dir, out_dir)
+    return len(vocabulary), len(docs)
+
+
+def build_lexical_index(collection, index_version=None, out_dir=LEXICAL_INDEX_DIR):
+    """Indexes every movie's title, genres and overview (the primary collection's document)."""
+    ids, doc_terms = [], []
+    for page in _fetch_all(collection, ["metadatas", "documents"]):
+        for movie_id, meta, document in zip(page["ids"], page["metadatas"], page["documents"]):
+            meta = meta or {}
+            ids.append(movie_id)
+            doc_terms.append(document_terms(meta.get("title", ""), parse_genres(meta.get("genre")), document))
+    n_terms, n_postings = _write_index(out_dir, ids, doc_terms, index_version)
+    print(f"Built lexical index: {len(ids)} movies, {n_terms} terms, {n_postings} postings.")
+
+
+class LexicalIndex:
+    """Read-only BM25 view of a built index (posting arrays are memory-mapped)."""
+
+    def __init__(self, index_dir=LEXICAL_INDEX_DIR, k1=BM25_K1, b=BM25_B):
+        with open(os.path.join(index_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.ids = meta["ids"]
+        self.index_version = meta.get("index_version")
+        self.term_of = {term: i for i, term in enumerate(meta["terms"])}
+        self.offsets = np.load(os.path.join(index_dir, "offsets.npy"))
+        self.docs = np.load(os.path.join(index_dir, "docs.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(index_dir, "tfs.npy"), mmap_mode="r")
+        self.doc_len = np.load(os.path.join(index_dir, "doc_len.npy"))
+        self.avg_len = float(self.doc_len.mean()) if len(self.doc_len) else 1.0
+        self.k1 = k1
+        self.b = b
+        # per-document part of the BM25 denominator, shared by every query
+        self._norm = (k1 * (1 - b + b * self.doc_len / (self.avg_len or 1.0))).astype(np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scores(self, query):
+        """BM25 score of every movie for `query` (zeros when no term is indexed)."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        n_docs = len(self.ids)
+        for term in dict.fromkeys(tokenize(query)):
+            i = self.term_of.get(term)
+            if i is None:
+                continue
+            start, end = self.offsets[i], self.offsets[i + 1]
+            docs = np.asarray(self.docs[start:end])
+            tfs = np.asarray(self.tfs[start:end])
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            # each movie appears once per term's postings, so plain fancy-index += is safe
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + self._norm[docs])
+        return scores
+
+    def search(self, query, limit=50, allowed=None):
+        """[(imdb_id, score), ...] best first; `allowed`, a set of IDs, restricts the results."""
+        scores = self.scores(query)
+        rows = np.flatnonzero(scores > 0)
+        if allowed is None and len(rows) > limit:
+            rows = rows[np.argpartition(-scores[rows], limit - 1)[:limit]]
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+        if allowed is not None:
+            rows = [row for row in rows if self.ids[row] in allowed][:limit]
+        return [(self.ids[row], float(scores[row])) for row in rows]
+
+
+def rrf_fuse(rankings, limit=None, k=RRF_K):
+    """
+    Reciprocal rank fusion of several ranked ID lists: each list adds
+    1 / (k + rank) to an ID's score. Returns [(imdb_id, score), ...] best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, movie_id in enumerate(ranking, start=1):
+            fused[movie_id] = fused.get(movie_id, 0.0) + 1.0 / (k + rank)
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return ranked[:limit] if limit else ranked
+
+
+_index = {"key": None, "index": None}
+_index_lock = threading.Lock()
+
+
+def get_lexical_index(index_dir=None):
+    """Process-wide LexicalIndex, reopened when a rebuild replaces it; None if absent or disabled."""
+    if not LEXICAL_INDEX_ENABLED:
+        return None
+    index_dir = index_dir or LEXICAL_INDEX_DIR
+    try:
+        key = (index_dir, os.stat(os.path.join(index_dir, META_FILE)).st_mtime_ns)
+    except OSError:
+        return None
+    with _index_lock:
+        if _index["key"] != key:
+            _index["index"] = LexicalIndex(index_dir)
+            _index["key"] = key
+        return _index["index"]
@@ -0,0 +1,232 @@
+"""
+Typed movie metadata and the filters recommendations can be narrowed by.
+
+Indexing parses the CSV's genres (a stringified list of {"id", "name"}
+dicts), release year, original language and runtime into typed metadata.
+Every genre is also stored as a boolean `genre_<slug>` flag, because
+ChromaDB metadata values must be scalars, so genres stay queryable with a
+`where` clause.
+
+MetadataIndex is the local inverted index over the same fields: one
+boolean bitmap per genre plus year/runtime/language columns, aligned to a
+list of IDs. A filter becomes one bitmap (a few vectorized operations), so
+the NumPy backend can mask its scores before top-k and the Chroma backend
+can restrict every field's query to the matching IDs (only the primary
+field's collection holds metadata, and a `where` clause costs ChromaDB a
+metadata scan per query).
+
+Filters are dicts with any of:
+    genres      list of genre names, all required ("sci-fi" etc. accepted)
+    year_min    / year_max       release year bounds, inclusive
+    runtime_min / runtime_max    minutes, inclusive
+    language    original language code, e.g. "en"
+"""
+import ast
+import json
+import re
+import threading
+import numpy as np
+
+GENRE_ALIASES = {
+    "sci-fi": "science fiction", "scifi": "science fiction", "sf": "science fiction",
+    "animated": "animation", "cartoon": "animation", "anime": "animation",
+    "romantic": "romance", "rom-com": "romance", "scary": "horror",
+    "doc": "documentary", "documentaries": "documentary", "war movie": "war",
+    "musical": "music", "kids": "family", "superhero": "action",
+}
+GENRE_NAMES = frozenset((
+    "action", "adventure", "animation", "comedy", "crime", "documentary", "drama", "family", "fantasy",
+    "foreign", "history", "horror", "music", "mystery", "romance", "science fiction", "thriller", "tv movie",
+    "war", "western",
+))  # TMDB's genre list, lower-cased
+FILTER_KEYS = ("genres", "year_min", "year_max", "runtime_min", "runtime_max", "language")
+
+
+def parse_genres(value):
+    """Genre names from "[{'id': 18, 'name': 'Drama'}]", JSON, a list, or "Drama, Comedy"."""
+    if value is None or (isinstance(value, float) and value != value):
+        return []
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return []
+        if text[0] in "[{":
+            try:
+                value = json.loads(text)
+            except ValueError:
+                try:
+                    value = ast.literal_eval(text)
+                except (ValueError, SyntaxError):
+                    return []
+        else:
+            value = re.split(r"\s*[,|/]\s*", text)
+    if isinstance(value, dict):
+        value = [value]
+    names = []
+    for item in value if isinstance(value, (list, tuple)) else []:
+        name = item.get("name") if isinstance(item, dict) else item
+        if isinstance(name, str) and name.strip() and name.strip() not in names:
+            names.append(name.strip())
+    return names
+
+
+def canonical_genre(name):
+    name = " ".join(str(name).lower().split())
+    return GENRE_ALIASES.get(name, name)
+
+
+def genre_key(name):
+    """Metadata key of a genre's boolean flag: "Science Fiction" -> "genre_science_fiction"."""
+    return "genre_" + re.sub(r"[^a-z0-9]+", "_", canonical_genre(name)).strip("_")
+
+
+def _int(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0
+    return int(number) if number == number else 0
+
+
+def typed_metadata(movie):
+    """Genre list, language, runtime and genre flags for one CSV row."""
+    genres = parse_genres(movie.get('genres'))
+    language = movie.get('original_language')
+    metadata = {
+        "genre": ", ".join(genres),
+        "language": language.strip().lower() if isinstance(language, str) else "",
+        "runtime": _int(movie.get('runtime')),
+    }
+    metadata.update({genre_key(name): True for name in genres})
+    return metadata
+
+
+def normalize_filters(filters):
+    """Validated copy of `filters` with canonical genres; None when nothing filters."""
+    if not filters:
+        return None
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown filter(s): {', '.join(sorted(unknown))}")
+    normalized = {}
+    genres = filters.get("genres")
+    if isinstance(genres, str):
+        genres = [genres]
+    if genres:
+        normalized["genres"] = sorted({canonical_genre(name) for name in genres if str(name).strip()})
+    for key in ("year_min", "year_max", "runtime_min", "runtime_max"):
+        if filters.get(key) not in (None, ""):
+            normalized[key] = int(filters[key])
+    if filters.get("language"):
+        normalized["language"] = str(filters["language"]).strip().lower()
+    return normalized or None
+
+
+class MetadataIndex:
+    """Genre bitmaps and typed columns for a fixed list of IDs (row i = ids[i])."""
+
+    def __init__(self, ids, metadatas, max_cached_masks=64):
+        self.ids = list(ids)
+        self.row_of = {movie_id: row for row, movie_id in enumerate(self.ids)}
+        n = len(self.ids)
+        self.year = np.zeros(n, dtype=np.int32)
+        self.runtime = np.zeros(n, dtype=np.int32)
+        self.language = np.zeros(n, dtype=np.int32)
+        self.language_codes = {}
+        self.genres = {}
+        for row, meta in enumerate(metadatas):
+            meta = meta or {}
+            self.year[row] = _int(meta.get("year"))
+            self.runtime[row] = _int(meta.get("runtime"))
+            language = str(meta.get("language") or "")
+            self.language[row] = self.language_codes.setdefault(language, len(self.language_codes))
+            for name in parse_genres(meta.get("genre")):
+                genre = canonical_genre(name)
+                if genre not in self.genres:
+                    self.genres[genre] = np.zeros(n, dtype=bool)
+                self.genres[genre][row] = True
+        self._masks = {}
+        self._max_cached_masks = max_cached_masks
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def mask(self, filters):
+        """Boolean array over the rows matching normalized `filters` (None means every row)."""
+        if not filters:
+            return None
+        key = json.dumps(filters, sort_keys=True)
+        with self._lock:
+            cached = self._masks.get(key)
+        if cached is not None:
+            return cached
+        mask = np.ones(len(self.ids), dtype=bool)
+        for genre in filters.get("genres", []):
+            mask &= self.genres.get(genre, np.zeros(len(self.ids), dtype=bool))
+        if "year_min" in filters:
+            mask &= self.year >= filters["year_min"]
+        if "year_max" in filters:
+            mask &= (self.year <= filters["year_max"]) & (self.year > 0)
+        if "runtime_min" in filters:
+            mask &= self.runtime >= filters["runtime_min"]
+        if "runtime_max" in filters:
+            mask &= (self.runtime <= filters["runtime_max"]) & (self.runtime > 0)
+        if "language" in filters:
+            code = self.language_codes.get(filters["language"])
+            if code is None:
+                mask[:] = False
+            else:
+                mask &= self.language == code
+        mask.setflags(write=False)
+        with self._lock:
+            if len(self._masks) >= self._max_cached_masks:
+                self._masks.pop(next(iter(self._masks)))
+            self._masks[key] = mask
+        return mask
+
+    def allowed_ids(self, filters):
+        """Set of IDs matching `filters`, or None when nothing filters."""
+        mask = self.mask(filters)
+        if mask is None:
+            return None
+        return {self.ids[row] for row in np.flatnonzero(mask)}
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_metadata_index(collection, version=None):
+    """
+    Process-wide MetadataIndex over a collection's metadata, rebuilt when its
+    row count or the index `version` changes (same policy as get_title_index).
+    """
+    key = getattr(collection, "id", None) or id(collection)
+    state = (collection.count(), version)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+    ids, metadatas = [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=5000, offset=offset)
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        metadatas.extend(page["metadatas"])
+        offset += len(page["ids"])
+    index = MetadataIndex(ids, metadatas)
+    with _cache_lock:
+        _cache[key] = (state, index)
+    return index
+
+
+def get_store_metadata_index(store):
+    """MetadataIndex aligned with a NumpyVectorStore's rows, built once per store."""
+    with _cache_lock:
+        index = getattr(store, "_metadata_index", None)
+        if index is None:
+            index = store._metadata_index = MetadataIndex(store.ids, store.catalog)
+        return index
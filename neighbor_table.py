@@ -0,0 +1,210 @@
+"""
+Precomputed item-to-item neighbor table.
+
+For every indexed movie, the top-N most similar movies under the default
+field weights are computed offline from the exported NumPy vector store and
+kept as two dense arrays: `neighbors.npy` (int32 row numbers into the ID
+sidecar) and `scores.npy` (float32). Single-seed recommendations then become
+an array lookup instead of a vector search.
+
+When movies change, `update_neighbor_table` recomputes only the rows that
+are affected: the changed movies themselves and any row whose neighbor list
+referenced one of them. Every other row is merged with the changed movies'
+scores so newcomers can enter its top-N.
+
+Building the table is opt-in (NEIGHBOR_TABLE=1 or build_index --neighbors),
+because it needs the full NumPy vector export, which a plain ChromaDB build
+otherwise skips. Once built, a table matching the current index is used
+wherever it is found on disk; NEIGHBOR_TABLE=0 turns that off.
+"""
+import json
+import os
+import shutil
+import threading
+import numpy as np
+from dotenv import load_dotenv
+from vector_store import top_k_rows, replace_dir
+
+load_dotenv()
+
+NEIGHBOR_TABLE = os.getenv("NEIGHBOR_TABLE", "")  # "1": build_index updates it; "0": never built or used
+NEIGHBOR_TABLE_BUILD = NEIGHBOR_TABLE == "1"
+NEIGHBOR_TABLE_ENABLED = NEIGHBOR_TABLE != "0"   # use a table found on disk
+NEIGHBOR_TABLE_DIR = os.getenv("NEIGHBOR_TABLE_DIR", "./neighbor_table")
+NEIGHBOR_COUNT = int(os.getenv("NEIGHBOR_COUNT", "50"))
+BLOCK_ROWS = 1024                   # query rows scored per matrix product while building
+FULL_REBUILD_FRACTION = 0.2         # above this share of changed movies, rebuild from scratch
+META_FILE = "meta.json"
+
+
+def _fused_scores(store, weights, rows):
+    """(n_items, len(rows)) weighted similarity of every movie to each given movie."""
+    fused = np.zeros((len(store), len(rows)), dtype=np.float32)
+    total_weight = 0.0
+    for field, weight in weights.items():
+        if field not in store.matrices:
+            continue
+        fused += weight * store.similarities(field, store.vectors(field, rows))
+        total_weight += weight
+    return fused / total_weight
+
+
+def _compute_rows(store, weights, rows, n_neighbors):
+    """Exact top-N neighbors (self excluded) for the given store rows."""
+    neighbors = np.full((len(rows), n_neighbors), -1, dtype=np.int32)
+    scores = np.full((len(rows), n_neighbors), -np.inf, dtype=np.float32)
+    for start in range(0, len(rows), BLOCK_ROWS):
+        block = rows[start:start + BLOCK_ROWS]
+        fused = _fused_scores(store, weights, block)
+        for column, row in enumerate(block):
+            top = top_k_rows(fused[:, column], n_neighbors, exclude_rows=[row])
+            neighbors[start + column, :len(top)] = top
+            scores[start + column, :len(top)] = fused[top, column]
+    return neighbors, scores
+
+
+def _write_table(out_dir, ids, neighbors, scores, weights, hashes, index_version):
+    tmp_dir = f"{out_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, "neighbors.npy"), neighbors)
+    np.save(os.path.join(tmp_dir, "scores.npy"), scores)
+    with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"ids": ids, "n_neighbors": int(neighbors.shape[1]), "weights": weights,
+                   "hashes": hashes, "index_version": index_version}, f)
+    replace_dir(tmp_dir, out_dir)
+
+
+def build_neighbor_table(store, weights, hashes=None, index_version=None,
+                         n_neighbors=NEIGHBOR_COUNT, out_dir=NEIGHBOR_TABLE_DIR):
+    """Computes the full table for every movie in `store`."""
+    n_neighbors = min(n_neighbors, max(len(store) - 1, 1))
+    neighbors, scores = _compute_rows(store, weights, list(range(len(store))), n_neighbors)
+    _write_table(out_dir, store.ids, neighbors, scores, weights, hashes or {}, index_version)
+    print(f"Built neighbor table: {len(store)} movies x {n_neighbors} neighbors.")
+
+
+def update_neighbor_table(store, weights, hashes, index_version=None,
+                          n_neighbors=NEIGHBOR_COUNT, out_dir=NEIGHBOR_TABLE_DIR):
+    """
+    Brings the table in `out_dir` up to date with `store`, recomputing only
+    what changed. `hashes` maps imdb_id to the manifest's content hash; a
+    movie whose hash differs from the one recorded in the table counts as
+    changed. Falls back to a full build when there is no compatible table or
+    too much has changed.
+    """
+    try:
+        old = NeighborTable(out_dir)
+    except (OSError, ValueError, KeyError):
+        old = None
+    n_neighbors = min(n_neighbors, max(len(store) - 1, 1))
+    if old is None or old.weights != weights or old.n_neighbors != n_neighbors:
+        return build_neighbor_table(store, weights, hashes, index_version, n_neighbors, out_dir)
+
+    changed = [movie_id for movie_id in store.ids
+               if movie_id not in old.row_of or old.hashes.get(movie_id) != hashes.get(movie_id)]
+    removed = [movie_id for movie_id in old.ids if movie_id not in store.row_of]
+    if len(changed) + len(removed) > FULL_REBUILD_FRACTION * len(store):
+        return build_neighbor_table(store, weights, hashes, index_version, n_neighbors, out_dir)
+    if not changed and not removed and old.ids == store.ids:
+        if old.index_version != index_version:
+            _write_table(out_dir, store.ids, np.asarray(old.neighbors), np.asarray(old.scores),
+                         weights, hashes, index_version)
+        print("Neighbor table is up to date.")
+        return
+
+    # old row number -> new row number (-1 for removed movies)
+    old_to_new = np.array([store.row_of.get(movie_id, -1) for movie_id in old.ids], dtype=np.int32)
+    changed_old_rows = np.array([old.row_of[m] for m in changed if m in old.row_of], dtype=np.int32)
+    stale = np.zeros(len(old.ids), dtype=bool)
+    stale[changed_old_rows] = True
+    stale[[old.row_of[m] for m in removed]] = True
+
+    neighbors = np.full((len(store), n_neighbors), -1, dtype=np.int32)
+    scores = np.full((len(store), n_neighbors), -np.inf, dtype=np.float32)
+    changed_set = set(changed)
+    dirty, clean_new, clean_old = [], [], []
+    for new_row, movie_id in enumerate(store.ids):
+        old_row = old.row_of.get(movie_id)
+        if movie_id in changed_set or old_row is None:
+            dirty.append(new_row)
+            continue
+        old_neighbors = np.asarray(old.neighbors[old_row])
+        valid = old_neighbors[old_neighbors >= 0]
+        if stale[valid].any():
+            # a neighbor was edited or removed: its stored score is no longer valid
+            dirty.append(new_row)
+            continue
+        clean_new.append(new_row)
+        clean_old.append(old_row)
+
+    if clean_new:
+        clean_new = np.array(clean_new)
+        old_rows = np.array(clean_old)
+        kept = np.asarray(old.neighbors[old_rows])
+        kept_scores = np.asarray(old.scores[old_rows])
+        kept = np.where(kept >= 0, old_to_new[np.maximum(kept, 0)], -1)
+        kept_scores = np.where(kept >= 0, kept_scores, -np.inf)
+        delta_rows = [store.row_of[m] for m in changed]
+        if delta_rows:
+            # changed/new movies may now rank inside a clean row's top-N
+            delta_scores = _fused_scores(store, weights, delta_rows)[clean_new]
+            delta_ids = np.broadcast_to(np.array(delta_rows, dtype=np.int32), delta_scores.shape)
+            delta_scores = np.where(delta_ids == clean_new[:, None], -np.inf, delta_scores)
+            merged_ids = np.concatenate([kept, delta_ids], axis=1)
+            merged_scores = np.concatenate([kept_scores, delta_scores], axis=1)
+            order = np.argsort(-merged_scores, axis=1, kind="stable")[:, :n_neighbors]
+            kept = np.take_along_axis(merged_ids, order, axis=1)
+            kept_scores = np.take_along_axis(merged_scores, order, axis=1)
+        neighbors[clean_new] = kept
+        scores[clean_new] = kept_scores
+
+    if dirty:
+        neighbors[dirty], scores[dirty] = _compute_rows(store, weights, dirty, n_neighbors)
+    _write_table(out_dir, store.ids, neighbors, scores, weights, hashes, index_version)
+    print(f"Updated neighbor table: {len(dirty)} rows recomputed, {len(clean_new)} merged.")
+
+
+class NeighborTable:
+    """Read-only view of a built table (arrays are memory-mapped)."""
+
+    def __init__(self, table_dir=NEIGHBOR_TABLE_DIR):
+        with open(os.path.join(table_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.ids = meta["ids"]
+        self.n_neighbors = meta["n_neighbors"]
+        self.weights = meta["weights"]
+        self.hashes = meta.get("hashes") or {}
+        self.index_version = meta.get("index_version")
+        self.row_of = {movie_id: row for row, movie_id in enumerate(self.ids)}
+        self.neighbors = np.load(os.path.join(table_dir, "neighbors.npy"), mmap_mode="r")
+        self.scores = np.load(os.path.join(table_dir, "scores.npy"), mmap_mode="r")
+
+    def lookup(self, movie_id, n_results):
+        """[(imdb_id, score), ...] best first, or None if the movie isn't in the table."""
+        row = self.row_of.get(movie_id)
+        if row is None:
+            return None
+        neighbors = self.neighbors[row, :n_results]
+        scores = self.scores[row, :n_results]
+        return [(self.ids[n], float(s)) for n, s in zip(neighbors, scores) if n >= 0]
+
+
+_table = {"key": None, "table": None}
+_table_lock = threading.Lock()
+
+
+def get_neighbor_table(table_dir=None):
+    """Process-wide NeighborTable, reopened when a rebuild replaces it; None if absent or disabled."""
+    if not NEIGHBOR_TABLE_ENABLED:
+        return None
+    table_dir = table_dir or NEIGHBOR_TABLE_DIR
+    try:
+        key = (table_dir, os.stat(os.path.join(table_dir, META_FILE)).st_mtime_ns)
+    except OSError:
+        return None
+    with _table_lock:
+        if _table["key"] != key:
+            _table["table"] = NeighborTable(table_dir)
+            _table["key"] = key
+        return _table["table"]
@@ -0,0 +1,131 @@
+"""
+System prompt and tool schema shared by the sync CLI flow and the async service.
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Bump whenever the system prompt or tool schema changes: cached answers are keyed by it.
+PROMPT_VERSION = "5"
+HISTORY_PROMPT_TITLES = int(os.getenv("HISTORY_PROMPT_TITLES", "10"))  # most recent liked titles shown
+
+# optional hard constraints, shared by both tools (see metadata_index)
+FILTERS_PARAMETER = {
+    "type": "object",
+    "description": "Only recommend movies matching these constraints, when the user states them (\"only 90s comedies\", \"under two hours\", \"in French\"). Leave out anything the user didn't ask for.",
+    "properties": {
+        "genres": {"type": "array", "items": {"type": "string"}, "description": "Genres every recommendation must have, e.g. [\"Comedy\", \"Science Fiction\"]"},
+        "year_min": {"type": "integer", "description": "Earliest release year, inclusive"},
+        "year_max": {"type": "integer", "description": "Latest release year, inclusive"},
+        "runtime_min": {"type": "integer", "description": "Shortest runtime in minutes"},
+        "runtime_max": {"type": "integer", "description": "Longest runtime in minutes"},
+        "language": {"type": "string", "description": "Original language as an ISO 639-1 code, e.g. \"en\", \"fr\", \"ja\""}
+    }
+}
+
+tools = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_movie_recommendations",
+            "description": "Find similar movies based on user's movie preferences. Takes movie titles, or a topic/keywords, as input and returns recommendations with explanations.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Movie title(s) that the user likes or is interested in"
+                    },
+                    "topic": {
+                        "type": "string",
+                        "description": "Keywords for a subject or theme the user asks about instead of naming movies, e.g. \"car\", \"space\", \"heist\". Use it rather than query when no movie title is mentioned."
+                    },
+                    "focus": {
+                        "type": "string",
+                        "enum": ["balanced", "plot", "cast", "genre"],
+                        "description": "What similarity should emphasise: overall (balanced), story (plot), same actors/director (cast) or genre. Defaults to balanced."
+                    },
+                    "filters": FILTERS_PARAMETER
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_movies_by_description",
+            "description": "Find movies whose story matches a free-text description, e.g. \"heist movie with a twist ending\" or \"a lonely robot falls in love\". Use it when the user describes what they want instead of naming movies or a single topic.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "description": {
+                        "type": "string",
+                        "description": "The user's description of the plot, premise or mood, in their own words"
+                    },
+                    "filters": FILTERS_PARAMETER
+                },
+                "required": ["description"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "recommend_from_taste_profile",
+            "description": "Recommend movies matching the user's overall taste, built from every movie they liked before. Use it when the request is vague (\"more recommendations\", \"surprise me\") or asks to build on past preferences, instead of listing past titles.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "focus": {
+                        "type": "string",
+                        "enum": ["balanced", "plot", "cast", "genre"],
+                        "description": "What similarity should emphasise. Defaults to balanced."
+                    },
+                    "filters": FILTERS_PARAMETER
+                }
+            }
+        }
+    }
+]
+
+
+def summarize_history(conversation_history, max_titles=HISTORY_PROMPT_TITLES):
+    """The most recent liked titles plus a count of the rest, so the prompt stays bounded."""
+    recent = conversation_history[-max_titles:] if max_titles > 0 else []
+    summary = ", ".join(recent)
+    earlier = len(conversation_history) - len(recent)
+    if earlier:
+        summary = f"{summary} (and {earlier} earlier)" if summary else f"{earlier} movies"
+    return summary
+
+
+def build_system_prompt(conversation_history):
+    """System prompt for the recommendation assistant, with a bounded summary of the user's liked movies."""
+    history_context = ""
+    if conversation_history:
+        history_context = f"\n\nUser's previously liked movies (most recent last): {summarize_history(conversation_history)}"
+    
+    return f"""You are an expert movie recommendation AI assistant. Your job is to:
+
+1. Help users discover movies they'll love based on their preferences
+2. Provide detailed explanations for WHY each movie is recommended
+3. **ALWAYS prioritize the user's CURRENT input over past history**{history_context}
+
+IMPORTANT RULES:
+- When the user mentions a specific movie, genre, theme, or topic (like "car", "space", "romance"), ONLY recommend movies related to that current input
+- Past conversation history should ONLY be considered when:
+  a) The current query is vague or asks for "more recommendations"
+  b) The user explicitly asks to blend their past preferences with new ones
+- If the user says "I love [topic/movie]", find and recommend movies about that specific topic or similar to that movie
+
+When making recommendations:
+- Explain the connection between the user's CURRENT preferences and each recommendation
+- Highlight similar themes, genres, directors, actors, or storytelling styles
+- Be enthusiastic and engaging
+- Present recommendations in a clear, numbered format
+
+Use the get_movie_recommendations function when the user mentions specific movies, genres, themes, or topics they're interested in: put movie titles in `query` and themes or topics (like "car" or "space") in `topic`.
+Use the search_movies_by_description function when the user describes a plot, premise or mood in a sentence ("a heist with a twist ending").
+Use the recommend_from_taste_profile function when the request is vague or asks for more recommendations based on their past likes; it already covers the user's whole history.
+When the user restricts genre, release years, runtime or language, pass them as `filters` instead of only mentioning them in the query."""
@@ -0,0 +1,112 @@
+"""
+Embeddings for free-text descriptions ("heist movie with a twist ending").
+
+A description is embedded once, framed like the stored plot texts
+("Plot: ..."), so it can be searched against the `plot` vectors directly.
+Query embeddings are kept in a bounded in-memory LRU keyed by the text
+with only case, punctuation and whitespace folded, so "Heist, twist
+ending!" and "heist twist ending" share one entry. Words are kept as
+typed and in order: "not a comedy" and "a comedy", or "dog bites man" and
+"man bites dog", mean different things and get different embeddings.
+Misses go through the shared BatchEmbedder, which also
+consults the persistent EmbeddingCache before calling the API.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from response_cache import normalize_input
+
+load_dotenv()
+
+QUERY_CACHE_ENABLED = os.getenv("QUERY_EMBEDDING_CACHE", "1") != "0"
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "2048"))
+
+
+def normalize_query(text):
+    """Cache key of a description: lower-cased, punctuation-free and single-spaced, words in order."""
+    return normalize_input(text or "")
+
+
+def query_text(text):
+    """The text actually embedded, shaped like text_for_embedding's plot field."""
+    return f"Plot: {' '.join(str(text).split())}"
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU of query vectors keyed by normalize_query(text)."""
+
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.embed_seconds = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key, vector):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_embed(self, seconds):
+        """Adds the time one miss spent embedding, reported as mean_embed_ms."""
+        with self._lock:
+            self.embed_seconds += seconds
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "mean_embed_ms": self.embed_seconds / self.misses * 1000 if self.misses else 0.0}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_query_embedding_cache():
+    """The shared QueryEmbeddingCache, or None when QUERY_EMBEDDING_CACHE=0."""
+    global _cache
+    if not QUERY_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = QueryEmbeddingCache()
+        return _cache
+
+
+def embed_query(text, embedder=None):
+    """float32-compatible vector for a description; served from the LRU when a near-repeat was seen."""
+    from embeddings import get_default_embedder  # the Azure client is only created on a miss
+    cache = get_query_embedding_cache()
+    key = normalize_query(text)
+    if cache is not None:
+        vector = cache.get(key)
+        if vector is not None:
+            return vector
+    start = time.perf_counter()
+    vector = (embedder or get_default_embedder()).embed([query_text(text)])[0]
+    if cache is not None:
+        cache.record_embed(time.perf_counter() - start)
+        cache.put(key, vector)
+    return vector
@@ -0,0 +1,218 @@
+"""
+Executes the model's recommendation tool calls for one turn.
+
+Every tool call in the turn is run: distinct title queries are resolved
+concurrently, identical seed sets are searched once, and the seed details of
+all calls come from one lookup (see db_utils.get_recommendations_many).
+recommend_from_taste_profile calls search with the user's taste profile
+instead. Topic calls ("car", "space"), and title queries that match no
+title, are answered by db_utils.topic_search (BM25 fused with vectors);
+search_movies_by_description embeds the user's description and searches
+the plot vectors (db_utils.semantic_search). Every tool accepts `filters`
+(genres, years, runtime, language), which narrow the search itself rather
+than the returned list. The results are turned into the assistant/tool
+messages for a single follow-up completion, compacted to a token budget by
+context_builder. Shared by Function_calling and async_service.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from db_utils import movie_finder, get_recommendations_many, topic_search, semantic_search, WEIGHT_PRESETS
+from taste_profile import recommend_from_profile
+from metadata_index import normalize_filters
+from context_builder import CONTEXT_TOKEN_BUDGET, build_tool_contents
+from tracing import bind
+
+load_dotenv()
+
+RECOMMENDATION_TOOL = "get_movie_recommendations"
+PROFILE_TOOL = "recommend_from_taste_profile"
+DESCRIPTION_TOOL = "search_movies_by_description"
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "4"))
+
+
+def recommendation_calls(tool_calls):
+    """[(tool_call, arguments), ...] for the recommendation calls among `tool_calls`."""
+    calls = []
+    for tool_call in tool_calls or []:
+        if tool_call.function.name not in (RECOMMENDATION_TOOL, PROFILE_TOOL, DESCRIPTION_TOOL):
+            continue
+        try:
+            arguments = json.loads(tool_call.function.arguments or "{}")
+        except ValueError:
+            arguments = {}
+        calls.append((tool_call, arguments))
+    return calls
+
+
+def _tool_name(tool_call):
+    return tool_call["function"]["name"] if isinstance(tool_call, dict) else tool_call.function.name
+
+
+def _focus(value):
+    """The weight preset the model asked for, or None (the default weights) when it isn't one we know."""
+    return value if isinstance(value, str) and value in WEIGHT_PRESETS else None
+
+
+def run_recommendation_calls(calls, collection, n_results=5, max_workers=TOOL_MAX_WORKERS, user_id=None):
+    """
+    Runs every call. `calls` is a list of (tool_call, arguments[, movie_ids]);
+    pass movie_ids when the titles are already resolved (router fast path).
+    Taste-profile calls use `user_id`'s profile.
+
+    Returns one dict per call with "tool_call", "query", "seed_movies",
+    "recommendations" and, when nothing could be recommended, "error".
+    Taste-profile results also carry "profile" (how many liked movies it
+    covers), topic-search results "topic" (the keywords searched) and
+    description results "description".
+    """
+    results = []
+    for call in calls:
+        tool_call, arguments = call[0], call[1]
+        result = {"tool_call": tool_call, "query": str(arguments.get("query") or ""),
+                  "keywords": str(arguments.get("topic") or "").strip(),
+                  "description": str(arguments.get("description") or "").strip(),
+                  "focus": _focus(arguments.get("focus")), "filters": None,
+                  "movie_ids": call[2] if len(call) > 2 else None}
+        try:
+            result["filters"] = normalize_filters(arguments.get("filters") or None)
+        except (TypeError, ValueError, AttributeError) as e:
+            result.update(movie_ids=[], seed_movies=[], recommendations=[], error=f"Invalid filters: {e}")
+        results.append(result)
+
+    for result in results:
+        if _tool_name(result["tool_call"]) == PROFILE_TOOL and "error" not in result:
+            liked, similar_movies = recommend_from_profile(collection, n_results=n_results, weights=result["focus"],
+                                                           user_id=user_id, filters=result["filters"])
+            result.update(profile=liked, movie_ids=[], seed_movies=[], recommendations=similar_movies)
+            if not similar_movies:
+                result["error"] = ("No movies matching those filters fit your taste. Try loosening them."
+                                   if liked and result["filters"] else
+                                   "I don't know your taste yet. Tell me a few movies you like first.")
+
+    # Free-text descriptions: one query embedding each (cached for near-repeats), searched on plot vectors
+    descriptions = [r for r in results if _tool_name(r["tool_call"]) == DESCRIPTION_TOOL and "error" not in r]
+
+    def describe(result):
+        return semantic_search(result["description"], collection, n_results=n_results, filters=result["filters"])
+
+    if len(descriptions) > 1 and max_workers > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(descriptions))) as pool:
+            described = list(pool.map(bind(describe), descriptions))
+    else:
+        described = [describe(result) for result in descriptions]
+    for result, similar_movies in zip(descriptions, described):
+        result.update(movie_ids=[], seed_movies=[], recommendations=similar_movies)
+        if not similar_movies:
+            result["error"] = (f"Sorry, I couldn't find movies matching '{result['description']}'. "
+                               "Please describe it differently.")
+    all_results = results
+    results = [result for result in all_results if "profile" not in result and "error" not in result
+               and _tool_name(result["tool_call"]) != DESCRIPTION_TOOL]
+
+    # Step 1: resolve each distinct title query once, concurrently
+    queries = list(dict.fromkeys(r["query"] for r in results if r["movie_ids"] is None and r["query"]))
+    if len(queries) > 1 and max_workers > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(queries))) as pool:
+            found = dict(zip(queries, pool.map(bind(lambda query: movie_finder([query], collection)), queries)))
+    else:
+        found = {query: movie_finder([query], collection) for query in queries}
+    for result in results:
+        if result["movie_ids"] is None:
+            result["movie_ids"] = found.get(result["query"], [])
+
+    # Topic calls, and queries that named no known title, go to the local lexical + vector search
+    for result in results:
+        subject = result["keywords"] or result["query"]
+        if not result["movie_ids"] and subject:
+            movies = topic_search(subject, collection, n_results=n_results, weights=result["focus"],
+                                  filters=result["filters"])
+            if movies:
+                result.update(topic=subject, seed_movies=[], recommendations=movies)
+
+    # Steps 2 + 3: seed details and similar movies for every seed set in one batch
+    searchable = [r for r in results if r["movie_ids"]]
+    pairs = get_recommendations_many([(r["movie_ids"], r["focus"], r["filters"]) for r in searchable], collection,
+                                     n_results=n_results, max_workers=max_workers)
+    for result, (seed_movie_details, similar_movies) in zip(searchable, pairs):
+        result["seed_movies"] = seed_movie_details
+        result["recommendations"] = similar_movies
+
+    for result in results:
+        result.setdefault("seed_movies", [])
+        result.setdefault("recommendations", [])
+        if "topic" in result:
+            continue
+        if not result["movie_ids"] and result["keywords"] and not result["query"]:
+            result["error"] = f"Sorry, I couldn't find any movies about '{result['keywords']}'. Please try other keywords."
+        elif not result["movie_ids"]:
+            result["error"] = f"Sorry, I couldn't find any movies matching '{result['query']}'. Please try a different title."
+        elif not result["seed_movies"]:
+            result["error"] = f"Sorry, I couldn't load the details for '{result['query']}'. Please try again."
+        elif not result["recommendations"] and result["filters"]:
+            result["error"] = (f"I found '{result['seed_movies'][0]['title']}' but no similar movies match those "
+                               "filters. Try loosening them.")
+        elif not result["recommendations"]:
+            result["error"] = (f"I found '{result['seed_movies'][0]['title']}' but couldn't find similar movies. "
+                               "Please try another movie.")
+    return all_results
+
+
+def failure_message(results):
+    """The user-facing message when no call produced recommendations, else None."""
+    if any("error" not in result for result in results):
+        return None
+    return " ".join(dict.fromkeys(result["error"] for result in results))
+
+
+def tool_messages(results, token_budget=CONTEXT_TOKEN_BUDGET, info=None):
+    """
+    The assistant message carrying every tool call, then one tool message per
+    call. Payloads are compacted to fit `token_budget` (see context_builder);
+    `info`, when given, receives the size report under "context".
+    """
+    payloads = []
+    for result in results:
+        if "error" in result:
+            payloads.append({"query": result["query"], "error": result["error"]})
+        elif "profile" in result:
+            payloads.append({"taste_profile": {"liked_movies": result["profile"]},
+                             "recommendations": result["recommendations"]})
+        elif "topic" in result:
+            payloads.append({"topic": result["topic"], "recommendations": result["recommendations"]})
+        elif _tool_name(result["tool_call"]) == DESCRIPTION_TOOL:
+            payloads.append({"description": result["description"], "recommendations": result["recommendations"]})
+        else:
+            payloads.append({"seed_movies": result["seed_movies"], "recommendations": result["recommendations"]})
+    contents, report = build_tool_contents(payloads, token_budget)
+    if info is not None:
+        info["context"] = report
+
+    messages = [{"role": "assistant", "content": None, "tool_calls": [r["tool_call"] for r in results]}]
+    for result, content in zip(results, contents):
+        tool_call = result["tool_call"]
+        messages.append({
+            "role": "tool",
+            "tool_call_id": tool_call["id"] if isinstance(tool_call, dict) else tool_call.id,
+            "name": _tool_name(tool_call),
+            "content": content
+        })
+    return messages
+
+
+def uses_taste_profile(results):
+    """True when an answer depends on the taste profile, which changes with every new like."""
+    return any("profile" in result for result in results)
+
+
+def answer_cache_ids(results):
+    """(seed_ids, recommendation_ids, seed_titles) across the successful calls."""
+    seed_ids, recommendation_ids, seed_titles = [], [], []
+    for result in results:
+        if "error" in result:
+            continue
+        seed_ids += [movie["imdb_id"] for movie in result["seed_movies"]]
+        recommendation_ids += [movie["imdb_id"] for movie in result["recommendations"]]
+        seed_titles += [movie["title"] for movie in result["seed_movies"]]
+    return seed_ids, recommendation_ids, seed_titles
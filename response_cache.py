@@ -0,0 +1,160 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+from result_cache import TTLLRUCache, cache_key
+from history_manager import HISTORY_USER
+
+load_dotenv()
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") != "0"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_MAX_MB = float(os.getenv("RESPONSE_CACHE_MAX_MB", "16"))          # 0 = unlimited
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))     # 0 = never expire
+RESPONSE_CACHE_FILE = os.getenv("RESPONSE_CACHE_FILE", "")                       # empty = in-memory only
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "0") == "1"       # embed inputs for near-duplicates
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))  # cosine threshold
+
+
+def normalize_input(text):
+    """Lower-cased, punctuation-free, single-spaced user input."""
+    text = re.sub(r"[^\w\s]", " ", str(text).lower())
+    return " ".join(text.split())
+
+
+class ResponseCache:
+    """
+    Cache for the final, LLM-written recommendation answer.
+
+    Answers are keyed by the prompt version, the resolved seed IDs and the
+    recommended IDs, so a hit skips the second chat completion. Each stored
+    answer is also linked to the user and the normalized input that produced
+    it; a later input from the same user that normalizes to the same text
+    (or, with `semantic`, whose embedding is within `similarity` cosine of a
+    cached one) is answered without any LLM call. Input entries are per user
+    because the prompt carries that user's history, and a hit replays the
+    answer's seed titles into it. Both layers are TTL/LRU-bounded and are dropped
+    when the index version changes.
+    """
+
+    def __init__(self, prompt_version, max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+                 max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024, ttl=RESPONSE_CACHE_TTL, path=None,
+                 semantic=RESPONSE_CACHE_SEMANTIC, similarity=RESPONSE_CACHE_SIMILARITY, embed=None):
+        self.prompt_version = prompt_version
+        self.answers = TTLLRUCache(max_entries, max_bytes, ttl, path=path)
+        self.inputs = TTLLRUCache(max_entries, max_bytes, ttl, path=f"{path}.inputs" if path else None)
+        self.semantic = semantic
+        self.similarity = similarity
+        self.max_entries = int(max_entries)
+        self.semantic_hits = 0
+        self._embed = embed
+        self._vectors = OrderedDict()   # normalized input -> unit vector
+        self._matrix = None
+        self._vectors_version = None
+        self._lock = threading.Lock()
+
+    def bind_version(self, version):
+        self.answers.bind_version(version)
+        self.inputs.bind_version(version)
+        with self._lock:
+            if version != self._vectors_version:
+                self._vectors.clear()
+                self._matrix = None
+                self._vectors_version = version
+
+    def answer_key(self, seed_ids, recommendation_ids):
+        return cache_key("answer", self.prompt_version, sorted(set(seed_ids)), list(recommendation_ids))
+
+    def get_answer(self, seed_ids, recommendation_ids):
+        """Cached entry ({"answer", "seed_titles", "seed_ids"}) for this seed/recommendation set, or None."""
+        return self.answers.get(self.answer_key(seed_ids, recommendation_ids))
+
+    def input_key(self, normalized, user_id=None):
+        return cache_key("input", user_id or HISTORY_USER, normalized)
+
+    def get_for_input(self, user_input, user_id=None):
+        """Cached entry for this (or, semantically, a near-identical) input from `user_id`, or None."""
+        normalized = normalize_input(user_input)
+        if not normalized:
+            return None
+        answer_key = self.inputs.get(self.input_key(normalized, user_id))
+        if answer_key is None and self.semantic:
+            match = self._nearest(normalized)
+            if match is not None:
+                answer_key = self.inputs.get(self.input_key(match, user_id))
+                if answer_key is not None:
+                    self.semantic_hits += 1
+        if answer_key is None:
+            return None
+        return self.answers.get(answer_key)
+
+    def put(self, user_input, seed_ids, recommendation_ids, answer, seed_titles=(), user_id=None):
+        answer_key = self.answer_key(seed_ids, recommendation_ids)
+        self.answers.put(answer_key, {"answer": answer, "seed_titles": list(seed_titles), "seed_ids": list(seed_ids)})
+        normalized = normalize_input(user_input)
+        if normalized:
+            self.inputs.put(self.input_key(normalized, user_id), answer_key)
+            if self.semantic:
+                self._remember_vector(normalized)
+
+    def _embed_text(self, text):
+        if self._embed is None:
+            from embeddings import create_embedding
+            self._embed = create_embedding
+        vector = np.asarray(self._embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remember_vector(self, normalized):
+        try:
+            vector = self._embed_text(normalized)
+        except Exception as e:
+            print(f"Response cache: could not embed input ({e})")
+            return
+        with self._lock:
+            self._vectors[normalized] = vector
+            self._vectors.move_to_end(normalized)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+            self._matrix = None
+
+    def _nearest(self, normalized):
+        with self._lock:
+            if not self._vectors:
+                return None
+            if self._matrix is None:
+                self._matrix = (list(self._vectors), np.stack(list(self._vectors.values())))
+            keys, matrix = self._matrix
+        try:
+            query = self._embed_text(normalized)
+        except Exception as e:
+            print(f"Response cache: could not embed input ({e})")
+            return None
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+        return keys[best] if scores[best] >= self.similarity else None
+
+    def stats(self):
+        answers, inputs = self.answers.stats(), self.inputs.stats()
+        return {
+            "answers": answers,
+            "inputs": inputs,
+            "semantic_hits": self.semantic_hits,
+            "semantic_entries": len(self._vectors),
+        }
+
+
+_default_cache = {}
+_default_cache_lock = threading.Lock()
+
+
+def get_response_cache(prompt_version):
+    """Shared ResponseCache for a prompt version, or None when RESPONSE_CACHE=0."""
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if prompt_version not in _default_cache:
+            _default_cache[prompt_version] = ResponseCache(prompt_version, path=RESPONSE_CACHE_FILE or None)
+        return _default_cache[prompt_version]
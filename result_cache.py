@@ -0,0 +1,170 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE", "1") != "0"
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024"))
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "64"))       # 0 = unlimited
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))   # 0 = never expire
+RESULT_CACHE_FILE = os.getenv("RESULT_CACHE_FILE", "")                    # empty = in-memory only
+
+
+class TTLLRUCache:
+    """
+    Bounded in-process cache with LRU eviction and a per-entry TTL.
+
+    Values must be JSON-serializable; their encoded size is what `max_bytes`
+    and the `bytes` stat measure. Every entry belongs to a `version` (the
+    index version it was computed from): calling `bind_version` with a
+    different version drops everything, so a re-index invalidates the cache
+    without anyone having to clear it. With a `path`, entries are loaded at
+    start-up and written back on `save()` and at interpreter exit.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024,
+                 ttl=RESULT_CACHE_TTL, path=None, clock=time.time):
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self.ttl = float(ttl)
+        self.path = path
+        self.clock = clock
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()   # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+            atexit.register(self.save)
+
+    def bind_version(self, version):
+        """Drops every entry if `version` differs from the one the cache holds."""
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._bytes = 0
+                self.version = version
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and entry[0] <= self.clock():
+                self._remove_locked(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, value):
+        size = len(json.dumps(value, ensure_ascii=False)) + len(key)
+        expires_at = self.clock() + self.ttl if self.ttl else float("inf")
+        with self._lock:
+            if key in self._entries:
+                self._remove_locked(key)
+            self._entries[key] = (expires_at, size, value)
+            self._bytes += size
+            self._evict_locked()
+
+    def _remove_locked(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict_locked(self):
+        while self._entries and (
+                (self.max_entries and len(self._entries) > self.max_entries)
+                or (self.max_bytes and self._bytes > self.max_bytes)):
+            key = next(iter(self._entries))
+            self._remove_locked(key)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Hit/miss counters plus current size, for sizing the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def save(self):
+        """Writes unexpired entries to `path` (least recently used first)."""
+        if not self.path:
+            return
+        now = self.clock()
+        with self._lock:
+            entries = [[key, expires_at if expires_at != float("inf") else None, value]
+                       for key, (expires_at, _, value) in self._entries.items() if expires_at > now]
+            payload = {"version": self.version, "entries": entries}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving result cache: {e}")
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = self.clock()
+        self.version = payload.get("version")
+        for key, expires_at, value in payload.get("entries", []):
+            expires_at = float("inf") if expires_at is None else expires_at
+            if expires_at > now:
+                size = len(json.dumps(value, ensure_ascii=False)) + len(key)
+                self._entries[key] = (expires_at, size, value)
+                self._bytes += size
+        self._evict_locked()
+
+
+def cache_key(*parts):
+    """Stable string key from JSON-serializable parts."""
+    return json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Returns the shared recommendation cache, or None when RESULT_CACHE=0."""
+    global _default_cache
+    if not RESULT_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TTLLRUCache(path=RESULT_CACHE_FILE or None)
+        return _default_cache
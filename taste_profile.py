@@ -0,0 +1,175 @@
+"""
+Per-user taste profile: the running mean of the liked movies' vectors in
+each embedded field.
+
+Every time a movie is liked, its vector is folded into the user's profile
+(mean += (vector - mean) / count), so an update costs O(d) per field no
+matter how long the history is. Profiles live next to the history in the
+same SQLite file, written through the HistoryStore's own connection so a
+profile update doesn't invalidate the cached history, and a vague request ("more recommendations") becomes one
+weighted vector search with the profile as the query instead of
+re-resolving every past title.
+
+Because the search uses the centroid of the liked movies, profile results
+match find_similar_movies over the whole history.
+"""
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from dotenv import load_dotenv
+import history_manager
+from db_utils import get_field_vectors, find_similar_to_vectors, movie_finder
+from tracing import traced
+
+load_dotenv()
+
+TASTE_PROFILE_ENABLED = os.getenv("TASTE_PROFILE", "1") != "0"
+
+
+class TasteProfileStore:
+    """Running-mean profile vectors per (user, field), plus the movies folded in.
+
+    Shares the connection and lock of `history` (a HistoryStore, default the
+    shared one), which owns and closes them.
+    """
+
+    def __init__(self, history=None):
+        history = history or history_manager.get_history_store()
+        self.path = history.path
+        self._conn, self._lock = history.shared_connection()
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS taste_profile (
+                   user_id TEXT NOT NULL,
+                   field TEXT NOT NULL,
+                   count INTEGER NOT NULL,
+                   vector BLOB NOT NULL,
+                   updated_at REAL NOT NULL,
+                   PRIMARY KEY (user_id, field)
+               ) WITHOUT ROWID"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS taste_profile_movies (
+                   user_id TEXT NOT NULL,
+                   imdb_id TEXT NOT NULL,
+                   PRIMARY KEY (user_id, imdb_id)
+               ) WITHOUT ROWID"""
+        )
+
+    def _known_locked(self, user_id, movie_ids):
+        placeholders = ",".join("?" * len(movie_ids))
+        return {row[0] for row in self._conn.execute(
+            f"SELECT imdb_id FROM taste_profile_movies WHERE user_id = ? AND imdb_id IN ({placeholders})",
+            [user_id, *movie_ids])}
+
+    def add(self, user_id, movie_ids, collection, backend=None):
+        """Folds the movies not yet in the profile into it; returns how many were added."""
+        movie_ids = list(dict.fromkeys(movie_ids or []))
+        if not movie_ids:
+            return 0
+        with self._lock:
+            new_ids = [movie_id for movie_id in movie_ids if movie_id not in self._known_locked(user_id, movie_ids)]
+        if not new_ids:
+            return 0
+        vectors = get_field_vectors(new_ids, collection, backend=backend)
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # another process may have folded some of them in meanwhile
+                known = self._known_locked(user_id, new_ids)
+                added = [movie_id for movie_id in new_ids if movie_id not in known
+                         and any(movie_id in field_vectors for field_vectors in vectors.values())]
+                now = time.time()
+                for field, field_vectors in vectors.items():
+                    row = self._conn.execute("SELECT count, vector FROM taste_profile WHERE user_id = ? AND field = ?",
+                                             (user_id, field)).fetchone()
+                    count, mean = (row[0], np.frombuffer(row[1], dtype=np.float32).copy()) if row else (0, None)
+                    changed = False
+                    for movie_id in added:
+                        vector = field_vectors.get(movie_id)
+                        if vector is None or (mean is not None and len(vector) != len(mean)):
+                            continue
+                        count += 1
+                        mean = np.array(vector, dtype=np.float32) if mean is None else mean + (vector - mean) / count
+                        changed = True
+                    if changed:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO taste_profile (user_id, field, count, vector, updated_at) VALUES (?, ?, ?, ?, ?)",
+                            (user_id, field, count, mean.astype(np.float32).tobytes(), now),
+                        )
+                self._conn.executemany("INSERT INTO taste_profile_movies (user_id, imdb_id) VALUES (?, ?)",
+                                       [(user_id, movie_id) for movie_id in added])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return len(added)
+
+    def get(self, user_id):
+        """{"fields": {field: mean vector}, "count": movies folded in, "movie_ids": [...]}."""
+        with self._lock:
+            rows = self._conn.execute("SELECT field, vector FROM taste_profile WHERE user_id = ?", (user_id,)).fetchall()
+            movie_ids = [row[0] for row in self._conn.execute(
+                "SELECT imdb_id FROM taste_profile_movies WHERE user_id = ?", (user_id,))]
+        fields = {field: np.frombuffer(blob, dtype=np.float32) for field, blob in rows}
+        return {"fields": fields, "count": len(movie_ids), "movie_ids": movie_ids}
+
+    def clear(self, user_id):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM taste_profile WHERE user_id = ?", (user_id,))
+            self._conn.execute("DELETE FROM taste_profile_movies WHERE user_id = ?", (user_id,))
+            self._conn.execute("COMMIT")
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_taste_profiles():
+    """The shared TasteProfileStore (in the HISTORY_DB file), or None when TASTE_PROFILE=0."""
+    if not TASTE_PROFILE_ENABLED:
+        return None
+    with _stores_lock:
+        path = history_manager.HISTORY_DB
+        if path not in _stores:
+            _stores[path] = TasteProfileStore(history_manager.get_history_store())
+        return _stores[path]
+
+
+@traced("taste_profile.update")
+def update_taste_profile(movie_ids, collection, user_id=None):
+    """Folds newly liked movies into the user's profile (no-op when disabled)."""
+    profiles = get_taste_profiles()
+    if profiles is None or not movie_ids:
+        return
+    try:
+        profiles.add(user_id or history_manager.HISTORY_USER, movie_ids, collection)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error updating taste profile: {e}")
+
+
+@traced()
+def recommend_from_profile(collection, n_results=5, weights=None, user_id=None, filters=None):
+    """
+    Recommendations for the user's overall taste, excluding movies they
+    already liked and limited to `filters`: (liked_count, similar_movies).
+    A history recorded before profiles existed is folded in on first use.
+    """
+    profiles = get_taste_profiles()
+    if profiles is None:
+        return 0, []
+    user_id = user_id or history_manager.HISTORY_USER
+    profile = profiles.get(user_id)
+    if not profile["count"]:
+        titles = history_manager.load_conversation_history(user_id)
+        if titles:
+            profiles.add(user_id, movie_finder(titles, collection), collection)
+            profile = profiles.get(user_id)
+    if not profile["fields"]:
+        return 0, []
+    similar_movies = find_similar_to_vectors(profile["fields"], collection, n_results=n_results,
+                                             weights=weights, exclude_ids=profile["movie_ids"], filters=filters)
+    return profile["count"], similar_movies
@@ -0,0 +1,179 @@
+import threading
+import numpy as np
+from rapidfuzz import process, fuzz, utils
+
+MATCH_SCORE_CUTOFF = 80      # minimum fuzz.WRatio score for a title match
+FULL_SCAN_MAX_TITLES = 2000   # below this a vectorized full scan is cheaper than pruning
+MAX_CANDIDATES = 256          # titles rescored with WRatio per query
+MAX_POSTINGS = 50000          # posting entries read per query before rare-trigram cutoff
+
+
+def _trigrams(text):
+    """Character trigrams of a normalized, space-padded title."""
+    text = f"  {utils.default_process(text)} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class TitleIndex:
+    """
+    In-memory title → IMDb ID index used by movie_finder.
+
+    Every ID is kept for duplicate titles (remakes), ordered by popularity and
+    then year. Small catalogs are scored with one vectorized rapidfuzz `cdist`
+    pass; large ones first prune candidates with character-trigram postings
+    (rarest trigrams first, bounded work per query) and only rescore those.
+    """
+
+    def __init__(self, ids, metadatas, full_scan_max_titles=FULL_SCAN_MAX_TITLES):
+        groups = {}
+        for movie_id, meta in zip(ids, metadatas):
+            title_lower = meta.get('title_lower') or meta.get('title', '').lower()
+            groups.setdefault(title_lower, []).append(
+                (_to_float(meta.get('popularity')), int(meta.get('year') or 0), movie_id, meta.get('title', ''))
+            )
+        self.titles = list(groups.keys())
+        # per unique title: entries sorted by (popularity, year) descending
+        self.entries = [sorted(group, reverse=True) for group in groups.values()]
+        self.ids = [entries[0][2] for entries in self.entries]
+        self._popularity = np.array([e[0][0] for e in self.entries], dtype=np.float64)
+        self._year = np.array([e[0][1] for e in self.entries], dtype=np.int32)
+        self.full_scan_max_titles = full_scan_max_titles
+        self._postings = self._build_postings() if len(self.titles) > full_scan_max_titles else None
+
+    def _build_postings(self):
+        postings = {}
+        for title_idx, title in enumerate(self.titles):
+            for gram in _trigrams(title):
+                postings.setdefault(gram, []).append(title_idx)
+        return {gram: np.array(idxs, dtype=np.int32) for gram, idxs in postings.items()}
+
+    @classmethod
+    def from_collection(cls, collection):
+        # paged: one get() of a 100k-movie catalog exceeds SQLite's bound-variable limit
+        ids, metadatas = [], []
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=5000, offset=offset)
+            if not page["ids"]:
+                break
+            ids.extend(page["ids"])
+            metadatas.extend(page["metadatas"])
+            offset += len(page["ids"])
+        return cls(ids, metadatas)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _candidates(self, query):
+        """Title indices sharing the most trigrams with `query`, or None to scan all."""
+        if self._postings is None:
+            return None
+        lists = sorted((self._postings[g] for g in _trigrams(query) if g in self._postings), key=len)
+        selected, budget = [], MAX_POSTINGS
+        for postings in lists:
+            if selected and len(postings) > budget:
+                break
+            selected.append(postings)
+            budget -= len(postings)
+        if not selected:
+            return np.empty(0, dtype=np.int32)
+        idxs, counts = np.unique(np.concatenate(selected), return_counts=True)
+        if len(idxs) > MAX_CANDIDATES:
+            keep = np.argpartition(-counts, MAX_CANDIDATES - 1)[:MAX_CANDIDATES]
+            idxs = idxs[keep]
+        return idxs
+
+    def _rank(self, scores, title_idxs, limit):
+        """Orders scored titles by score, then popularity, then year."""
+        order = np.lexsort((-self._year[title_idxs], -self._popularity[title_idxs], -scores))
+        return [(int(title_idxs[i]), float(scores[i])) for i in order[:limit] if scores[i] > 0]
+
+    def search(self, title, limit=5, score_cutoff=MATCH_SCORE_CUTOFF):
+        """Returns up to `limit` (title_index, score) pairs, best first."""
+        query = title.lower()
+        candidates = self._candidates(query)
+        if candidates is None:
+            candidates = np.arange(len(self.titles))
+        if len(candidates) == 0:
+            return []
+        choices = [self.titles[i] for i in candidates]
+        scores = process.cdist([query], choices, scorer=fuzz.WRatio, score_cutoff=score_cutoff)[0]
+        return self._rank(scores, candidates, limit)
+
+    def lookup(self, title, limit=5, score_cutoff=MATCH_SCORE_CUTOFF):
+        """
+        Top fuzzy matches for one title.
+
+        Returns:
+            List of {"title", "score", "movies": [{"imdb_id", "popularity", "year"}, ...]}
+            with every ID sharing that title, most popular first.
+        """
+        return [{
+            "title": self.entries[idx][0][3],
+            "score": score,
+            "movies": [{"imdb_id": movie_id, "popularity": popularity, "year": year}
+                       for popularity, year, movie_id, _ in self.entries[idx]]
+        } for idx, score in self.search(title, limit, score_cutoff)]
+
+    def match(self, titles, score_cutoff=MATCH_SCORE_CUTOFF):
+        """Returns the best-matching ID for each title that clears the cutoff."""
+        if not titles or not self.titles:
+            return []
+        if self._postings is not None:
+            found_ids = []
+            for title in titles:
+                best = self.search(title, limit=1, score_cutoff=score_cutoff)
+                if best:
+                    found_ids.append(self.ids[best[0][0]])
+            return found_ids
+        queries = [title.lower() for title in titles]
+        scores = process.cdist(
+            queries,
+            self.titles,
+            scorer=fuzz.WRatio,
+            score_cutoff=score_cutoff,
+            workers=-1
+        )
+        found_ids = []
+        for row in scores:
+            # cdist reports 0 for pairs below the cutoff
+            top = row.max()
+            if top <= 0:
+                continue
+            ties = np.flatnonzero(row == top)
+            best = self._rank(row[ties], ties, 1)
+            found_ids.append(self.ids[best[0][0]])
+        return found_ids
+
+    def full_scan(self, title, score_cutoff=MATCH_SCORE_CUTOFF):
+        """Reference lookup scoring every title (the pre-index behaviour)."""
+        best = process.extractOne(title.lower(), self.titles, scorer=fuzz.WRatio, score_cutoff=score_cutoff)
+        return self.ids[best[2]] if best else None
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_title_index(collection, version=None):
+    """
+    Returns the process-wide TitleIndex for `collection`, rebuilding it only
+    when the collection's row count or the given index `version` changes.
+    """
+    # chroma collections share a UUID across client instances in one process
+    key = getattr(collection, "id", None) or id(collection)
+    state = (collection.count(), version)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+        index = TitleIndex.from_collection(collection)
+        _cache[key] = (state, index)
+        return index
@@ -0,0 +1,405 @@
+"""
+Per-stage latency, token usage and cache hit rates for the request and
+build pipelines.
+
+Stages are wrapped in spans (`with span("history.save"):` or the `traced`
+decorator). Spans nest through a context variable, so a span opened while
+another is running becomes its child; one with no parent is the root of a
+trace (one chat turn, one index build). Work handed to a thread pool keeps
+its parent when the callable is wrapped with `bind`.
+
+Every finished span feeds a per-stage latency histogram; `record_usage`
+adds the prompt/completion tokens an API response reports. Nothing is
+written on the request path: when a root span ends its trace is queued, and
+a background exporter thread appends the queued traces to TRACE_FILE as
+JSON lines and rewrites METRICS_FILE in the Prometheus text format (for
+node_exporter's textfile collector) every METRICS_INTERVAL seconds, and
+once more at exit. The async service renders the metrics on demand at
+GET /metrics.
+
+Tracing is off unless TRACING=1. Disabled, `span` returns a shared no-op
+object and the other hooks return immediately, so the instrumented code
+pays one flag check per stage.
+"""
+import atexit
+import contextvars
+import functools
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRACING_ENABLED = os.getenv("TRACING", "0") != "0"
+TRACE_FILE = os.getenv("TRACE_FILE", "")      # JSON lines, one per finished trace (written in the background)
+METRICS_FILE = os.getenv("METRICS_FILE", "")  # Prometheus text file, rewritten periodically; empty = not written
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "15"))  # seconds between METRICS_FILE rewrites
+METRIC_PREFIX = "movie_recs"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current = contextvars.ContextVar("tracing_span", default=None)
+
+
+class _NoopSpan:
+    """What `span` returns while tracing is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """One timed stage. Attributes set with `set` end up in the trace record."""
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.parent = None
+        self.root = self
+        self.span_id = 0
+        self.start = 0.0
+        self.duration = 0.0
+        self.error = None
+        self._token = None
+        # root-only state
+        self.trace_id = None
+        self.wall_start = 0.0
+        self.spans = []
+        self.tokens = Counter()
+        self._ids = None
+
+    def __enter__(self):
+        self.parent = _current.get()
+        if self.parent is None:
+            self.trace_id = uuid.uuid4().hex[:16]
+            self.wall_start = time.time()
+            self._ids = itertools.count(1)
+        else:
+            self.root = self.parent.root
+            self.span_id = next(self.root._ids)
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.error = exc_type.__name__
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # exited in another context than it was entered in (a generator
+            # finished by another task); the span itself is still complete
+            pass
+        _metrics.observe(self.name, self.duration, self.error is not None)
+        if self.parent is None:
+            _finish_trace(self)
+        else:
+            self.root.spans.append(self)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def record(self):
+        """The span as a JSON-serializable dict, times relative to the trace start in ms."""
+        record = {"id": self.span_id, "name": self.name,
+                  "start_ms": round((self.start - self.root.start) * 1000, 3),
+                  "duration_ms": round(self.duration * 1000, 3)}
+        if self.parent is not None:
+            record["parent"] = self.parent.span_id
+        if self.error:
+            record["error"] = self.error
+        if self.attrs:
+            record["attrs"] = self.attrs
+        return record
+
+
+def span(name, **attrs):
+    """Context manager timing one stage under `name`; a no-op while tracing is off."""
+    if not TRACING_ENABLED:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def traced(name=None):
+    """Decorator: runs the function inside span(name or the function's name)."""
+    def decorate(fn):
+        stage = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not TRACING_ENABLED:
+                return fn(*args, **kwargs)
+            with Span(stage, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def bind(fn):
+    """`fn` wrapped to run under the caller's current span, e.g. for pool.map; `fn` itself when off."""
+    if not TRACING_ENABLED or _current.get() is None:
+        return fn
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # a Context can only be entered by one thread at a time: give each call its own copy
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+def record_usage(usage, stage):
+    """Counts the tokens an API response reports (`response.usage`) under `stage`."""
+    if not TRACING_ENABLED or usage is None:
+        return
+    tokens = {"prompt": getattr(usage, "prompt_tokens", None) or 0,
+              "completion": getattr(usage, "completion_tokens", None) or 0}
+    _metrics.add_tokens(stage, tokens)
+    current = _current.get()
+    if current is not None:
+        current.root.tokens.update({f"{stage}.{kind}": count for kind, count in tokens.items() if count})
+
+
+def stream_options():
+    """Extra chat.completions.create arguments so a stream ends with a usage chunk while tracing.
+
+    Needs an API version that accepts stream_options (Azure 2024-09-01-preview or later).
+    """
+    return {"stream_options": {"include_usage": True}} if TRACING_ENABLED else {}
+
+
+class Metrics:
+    """Latency histograms per stage and token counters, aggregated over the process lifetime."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.stages = {}
+        self.tokens = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, error=False):
+        with self._lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0,
+                                              "errors": 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry["buckets"][i] += 1
+                    break
+            entry["count"] += 1
+            entry["sum"] += seconds
+            entry["errors"] += error
+
+    def add_tokens(self, stage, tokens):
+        with self._lock:
+            for kind, count in tokens.items():
+                self.tokens[(stage, kind)] += count
+
+    def snapshot(self):
+        with self._lock:
+            stages = {stage: {"count": e["count"], "errors": e["errors"],
+                              "mean_ms": e["sum"] / e["count"] * 1000 if e["count"] else 0.0,
+                              "buckets": list(e["buckets"]), "sum": e["sum"]}
+                      for stage, e in self.stages.items()}
+            tokens = dict(self.tokens)
+        return stages, tokens
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.tokens.clear()
+
+
+_metrics = Metrics()
+_write_lock = threading.Lock()
+_trace_queue = queue.SimpleQueue()
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def _finish_trace(root):
+    if TRACE_FILE:
+        record = {"trace_id": root.trace_id, "name": root.name,
+                  "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(root.wall_start)),
+                  "duration_ms": round(root.duration * 1000, 3), "tokens": dict(root.tokens),
+                  "spans": [root.record()] + [child.record() for child in sorted(root.spans, key=lambda s: s.start)]}
+        if root.error:
+            record["error"] = root.error
+        _trace_queue.put(record)
+    if (TRACE_FILE or METRICS_FILE) and _exporter is None:
+        _start_exporter()
+
+
+def _start_exporter():
+    """Starts the thread that writes queued traces and the metrics file, once per process."""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is not None:
+            return
+        _exporter = threading.Thread(target=_export_periodically, name="tracing-exporter", daemon=True)
+        _exporter.start()
+        atexit.register(_stop_exporter)
+
+
+def _stop_exporter():
+    # the exporter may hold records it already took off the queue: let it finish rather than drain here
+    _trace_queue.put(None)
+    _exporter.join(timeout=10)
+
+
+def _export_periodically():
+    next_metrics = time.monotonic() + METRICS_INTERVAL
+    while True:
+        try:
+            records = [_trace_queue.get(timeout=max(next_metrics - time.monotonic(), 0))]
+        except queue.Empty:
+            records = []
+        stopping = _write_traces(records)
+        if stopping or time.monotonic() >= next_metrics:
+            _write_metrics_quietly()
+            next_metrics = time.monotonic() + METRICS_INTERVAL
+        if stopping:
+            return
+
+
+def _write_traces(records):
+    """Appends `records` and whatever else is queued to TRACE_FILE in one write;
+    True when the queue held the stop marker (None)."""
+    while True:
+        try:
+            records.append(_trace_queue.get_nowait())
+        except queue.Empty:
+            break
+    stopping = None in records
+    records = [record for record in records if record is not None]
+    if not records or not TRACE_FILE:
+        return stopping
+    lines = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records)
+    try:
+        with _write_lock:
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(lines)
+    except OSError as e:
+        print(f"Could not write traces to {TRACE_FILE}: {e}")
+    return stopping
+
+
+def _write_metrics_quietly():
+    if not METRICS_FILE:
+        return
+    try:
+        write_metrics_file(METRICS_FILE)
+    except OSError as e:
+        print(f"Could not write metrics to {METRICS_FILE}: {e}")
+
+
+def cache_stats():
+    """Hit/miss counters of the process's shared caches, keyed by cache name."""
+    from result_cache import get_result_cache
+    from response_cache import get_response_cache
+    from intent_router import get_intent_router
+    from query_embeddings import get_query_embedding_cache
+    from prompts import PROMPT_VERSION
+    import embedding_cache
+    stats = {}
+    result_cache = get_result_cache()
+    if result_cache is not None:
+        stats["result"] = result_cache.stats()
+    response_cache = get_response_cache(PROMPT_VERSION)
+    if response_cache is not None:
+        response = response_cache.stats()
+        stats["response_answers"] = response["answers"]
+        stats["response_inputs"] = response["inputs"]
+    query_cache = get_query_embedding_cache()
+    if query_cache is not None:
+        stats["query_embeddings"] = query_cache.stats()
+    if embedding_cache._default_cache is not None:  # don't open the SQLite file just to report on it
+        stats["embeddings"] = embedding_cache._default_cache.stats()
+    router = get_intent_router()
+    if router is not None:
+        counts = router.stats()
+        fast = counts.get("fast_path", 0)
+        stats["router_fast_path"] = {"hits": fast, "misses": counts.get("inputs", 0) - fast,
+                                     "hit_rate": counts["fast_path_rate"]}
+    return stats
+
+
+def metrics_snapshot():
+    """Stage latencies, token totals and cache hit rates as a JSON-serializable dict."""
+    stages, tokens = _metrics.snapshot()
+    by_stage = {}
+    for (stage, kind), count in sorted(tokens.items()):
+        by_stage.setdefault(stage, {})[kind] = count
+    return {"enabled": TRACING_ENABLED,
+            "stages": {stage: {"count": e["count"], "errors": e["errors"], "mean_ms": round(e["mean_ms"], 3)}
+                       for stage, e in sorted(stages.items())},
+            "tokens": by_stage,
+            "cache_hit_rates": {name: round(s.get("hit_rate", 0.0), 4) for name, s in cache_stats().items()}}
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def prometheus_text():
+    """All metrics in the Prometheus text exposition format."""
+    stages, tokens = _metrics.snapshot()
+    name = f"{METRIC_PREFIX}_stage_duration_seconds"
+    lines = [f"# HELP {name} Time spent in each pipeline stage.", f"# TYPE {name} histogram"]
+    for stage, entry in sorted(stages.items()):
+        cumulative = 0
+        for bound, count in zip(_metrics.buckets, entry["buckets"]):
+            cumulative += count
+            lines.append(f'{name}_bucket{{stage="{_label(stage)}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{stage="{_label(stage)}",le="+Inf"}} {entry["count"]}')
+        lines.append(f'{name}_sum{{stage="{_label(stage)}"}} {entry["sum"]:.6f}')
+        lines.append(f'{name}_count{{stage="{_label(stage)}"}} {entry["count"]}')
+
+    name = f"{METRIC_PREFIX}_stage_errors_total"
+    lines += [f"# HELP {name} Stages that ended with an exception.", f"# TYPE {name} counter"]
+    lines += [f'{name}{{stage="{_label(stage)}"}} {entry["errors"]}' for stage, entry in sorted(stages.items())]
+
+    name = f"{METRIC_PREFIX}_llm_tokens_total"
+    lines += [f"# HELP {name} Tokens reported by the API, by calling stage and kind.", f"# TYPE {name} counter"]
+    lines += [f'{name}{{stage="{_label(stage)}",kind="{kind}"}} {count}'
+              for (stage, kind), count in sorted(tokens.items())]
+
+    caches = sorted(cache_stats().items())
+    for metric, key, kind, help_text in (("cache_hits_total", "hits", "counter", "Cache lookups that hit."),
+                                         ("cache_misses_total", "misses", "counter", "Cache lookups that missed."),
+                                         ("cache_hit_ratio", "hit_rate", "gauge", "Hits over lookups so far.")):
+        name = f"{METRIC_PREFIX}_{metric}"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{cache="{_label(cache)}"}} {stats.get(key, 0)}' for cache, stats in caches]
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path=None):
+    """Atomically rewrites `path` (default METRICS_FILE) with prometheus_text()."""
+    path = path or METRICS_FILE
+    text = prometheus_text()
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def reset_metrics():
+    _metrics.reset()
@@ -0,0 +1,233 @@
+"""
+Memory-mapped NumPy vector backend.
+
+`export_vectors` dumps every field collection to `<dir>/<field>.npy` (float32,
+float16 or int8 with per-row scales) plus an ID/catalog sidecar. The matrices
+are opened with `mmap_mode="r"`, so worker processes share the same OS pages
+instead of each holding a copy. Searches are exact: a blocked matrix-vector
+product followed by `argpartition`.
+
+Similarities follow ChromaDB's convention (`1 - squared L2 distance`) so the
+two backends return comparable `similarity_score`s.
+"""
+import json
+import os
+import shutil
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")          # chroma | numpy
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "./vector_store")
+VECTOR_STORE_DTYPE = os.getenv("VECTOR_STORE_DTYPE", "float32")  # float32 | float16 | int8
+SEARCH_BLOCK_ROWS = 16384  # rows converted to float32 at a time for float16/int8 matrices
+SIDECAR_FILE = "ids.json"
+CATALOG_FILE = "catalog.json"
+
+
+def _fetch_all(collection, include, page_size=1000):
+    """Pages through collection.get so large catalogs aren't fetched in one response."""
+    offset = 0
+    while True:
+        page = collection.get(include=include, limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+def _write_matrix(path, vectors, dtype):
+    """Writes one field matrix; returns (scales or None, squared norms)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        stored = np.round(vectors / scales[:, None]).astype(np.int8)
+        restored = stored.astype(np.float32) * scales[:, None]
+    else:
+        scales = None
+        stored = vectors.astype(dtype)
+        restored = stored.astype(np.float32)
+    matrix = np.lib.format.open_memmap(path, mode="w+", dtype=stored.dtype, shape=stored.shape)
+    matrix[:] = stored
+    matrix.flush()
+    del matrix
+    return scales, np.einsum("ij,ij->i", restored, restored)
+
+
+def replace_dir(tmp_dir, out_dir):
+    """Swaps a freshly written directory into place of `out_dir`."""
+    old_dir = f"{out_dir}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def export_vectors(collection, out_dir=VECTOR_STORE_DIR, dtype=VECTOR_STORE_DTYPE, index_version=None):
+    """
+    Exports a MovieCollections to memory-mappable matrices.
+
+    Rows follow the primary collection's order; every field matrix uses the
+    same row numbering. The export is written next to `out_dir` and swapped
+    in at the end, so readers never see a half-written store.
+    """
+    if dtype not in ("float32", "float16", "int8"):
+        raise ValueError(f"Unsupported vector store dtype '{dtype}'")
+    ids, catalog = [], []
+    for page in _fetch_all(collection.primary, ["metadatas", "documents"]):
+        ids.extend(page["ids"])
+        for meta, document in zip(page["metadatas"], page["documents"]):
+            catalog.append({**meta, "overview": document})
+    row_of = {movie_id: row for row, movie_id in enumerate(ids)}
+
+    tmp_dir = f"{out_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    dims = {}
+    for field, field_collection in collection.fields.items():
+        vectors = None
+        for page in _fetch_all(field_collection, ["embeddings"]):
+            page_vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            if vectors is None:
+                vectors = np.zeros((len(ids), page_vectors.shape[1]), dtype=np.float32)
+            rows = [row_of.get(movie_id, -1) for movie_id in page["ids"]]
+            for i, row in enumerate(rows):
+                if row >= 0:
+                    vectors[row] = page_vectors[i]
+        if vectors is None:
+            continue
+        scales, norms = _write_matrix(os.path.join(tmp_dir, f"{field}.npy"), vectors, dtype)
+        np.save(os.path.join(tmp_dir, f"{field}.norms.npy"), norms.astype(np.float32))
+        if scales is not None:
+            np.save(os.path.join(tmp_dir, f"{field}.scales.npy"), scales.astype(np.float32))
+        dims[field] = int(vectors.shape[1])
+        del vectors
+
+    with open(os.path.join(tmp_dir, SIDECAR_FILE), "w", encoding="utf-8") as f:
+        json.dump({"ids": ids, "dtype": dtype, "dims": dims, "index_version": index_version}, f)
+    with open(os.path.join(tmp_dir, CATALOG_FILE), "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False)
+
+    replace_dir(tmp_dir, out_dir)
+    print(f"Exported {len(ids)} movies x {len(dims)} fields to {out_dir} ({dtype}).")
+
+
+class NumpyVectorStore:
+    """Read-only, memory-mapped view of an exported vector store."""
+
+    def __init__(self, store_dir=VECTOR_STORE_DIR):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, SIDECAR_FILE), "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        with open(os.path.join(store_dir, CATALOG_FILE), "r", encoding="utf-8") as f:
+            self.catalog = json.load(f)
+        self.ids = sidecar["ids"]
+        self.dtype = sidecar["dtype"]
+        self.index_version = sidecar.get("index_version")
+        self.row_of = {movie_id: row for row, movie_id in enumerate(self.ids)}
+        self.matrices, self.norms, self.scales = {}, {}, {}
+        for field in sidecar["dims"]:
+            self.matrices[field] = np.load(os.path.join(store_dir, f"{field}.npy"), mmap_mode="r")
+            self.norms[field] = np.load(os.path.join(store_dir, f"{field}.norms.npy"))
+            scales_path = os.path.join(store_dir, f"{field}.scales.npy")
+            self.scales[field] = np.load(scales_path) if os.path.exists(scales_path) else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def fields(self):
+        return list(self.matrices)
+
+    def rows_for(self, movie_ids):
+        return [self.row_of[movie_id] for movie_id in movie_ids if movie_id in self.row_of]
+
+    def vectors(self, field, rows):
+        """Dequantized float32 vectors for the given rows."""
+        vectors = np.asarray(self.matrices[field][rows], dtype=np.float32)
+        if self.scales[field] is not None:
+            vectors = vectors * self.scales[field][rows][:, None]
+        return vectors
+
+    def dot(self, field, queries):
+        """(n_items, n_queries) inner products against every stored row."""
+        matrix = self.matrices[field]
+        queries = np.asarray(queries, dtype=np.float32)
+        if matrix.dtype == np.float32:
+            products = matrix @ queries.T
+        else:
+            products = np.empty((len(matrix), len(queries)), dtype=np.float32)
+            for start in range(0, len(matrix), SEARCH_BLOCK_ROWS):
+                block = np.asarray(matrix[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+                products[start:start + len(block)] = block @ queries.T
+        if self.scales[field] is not None:
+            products *= self.scales[field][:, None]
+        return products
+
+    def similarities(self, field, queries):
+        """(n_items, n_queries) `1 - squared L2 distance`, matching ChromaDB's l2 space."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        distances = self.norms[field][:, None] - 2 * self.dot(field, queries) + query_norms[None, :]
+        return 1 - distances
+
+    def catalog_entry(self, row):
+        entry = self.catalog[row]
+        return {
+            "imdb_id": self.ids[row],
+            "title": entry.get("title", "Unknown"),
+            "overview": entry.get("overview", ""),
+            "genre": entry.get("genre", ""),
+            "popularity": entry.get("popularity", "")
+        }
+
+
+def top_k_rows(scores, k, exclude_rows=()):
+    """Indices of the k highest scores (best first), skipping `exclude_rows`."""
+    scores = np.array(scores, dtype=np.float32, copy=True)
+    if len(exclude_rows):
+        scores[list(exclude_rows)] = -np.inf
+    k = min(k, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+_store = {"key": None, "store": None}
+_store_lock = threading.Lock()
+
+
+def get_vector_store(store_dir=None):
+    """
+    Returns the process-wide NumpyVectorStore, reopening it when a new export
+    replaced the sidecar; None if nothing has been exported yet.
+    """
+    store_dir = store_dir or VECTOR_STORE_DIR
+    sidecar = os.path.join(store_dir, SIDECAR_FILE)
+    try:
+        key = (store_dir, os.stat(sidecar).st_mtime_ns)
+    except OSError:
+        return None
+    with _store_lock:
+        if _store["key"] != key:
+            _store["store"] = NumpyVectorStore(store_dir)
+            _store["key"] = key
+        return _store["store"]
+
+
+if __name__ == "__main__":
+    import argparse
+    from app_utils import init_chromadb_collection
+    from db_utils import current_index_version
+
+    parser = argparse.ArgumentParser(description="Export ChromaDB vectors to a memory-mapped NumPy store.")
+    parser.add_argument("--dtype", choices=["float32", "float16", "int8"], default=VECTOR_STORE_DTYPE)
+    parser.add_argument("--out", default=VECTOR_STORE_DIR)
+    args = parser.parse_args()
+    client, collection = init_chromadb_collection()
+    export_vectors(collection, args.out, args.dtype, index_version=current_index_version())